@@ -1,37 +1,77 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
+import json
+import os
 import shutil
-import base64
-from io import BytesIO
+import sys
+import tempfile
 from fastapi.responses import PlainTextResponse
-import torch
 
 
 # === Import Model Logic ===
-from model.read_summarize.mvp_reader import (
-    hybrid_retrieve,
-    build_answer_prompt,
-    gpt4omini_chat,
-    cmd_ingest
-)
-
-pipe = None
-sd_device = None
+# mvp_reader (numpy / faiss / 임베딩 모델) 는 import 가 무거움 → reader() 로 처음 쓸 때 import
+# (health check 는 바로 응답, 나머지는 startup 후 warm-up 스레드가 미리 로딩 — warmup.py)
+from model.read_summarize.llm_cache import llm_cache, cache_stats
+from model.read_summarize.llm_backends import LLMError, get_backend, llm_stats
+from model.read_summarize.emb_cache import emb_cache_stats
+from model.generate.diffusion_worker import DiffusionClient
+from executors import pools, pool_stats, PoolFullError
+from jobs import JobStore
+from warmup import Warmup
 
 BASE_DIR = Path(__file__).resolve().parent
 BOOK_DIR = BASE_DIR / "model" / "read_summarize"
 SD_MODEL_PATH = BASE_DIR / "model" / "generate" / "models" / "stable_diffusion"
 
+
+_READER = "model.read_summarize.mvp_reader"
+
+
+def reader():
+    """model.read_summarize.mvp_reader (처음 부를 때 import, 이후에는 sys.modules 에서 바로 반환)"""
+    from model.read_summarize import mvp_reader
+    return mvp_reader
+
+
+def _reader_loaded() -> bool:
+    """통계 API 가 mvp_reader import (수백 ms) 를 일으키지 않게"""
+    return _READER in sys.modules
+
+
+async def _store_exists(doc_id: str) -> bool:
+    """첫 요청이면 mvp_reader import 까지 → 파일 확인과 함께 이벤트 루프 밖에서 (다른 요청을 막지 않게)"""
+    return await asyncio.to_thread(lambda: reader().store_exists(doc_id))
+
+
+# 답변 / 요약 LLM (LLM_BACKEND=openai | llama | mock) — 클라이언트·연결 풀은 프로세스에 하나
+llm = get_backend()
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """startup: warm-up 스레드 시작 (바로 반환) / shutdown: 작업 풀, diffusion 워커, LLM 클라이언트 정리"""
+    warmup.start()
+    try:
+        yield
+    finally:
+        for pool in pools.values():
+            pool.shutdown()
+        diffusion.close()
+        await llm.aclose()
+
+
 app = FastAPI(
     title="📚 ReadingMate API",
     description="Hybrid Retrieval + GPT + Stable Diffusion Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -60,6 +100,29 @@ class AskResponse(BaseModel):
     scores: List[float]
 
 
+class LibraryRequest(BaseModel):
+    question: str = Field(..., example="설렁탕이 나오는 책은?")
+    k: int = Field(10, description="검색할 문맥 수 (여러 책 합계)")
+    doc_ids: Optional[List[str]] = Field(None, description="이 책들 안에서만 검색 (없으면 서재 전체)")
+
+
+class LibraryHit(BaseModel):
+    doc_id: str
+    chunk_id: int
+    score: float
+    text: str
+
+
+class LibrarySearchResponse(BaseModel):
+    hits: List[LibraryHit]
+    books: List[dict] = Field(..., description="책별 {doc_id, hits, best_score} (best_score 순)")
+
+
+class LibraryAskResponse(BaseModel):
+    answer: str
+    hits: List[LibraryHit]
+
+
 class SummarizeRequest(BaseModel):
     doc_id: str = Field(..., example="운수좋은날")
     sentences: int = Field(5)
@@ -69,6 +132,14 @@ class SummarizeResponse(BaseModel):
     summary: str
 
 
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued | running | done | error")
+    progress: dict = Field(default_factory=dict, description="{doc_id, stage, chunks, bytes, total_bytes}")
+    result: Optional[dict] = Field(None, description="{doc_id, chunks, emb_dim, index_kind, reuse}")
+    error: Optional[str] = None
+
+
 class GenerateImageRequest(BaseModel):
     prompt: str = Field(..., example="rainy alley in seoul, watercolor style")
     steps: int = Field(40)
@@ -78,6 +149,14 @@ class GenerateImageResponse(BaseModel):
     preview_base64: str
 
 
+class GenerateJobResponse(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued | running | done | error")
+    progress: dict = Field(default_factory=dict, description="{step, total}")
+    preview_base64: Optional[str] = None
+    error: Optional[str] = None
+
+
 class QuickSummaryRequest(BaseModel):
   text: str = Field(..., description="요약할 선택 텍스트")
   sentences: int = Field(2, description="요약 문장 수")
@@ -90,34 +169,173 @@ class QuickSummaryResponse(BaseModel):
 # =========================================================
 # 1️⃣ Document Ingest
 # =========================================================
-@app.post("/ingest", tags=["📄 Document"])
-async def ingest(doc_id: str = Form(...), file: UploadFile = File(...)):
-    """
-    업로드한 텍스트 파일을 분할/임베딩하고 검색 가능한 DB로 저장합니다.
-    """
-    temp_path = Path("temp_upload.txt")
+# 작업 상태는 최근 INGEST_JOB_RESULTS 개까지 보관 (실행은 ingest 풀, 대기열 상한 POOL_INGEST_PENDING)
+ingest_jobs = JobStore(max_finished=int(os.getenv("INGEST_JOB_RESULTS", "64")))
+
+
+async def _save_upload(file: UploadFile) -> Path:
+    """업로드를 요청마다 다른 임시 파일로 저장 (동시 업로드가 서로 덮어쓰지 않음)"""
+    fd, name = tempfile.mkstemp(prefix="ingest-", suffix=".txt")
+
+    def copy():
+        with os.fdopen(fd, "wb") as f:
+            shutil.copyfileobj(file.file, f)
 
-    with open(temp_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    await asyncio.to_thread(copy)
+    return Path(name)
 
+
+def _ingest_ns(doc_id: str, path: Path, unit: str = "para", window: int = 1, stride: int = 1):
     class NS: pass
     ns = NS()
     ns.doc_id = doc_id
-    ns.path = str(temp_path)
-    ns.unit = "para"
-    ns.window = 1
-    ns.stride = 1
+    ns.path = str(path)
+    ns.unit = unit
+    ns.window = window
+    ns.stride = stride
+    return ns
+
 
+def _run_ingest(ns, on_progress=None) -> dict:
+    """ingest 풀 스레드에서 실행. 스토어는 staging 폴더에 다 쓴 뒤 한 번에 게시되므로 /ask 는 이전 버전을 계속 읽음"""
     try:
-        cmd_ingest(ns)
+        return reader().cmd_ingest(ns, on_progress=on_progress)
+    except SystemExit as e:
+        # 빈 문서 등 CLI 용 SystemExit 이 이벤트 루프까지 올라가지 않도록
+        raise ValueError(str(e)) from None
+    finally:
+        Path(ns.path).unlink(missing_ok=True)
+
+
+@app.post("/ingest", tags=["📄 Document"])
+async def ingest(doc_id: str = Form(...), file: UploadFile = File(...)):
+    """
+    업로드한 텍스트 파일을 분할/임베딩하고 검색 가능한 DB로 저장합니다. (완료까지 대기, 큰 파일은 /ingest/jobs 권장)
+    """
+    temp_path = await _save_upload(file)
+    try:
+        await pools["ingest"].run(_run_ingest, _ingest_ns(doc_id, temp_path))
         return {"status": "success", "doc_id": doc_id}
+    except PoolFullError as e:
+        temp_path.unlink(missing_ok=True)
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+def _ingest_job_payload(job) -> dict:
+    return IngestJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        result=job.result,
+        error=job.error,
+    ).model_dump()
+
+
+def _finish_ingest_job(job_id: str, task: asyncio.Task):
+    try:
+        ingest_jobs.update(job_id, status="done", result=task.result())
+    except Exception as e:
+        ingest_jobs.update(job_id, status="error", error=str(e))
+
+
+@app.post("/ingest/jobs", response_model=IngestJobResponse, status_code=202, tags=["📄 Document"])
+async def create_ingest_job(
+    doc_id: str = Form(...),
+    file: UploadFile = File(...),
+    unit: str = Form("para"),
+    window: int = Form(1),
+    stride: int = Form(1),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """ingest 작업 등록 → job_id 즉시 반환 (업로드 저장 후 백그라운드에서 임베딩/인덱스 빌드)"""
+    if unit not in ("para", "sent"):
+        raise HTTPException(status_code=400, detail="unit 은 para 또는 sent 입니다.")
+
+    job, created = ingest_jobs.get_or_create("ingest", key=idempotency_key)
+    if created:
+        ingest_jobs.update(job.job_id, progress={"doc_id": doc_id, "stage": "upload"})
+        temp_path = await _save_upload(file)
+
+        def on_progress(p: dict):
+            ingest_jobs.update(job.job_id, status="running", progress={"doc_id": doc_id, **p})
+
+        try:
+            task = pools["ingest"].submit(_run_ingest, _ingest_ns(doc_id, temp_path, unit, window, stride),
+                                          on_progress)
+        except PoolFullError as e:
+            temp_path.unlink(missing_ok=True)
+            ingest_jobs.update(job.job_id, status="error", error=str(e))
+            return JSONResponse(status_code=503, content=_ingest_job_payload(job))
+        task.add_done_callback(lambda t: _finish_ingest_job(job.job_id, t))
+
+    return _ingest_job_payload(job)
+
+
+@app.get("/ingest/jobs/{job_id}", response_model=IngestJobResponse, tags=["📄 Document"])
+async def get_ingest_job(job_id: str):
+    """ingest 작업 상태/진행률 조회 (완료 시 result)"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"작업 '{job_id}'을 찾을 수 없습니다.")
+    return _ingest_job_payload(job)
+
+
+@app.get("/ingest/jobs/{job_id}/events", tags=["📄 Document"])
+async def stream_ingest_job(job_id: str):
+    """진행률 SSE 스트림: event: progress → 마지막에 event: done | error"""
+    if ingest_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"작업 '{job_id}'을 찾을 수 없습니다.")
+
+    async def events():
+        async for job in ingest_jobs.watch(job_id):
+            if job is None:
+                yield ": keepalive\n\n"
+                continue
+            event = job.status if job.finished else "progress"
+            yield _sse(event, _ingest_job_payload(job))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 # =========================================================
 # 2️⃣ Ask (RAG + GPT)
 # =========================================================
+def _ask_scope(k: int) -> str:
+    return f"ask:{llm.cache_model}:k={k}"
+
+
+def _llm_error(e: LLMError) -> JSONResponse:
+    """LLM 실패 → 503(혼잡/차단) / 504(deadline) / 502 (오류 문자열을 답변으로 돌려주지 않음)"""
+    headers = {"Retry-After": str(int(e.retry_after + 0.999))} if e.retry_after else None
+    return JSONResponse(status_code=e.http_status, content=e.to_dict(), headers=headers)
+
+
+def _semantic_cache_on() -> bool:
+    return llm_cache is not None and llm_cache.semantic_enabled
+
+
+async def _embed_question(request: AskRequest):
+    """
+    (질의 임베딩 [1, d], semantic 캐시 응답 또는 None)
+    임베딩은 동시에 들어온 질의와 묶어서 계산 (query_embedder) → 풀 스레드를 잡지 않음
+    semantic 캐시 조회는 SQLite (쓰기 lock 대기 가능) → 이벤트 루프 밖 스레드에서
+    """
+    qv = (await asyncio.wrap_future(reader().query_embedder.submit(request.question)))[None, :]
+    cached = None
+    if _semantic_cache_on():
+        cached = await asyncio.to_thread(llm_cache.get_semantic, _ask_scope(request.k), request.doc_id, qv)
+    return qv, cached
+
+
+def _ask_semantic_store(request: AskRequest, qv, payload: dict):
+    """SQLite 쓰기 — 이벤트 루프에서는 asyncio.to_thread 로 호출"""
+    if _semantic_cache_on():
+        llm_cache.put_semantic(_ask_scope(request.k), request.doc_id, qv, payload)
+
+
 @app.post("/ask", response_model=AskResponse, tags=["🤖 Q&A"])
 async def ask(request: AskRequest):
     """문서 기반 실시간 Retrieval + GPT reasoning"""
@@ -127,35 +345,110 @@ async def ask(request: AskRequest):
             raise HTTPException(status_code=400, detail="질문을 입력해주세요.")
 
         # 👉 문서 ID가 존재하는지 확인
-        storage_path = Path("model/read_summarize/storage") / request.doc_id
-        if not storage_path.exists():
+        if not await _store_exists(request.doc_id):
             raise HTTPException(status_code=404, detail=f"문서 ID '{request.doc_id}'에 해당하는 데이터가 없습니다.")
 
+        # 비슷한 질문에 대한 답이 캐시에 있으면 검색/GPT 생략
+        qv, cached = await _embed_question(request)
+        if cached is not None:
+            return AskResponse(**cached)
+
         # 🔍 검색 + 프롬프트 생성 + GPT 호출
-        ids, scores, chunks = hybrid_retrieve(request.doc_id, request.question, k=request.k)
-        prompt = build_answer_prompt(request.question, chunks)
-        answer = gpt4omini_chat(prompt)
+        ids, scores, chunks = await pools["embed"].run(
+            reader().hybrid_retrieve, request.doc_id, request.question, k=request.k, qv=qv
+        )
+        prompt = reader().build_answer_prompt(request.question, chunks)
+        answer = await pools["llm"].run_async(llm.achat, prompt)
+
+        response = AskResponse(answer=answer, retrieved_chunks=chunks, scores=scores)
+        await asyncio.to_thread(_ask_semantic_store, request, qv, response.model_dump())
+        return response
+
+    except HTTPException:
+        raise
+    except LLMError as e:
+        return _llm_error(e)
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
 
-        return AskResponse(answer=answer, retrieved_chunks=chunks, scores=scores)
+# =========================================================
+# 2-1️⃣ Library (전체 책 통합 검색)
+# =========================================================
+def _books_of(hits: List[dict]) -> List[dict]:
+    books = {}
+    for hit in hits:
+        book = books.setdefault(hit["doc_id"], {"doc_id": hit["doc_id"], "hits": 0, "best_score": hit["score"]})
+        book["hits"] += 1
+    return sorted(books.values(), key=lambda b: -b["best_score"])
+
+
+async def _library_hits(request: LibraryRequest) -> List[dict]:
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="질문을 입력해주세요.")
+    embedder = (await asyncio.to_thread(reader)).query_embedder  # 첫 요청의 mvp_reader import 도 루프 밖에서
+    qv = (await asyncio.wrap_future(embedder.submit(request.question)))[None, :]
+    try:
+        return await pools["embed"].run(
+            reader().library_retrieve, request.question, k=request.k, doc_ids=request.doc_ids, qv=qv
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
 
+
+@app.post("/library/search", response_model=LibrarySearchResponse, tags=["📚 Library"])
+async def library_search(request: LibraryRequest):
+    """모든 책(또는 doc_ids)에서 한 번에 검색 — "어느 책에 X가 나오나" """
+    try:
+        hits = await _library_hits(request)
+        return LibrarySearchResponse(hits=hits, books=_books_of(hits))
+    except HTTPException:
+        raise
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+
+@app.post("/library/ask", response_model=LibraryAskResponse, tags=["📚 Library"])
+async def library_ask(request: LibraryRequest):
+    """여러 책에 걸친 질문 — 근거 문맥에 책 이름을 붙여 GPT 답변"""
+    try:
+        hits = await _library_hits(request)
+        contexts = [f"《{h['doc_id']}》 {h['text']}" for h in hits]
+        prompt = reader().build_answer_prompt(request.question, contexts)
+        answer = await pools["llm"].run_async(llm.achat, prompt)
+        return LibraryAskResponse(answer=answer, hits=hits)
+    except HTTPException:
+        raise
+    except LLMError as e:
+        return _llm_error(e)
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.get("/library/docs", tags=["📚 Library"])
+async def library_list():
+    return {"docs": reader().library_docs()}
+
+
 # =========================================================
 # 3️⃣ Summarization
 # =========================================================
 @app.post("/summarize", response_model=SummarizeResponse, tags=["📌 Summary"])
 async def summarize(request: SummarizeRequest):
-    """전체 문서 기반 GPT 요약 생성"""
+    """전체 문서 요약 — ingest 때 만든 요약 트리에서 N문장으로 (처음 요청된 N만 GPT 1회)"""
     try:
-        _, _, chunks = hybrid_retrieve(request.doc_id, "전체 줄거리")
-        text = "\n".join(chunks)
-
-        prompt = f"아래 내용을 {request.sentences} 문장으로 요약해줘:\n\n{text}"
-        answer = gpt4omini_chat(prompt)
-
+        answer = await pools["llm"].run(reader().summarize_doc, request.doc_id, request.sentences)
         return SummarizeResponse(summary=answer)
 
+    except LLMError as e:
+        return _llm_error(e)
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -174,25 +467,153 @@ async def summarize_text(request: QuickSummaryRequest):
             f"다음 글을 {request.sentences}문장으로 한국어로 요약해줘.\n\n"
             f"{request.text}"
         )
-        answer = gpt4omini_chat(prompt)
+        answer = await pools["llm"].run_async(llm.achat, prompt)
 
         return QuickSummaryResponse(summary=answer)
 
+    except LLMError as e:
+        return _llm_error(e)
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+# =========================================================
+# 3-2️⃣ Streaming (SSE): context → token ... → done
+# =========================================================
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_llm(prompt: Optional[str], context: Optional[dict] = None,
+                answer: Optional[str] = None, on_done=None,
+                max_tokens: int = 300) -> StreamingResponse:
+    """검색 결과를 먼저 보내고, LLM 토큰은 도착하는 대로 전달 (answer가 있으면 캐시 hit)"""
+
+    async def events():
+        if context is not None:
+            yield _sse("context", context)
+        if answer is not None:
+            yield _sse("token", {"text": answer})
+            yield _sse("done", {"answer": answer})
+            return
+        parts = []
+        try:
+            async for delta in pools["llm"].run_stream(llm.astream, prompt, max_tokens=max_tokens):
+                parts.append(delta)
+                yield _sse("token", {"text": delta})
+            full = "".join(parts)
+            if on_done is not None:  # 캐시 / 요약 저장 (SQLite, 파일 쓰기) → 스레드에서
+                await asyncio.to_thread(on_done, full)
+            yield _sse("done", {"answer": full})
+        except LLMError as e:
+            yield _sse("error", e.to_dict())
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/ask/stream", tags=["🤖 Q&A"])
+async def ask_stream(request: AskRequest):
+    """/ask 스트리밍 버전 (event: context → token → done)"""
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="질문을 입력해주세요.")
+    if not await _store_exists(request.doc_id):
+        raise HTTPException(status_code=404, detail=f"문서 ID '{request.doc_id}'에 해당하는 데이터가 없습니다.")
+
+    try:
+        qv, cached = await _embed_question(request)
+        if cached is not None:
+            context = {"retrieved_chunks": cached["retrieved_chunks"], "scores": cached["scores"]}
+            return _stream_llm(None, context=context, answer=cached["answer"])
+        ids, scores, chunks = await pools["embed"].run(
+            reader().hybrid_retrieve, request.doc_id, request.question, k=request.k, qv=qv
+        )
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    prompt = reader().build_answer_prompt(request.question, chunks)
+    context = {"retrieved_chunks": chunks, "scores": scores}
+
+    def on_done(answer: str):
+        _ask_semantic_store(request, qv, {"answer": answer.strip(), **context})
+
+    return _stream_llm(prompt, context=context, on_done=on_done)
+
+
+@app.post("/summarize/stream", tags=["📌 Summary"])
+async def summarize_stream(request: SummarizeRequest):
+    """/summarize 스트리밍 버전 (요약 트리에 저장된 N문장 요약이 있으면 바로 반환)"""
+    try:
+        tree = await pools["llm"].run(reader().ensure_summary_tree, request.doc_id)
+    except LLMError as e:
+        return _llm_error(e)
+    except PoolFullError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+    cached = tree.get_render(request.sentences)
+    if cached is not None:
+        return _stream_llm(None, answer=cached)
+
+    top_hash = tree.top_hash
+
+    def on_done(summary: str):
+        reader().save_summary_render(request.doc_id, request.sentences, top_hash, summary.strip())
+
+    return _stream_llm(tree.render_prompt(request.sentences), on_done=on_done,
+                       max_tokens=reader().summary_max_tokens(request.sentences))
+
+
+@app.post("/summarize_text/stream", tags=["📌 Summary"])
+async def summarize_text_stream(request: QuickSummaryRequest):
+    """/summarize_text 스트리밍 버전"""
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="요약할 텍스트가 없습니다.")
+    prompt = (
+        f"다음 글을 {request.sentences}문장으로 한국어로 요약해줘.\n\n"
+        f"{request.text}"
+    )
+    return _stream_llm(prompt)
+
 
 # =========================================================
-# 4️⃣ Image Generation (Lazy Stable Diffusion)
+# 4️⃣ Image Generation (Stable Diffusion 워커, warm-up 때 preload)
 # =========================================================
+# 모델은 별도 diffusion 워커 프로세스 1개만 로딩 (uvicorn 워커 간 공유, micro-batching)
+diffusion = DiffusionClient(SD_MODEL_PATH)
+
+
+# 완료된 이미지는 최근 GENERATE_JOB_RESULTS 개까지 보관 → 재시도/재접속 시 다시 추론하지 않음
+image_jobs = JobStore(max_finished=int(os.getenv("GENERATE_JOB_RESULTS", "64")))
+
+
+def _generate_job_payload(job, include_image: bool = True) -> dict:
+    return GenerateJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        progress=job.progress,
+        preview_base64=job.result if include_image else None,
+        error=job.error,
+    ).model_dump()
+
+
+def _finish_generate_job(job_id: str, future):
+    try:
+        image_jobs.update(job_id, status="done", result=future.result())
+    except Exception as e:
+        image_jobs.update(job_id, status="error", error=str(e))
+
+
 @app.post("/generate", response_model=GenerateImageResponse, tags=["🎨 Image"])
 async def generate(prompt: str = Form(...), steps: int = Form(60)):
     """입력 텍스트 기반 이미지 생성"""
 
-    global pipe
-    global sd_device
-    from diffusers import StableDiffusionPipeline, DDIMScheduler
-
     try:
         # 모델 경로 존재 여부 선체크 (네트워크 다운로드 방지)
         model_index = SD_MODEL_PATH / "model_index.json"
@@ -205,34 +626,9 @@ async def generate(prompt: str = Form(...), steps: int = Form(60)):
                 },
             )
 
-        # 최초 요청 시 로딩
-        if pipe is None:
-            print(f"🚀 Loading Stable Diffusion from {SD_MODEL_PATH} ...")
-            # 디바이스 선택
-            if torch.backends.mps.is_available():
-                sd_device = torch.device("mps")
-                dtype = torch.float16
-                print("✅ Using Apple MPS (float16)")
-            else:
-                sd_device = torch.device("cpu")
-                dtype = torch.float32
-                print("✅ Using CPU (float32)")
-
-            pipe = StableDiffusionPipeline.from_pretrained(
-                str(SD_MODEL_PATH),
-                torch_dtype=dtype,
-                safety_checker=None,
-                local_files_only=True,
-            )
-            pipe.scheduler = DDIMScheduler.from_config(pipe.scheduler.config)
-            pipe.to(sd_device)
-            print("✅ Stable Diffusion Ready.")
-
-        img = pipe(prompt, num_inference_steps=steps).images[0]
-
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        # diffusion 워커 프로세스 큐에 넣고 결과만 기다림 → 이벤트 루프는 계속 처리
+        future = await asyncio.to_thread(diffusion.submit, prompt, steps)
+        img_str = await asyncio.wrap_future(future)
 
         return GenerateImageResponse(preview_base64=img_str)
 
@@ -240,6 +636,61 @@ async def generate(prompt: str = Form(...), steps: int = Form(60)):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@app.post("/generate/jobs", response_model=GenerateJobResponse, status_code=202, tags=["🎨 Image"])
+async def create_generate_job(
+    prompt: str = Form(...),
+    steps: int = Form(60),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """이미지 생성 작업 등록 → job_id 즉시 반환 (같은 Idempotency-Key 재요청은 기존 작업 반환)"""
+    if not (SD_MODEL_PATH / "model_index.json").exists():
+        return JSONResponse(
+            status_code=503,
+            content={"error": f"Stable Diffusion 모델이 없습니다. {SD_MODEL_PATH}를 확인해주세요."},
+        )
+
+    job, created = image_jobs.get_or_create("generate", key=idempotency_key)
+    if created:
+        def on_progress(step: int, total: int):
+            image_jobs.update(job.job_id, status="running", progress={"step": step, "total": total})
+
+        try:
+            future = await asyncio.to_thread(diffusion.submit, prompt, steps, on_progress=on_progress)
+        except Exception as e:
+            image_jobs.update(job.job_id, status="error", error=str(e))
+        else:
+            future.add_done_callback(lambda f: _finish_generate_job(job.job_id, f))
+
+    return _generate_job_payload(job, include_image=False)
+
+
+@app.get("/generate/jobs/{job_id}", response_model=GenerateJobResponse, tags=["🎨 Image"])
+async def get_generate_job(job_id: str):
+    """작업 상태 조회 (완료 시 preview_base64 포함)"""
+    job = image_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"작업 '{job_id}'을 찾을 수 없습니다.")
+    return _generate_job_payload(job)
+
+
+@app.get("/generate/jobs/{job_id}/events", tags=["🎨 Image"])
+async def stream_generate_job(job_id: str):
+    """진행률 SSE 스트림: event: progress → 마지막에 event: done | error (이미지 포함)"""
+    if image_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"작업 '{job_id}'을 찾을 수 없습니다.")
+
+    async def events():
+        async for job in image_jobs.watch(job_id):
+            if job is None:
+                yield ": keepalive\n\n"
+                continue
+            event = job.status if job.finished else "progress"
+            yield _sse(event, _generate_job_payload(job, include_image=job.finished))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
 BASE_DIR = Path(__file__).resolve().parent
 BOOK_DIR = BASE_DIR / "model" / "read_summarize"
 
@@ -255,9 +706,103 @@ def get_book(book_id: str):
     except Exception as e:
         return f"파일을 불러올 수 없습니다: {e}"
     
+# =========================================================
+# Warm-up (startup 후 백그라운드, APP_WARMUP)
+# =========================================================
+warmup = Warmup()
+
+
+@warmup.step("reader")
+def _warm_reader():
+    reader()
+
+
+@warmup.step("embed")
+def _warm_embed():
+    # 임베딩 모델 로딩 + 첫 encode (질의 배치 스레드도 같이 시작)
+    reader().query_embedder.submit("warm-up").result()
+
+
+@warmup.step("llm")
+def _warm_llm():
+    llm.warmup()
+
+
+@warmup.step("diffusion", available=(SD_MODEL_PATH / "model_index.json").exists())
+def _warm_diffusion():
+    # diffusion 워커 기동 → 파이프라인 로딩 + dummy 추론(DIFFUSION_WARMUP_STEPS)이 끝날 때까지 대기
+    diffusion.preload()
+
+
 # =========================================================
 # Health Check
 # =========================================================
 @app.get("/", tags=["🩺 Health"])
 async def root():
+    """liveness: 프로세스가 요청을 받을 수 있으면 200 (모델 로딩 여부와 무관)"""
     return {"message": "🚀 ReadingMate API is running!"}
+
+
+@app.get("/ready", tags=["🩺 Health"])
+async def ready():
+    """
+    readiness: APP_READY_REQUIRES 의 켠 단계(기본 mvp_reader, 임베딩 모델, Stable Diffusion)가 모두 준비됐을 때 200, 아니면 503
+    필수가 아닌 단계(기본 llm)의 실패는 failed 에만 보고. diffusion 은 워커가 재시작돼 다시 로딩 중인 경우도 503
+    """
+    pending = warmup.pending()
+    body = {"ready": not pending, "pending": pending, "failed": warmup.failed(), "warmup": warmup.stats()}
+    if "diffusion" in warmup.required_steps() and "diffusion" not in pending:
+        stats = await asyncio.to_thread(diffusion.stats)
+        body["diffusion"] = {k: stats.get(k) for k in ("connected", "state", "load_s", "warmup_s", "load_error")}
+        if stats.get("state") != "ready":
+            body["ready"] = False
+            body["pending"].append("diffusion")
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+@app.get("/stats/pools", tags=["🩺 Health"])
+async def pools_stats():
+    """워크로드별 풀 대기열 깊이 / 대기·실행 지연(ms) + diffusion 워커 배치 통계"""
+    stats = pool_stats()
+    stats["diffusion"] = await asyncio.to_thread(diffusion.stats)
+    return stats
+
+
+@app.get("/stats/store_cache", tags=["🩺 Health"])
+async def store_cache():
+    """RAG 스토어 캐시 hit/miss 통계"""
+    if not _reader_loaded():
+        return {"loaded": False}
+    return reader().store_cache_stats()
+
+
+@app.get("/stats/query_embedder", tags=["🩺 Health"])
+async def query_embedder_stats():
+    """질의 임베딩 배치 크기 / LRU hit rate"""
+    if not _reader_loaded():
+        return {"loaded": False}
+    return reader().query_embedder.stats()
+
+
+@app.get("/stats/llm_cache", tags=["🩺 Health"])
+async def llm_cache_stats():
+    """LLM 응답 캐시 (exact / semantic) hit rate, 항목 수"""
+    return await asyncio.to_thread(cache_stats)
+
+
+@app.get("/stats/llm", tags=["🩺 Health"])
+async def llm_backend_stats():
+    """LLM 백엔드 호출 / 재시도 / hedging / 오류 종류 / circuit breaker 상태"""
+    return llm_stats()
+
+
+@app.get("/stats/warmup", tags=["🩺 Health"])
+async def warmup_stats():
+    """백그라운드 warm-up 단계별 상태 / 소요 시간"""
+    return warmup.stats()
+
+
+@app.get("/stats/emb_cache", tags=["🩺 Health"])
+async def embedding_cache_stats():
+    """chunk 임베딩 캐시 hit rate, 항목 수 (재 ingest 때 재사용된 임베딩)"""
+    return await asyncio.to_thread(emb_cache_stats)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dense 인덱스 종류별 recall@k / 검색 지연 / 크기: flat(embeddings.npy) vs hnsw / ivfsq8 / ivfpq
+
+- 벡터: --doc_id 를 주면 그 스토어의 embeddings.npy, 아니면 군집이 있는 합성 벡터 --n 개
+  (번들 도서는 수천 chunk 라 flat 이 기본이므로, 라이브러리 규모는 합성 벡터로 재현)
+- 질의: 벡터 일부에 잡음을 더한 것 (가까운 이웃이 실제로 존재)
+- flat top-k 를 정답으로 각 인덱스의 recall@k, 질의당 p50/p99(ms), ann.index 크기, 빌드(학습) 시간 출력
+- HNSW 는 --ef-search, IVF 는 --nprobe 값별로 반복 (recall ↔ 지연 trade-off)
+
+실행 (backend/ 에서):
+  python bench/ann_index.py --n 100000 --kinds hnsw,ivfsq8,ivfpq
+  python bench/ann_index.py --doc_id luckyday --kinds hnsw
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import numpy as np
+
+from model.read_summarize import mvp_reader as R
+
+
+def _synthetic(n: int, d: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, d)).astype(np.float32)
+    x = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, d)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _queries(vecs: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = vecs[rng.choice(len(vecs), count, replace=False)].astype(np.float32)
+    q = q + 0.05 * rng.standard_normal(q.shape).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def _run(index, queries: np.ndarray, k: int, **params):
+    tops, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q[None, :], k, **params)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        tops.append(ids[0].tolist())
+    ordered = sorted(latencies)
+    return tops, statistics.median(latencies), ordered[int(0.99 * (len(ordered) - 1))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="dense index recall/latency: flat vs HNSW / IVF-SQ8 / IVF-PQ")
+    ap.add_argument("--doc_id", default="", help="스토어 embeddings.npy 사용 (없으면 합성 벡터)")
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--kinds", default="hnsw,ivfsq8,ivfpq")
+    ap.add_argument("-k", type=int, default=64, help="검색 수 (hybrid_retrieve 의 RAG_CANDIDATES 와 같은 역할)")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--nprobe", default="4,16,64")
+    ap.add_argument("--ef-search", default="64,128,256")
+    ns = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        emb_path = Path(tmp) / "embeddings.npy"
+        if ns.doc_id:
+            vecs = np.asarray(np.load(R.store_dir(ns.doc_id) / "embeddings.npy"), dtype=np.float32)
+        else:
+            vecs = _synthetic(ns.n, ns.dim, ns.clusters)
+        R.save_embeddings(vecs, emb_path)
+        queries = _queries(vecs, min(ns.queries, len(vecs)))
+        print(f"[INFO] vectors={vecs.shape} queries={len(queries)} k={ns.k}")
+
+        flat = R.MmapFlatIndex(emb_path)
+        base_top, p50, p99 = _run(flat, queries, ns.k)
+        print(f"[OK] {'flat':>7} {'':>14} | recall@{ns.k}=1.000 | p50={p50:7.2f}ms p99={p99:7.2f}ms | "
+              f"{vecs.nbytes / 2**20:8.1f}MB (embeddings.npy)")
+
+        for kind in ns.kinds.split(","):
+            t0 = time.perf_counter()
+            ann = R.build_ann_index(vecs, kind)
+            build_s = time.perf_counter() - t0
+            ann_path = Path(tmp) / f"{kind}.index"
+            R.save_ann_index(ann, ann_path)
+            index = R.AnnIndex(ann_path, emb_path, kind)
+            print(f"[INFO] {kind}: {ann_path.stat().st_size / 2**20:.1f}MB, build {build_s:.1f}s")
+            name, values = ("ef_search", ns.ef_search) if kind == "hnsw" else ("nprobe", ns.nprobe)
+            for value in [int(v) for v in values.split(",")]:
+                tops, p50, p99 = _run(index, queries, ns.k, **{name: value})
+                recall = np.mean([len(set(b) & set(c)) / len(b) for b, c in zip(base_top, tops)])
+                print(f"[OK] {kind:>7} {name}={value:<5} | recall@{ns.k}={recall:.3f} | "
+                      f"p50={p50:7.2f}ms p99={p99:7.2f}ms | {index.nbytes / 2**20:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
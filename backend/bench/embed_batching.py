@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+질의 임베딩 처리량: 요청마다 embed_texts([q]) vs QueryEmbedder(micro-batching + LRU)
+
+- 동시 클라이언트 1/8/32개(스레드)가 각자 질의를 연속으로 임베딩 → qps, p50/p99
+- 기본은 실제 모델(EMB_MODEL, sentence-transformers). --fake-ms 를 주면 모델 대신
+  "base + per_item × batch" 만큼 장치를 점유(sleep)하는 인코더로 배칭 효과만 측정 (오프라인용)
+- --repeat 는 질의 중 같은 질문의 비율 (LRU 효과)
+
+실행 (backend/ 에서):
+  python bench/embed_batching.py --clients 1,8,32 --seconds 5
+  python bench/embed_batching.py --fake-ms 20,1 --repeat 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import numpy as np
+
+from model.read_summarize import mvp_reader as R
+
+
+def _fake_encoder(base_ms: float, per_item_ms: float, dim: int = 1024):
+    device = threading.Lock()  # CPU/GPU 하나를 여러 호출이 나눠 씀 → 동시 forward는 직렬화
+
+    def encode(texts):
+        with device:
+            time.sleep((base_ms + per_item_ms * len(texts)) / 1000)
+        out = np.random.default_rng(len(texts)).standard_normal((len(texts), dim)).astype("float32")
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+    return encode
+
+
+def _run(embed_one, clients: int, seconds: float, repeat: float, questions):
+    latencies, lock = [], threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client(cid: int):
+        rng = random.Random(cid)
+        n = 0
+        while time.monotonic() < stop:
+            if rng.random() < repeat:
+                q = rng.choice(questions)
+            else:
+                q = f"{rng.choice(questions)} #{cid}-{n}"  # 캐시에 없는 질의
+            n += 1
+            t0 = time.perf_counter()
+            embed_one(q)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(0.99 * (len(ordered) - 1)))]
+    return len(latencies) / elapsed, statistics.median(latencies), p99
+
+
+def main():
+    ap = argparse.ArgumentParser(description="query embedding throughput: per-request vs micro-batched")
+    ap.add_argument("--clients", default="1,8,32")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--repeat", type=float, default=0.0, help="반복 질의 비율 (0~1)")
+    ap.add_argument("--fake-ms", default="", help="가짜 인코더 'base,per_item' ms (예: 20,1)")
+    ns = ap.parse_args()
+
+    if ns.fake_ms:
+        base, per_item = (float(x) for x in ns.fake_ms.split(","))
+        encode = _fake_encoder(base, per_item)
+        print(f"[INFO] fake encoder: {base}ms + {per_item}ms/item")
+    else:
+        encode = R.embed_texts
+        print(f"[INFO] model: {R._EMB_MODEL_NAME}")
+        encode(["warm-up"])
+
+    questions = ["김 첨지는 왜 오늘을 운수 좋은 날이라고 생각했나요?",
+                 "김 첨지가 설렁탕을 사가려 한 이유는 무엇인가요?",
+                 "로미오는 왜 추방됐어?", "티볼트 죽었어?", "줄리엣은 어느 가문이야?"]
+
+    for clients in [int(c) for c in ns.clients.split(",")]:
+        # 요청마다 배치 1 (기존 방식)
+        qps, p50, p99 = _run(lambda q: encode([q]), clients, ns.seconds, ns.repeat, questions)
+        print(f"[OK] clients={clients:>3} per-request | {qps:8.1f} qps | p50={p50:7.1f}ms p99={p99:7.1f}ms")
+        # micro-batching + LRU
+        embedder = R.QueryEmbedder(encode=encode)
+        qps, p50, p99 = _run(embedder.embed, clients, ns.seconds, ns.repeat, questions)
+        st = embedder.stats()
+        print(f"[OK] clients={clients:>3} batched     | {qps:8.1f} qps | p50={p50:7.1f}ms p99={p99:7.1f}ms"
+              f" | avg_batch={st['avg_batch']} cache_hit={st['cache_hit_rate']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+임베딩 백엔드 품질/속도 비교: float32(st) 대비 recall@k 와 인코딩 처리량
+
+- 번들 도서(luckyday, romeoandjuliet)를 ingest 와 같은 방식으로 chunk
+- 질의: 예시 질문 + 문서 곳곳의 첫 문장 (mvp_reader.py parity 와 같은 샘플링)
+- float32 의 dense top-k 를 정답으로 두고 백엔드별로
+    reingest : chunk 와 질의를 모두 그 백엔드로 임베딩 (스토어를 다시 만든 경우)
+    query    : 질의만 그 백엔드, 스토어는 float32 그대로 (재 ingest 없이 바꾼 경우)
+  의 recall@k 와 chunk 인코딩 속도(chunks/s), 질의 지연(ms)을 출력
+
+실행 (backend/ 에서):
+  python bench/embed_recall.py --backends torch-int8,onnx,onnx-int8 -k 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+import numpy as np
+
+from model.read_summarize import mvp_reader as R
+from model.read_summarize.emb_backends import load_emb_model, recall_at_k
+
+QUESTIONS = {
+    "luckyday": ["김 첨지는 왜 오늘을 “운수 좋은 날”이라고 생각했나요?",
+                 "김 첨지가 설렁탕을 사가려 한 이유는 무엇인가요?",
+                 "김 첨지의 아내가 병이 악화된 원인은 무엇이라고 나오나요?",
+                 "김 첨지가 집에 돌아가기 싫어했던 이유는 무엇인가요?",
+                 "마지막 장면에서 김 첨지는 왜 울다가 웃다가 반복하나요?"],
+    "romeoandjuliet": ["로미오는 무슨 가문의 딸이었지?", "티볼트 죽었어? 줄리엣과 무슨 사이길래 슬퍼하지?",
+                       "머큐리 죽었어? 로미오와 무슨 사이길래 슬퍼하지?", "로미오는 왜 추방됐어?"],
+}
+
+
+def _queries(book: str, chunks, samples: int):
+    queries = list(QUESTIONS.get(book, []))
+    step = max(1, len(chunks) // samples)
+    for i in range(0, len(chunks), step):
+        sents = R.split_sentences(chunks[i])
+        if sents:
+            queries.append(sents[0][:100])
+    return queries
+
+
+def _top_k(qv: np.ndarray, vecs: np.ndarray, k: int):
+    return [R._top_k(row, k).tolist() for row in qv @ vecs.T]
+
+
+def _encode(model, texts):
+    t0 = time.perf_counter()
+    vecs = model.encode(texts, batch_size=64, convert_to_numpy=True,
+                        normalize_embeddings=True).astype("float32")
+    return vecs, time.perf_counter() - t0
+
+
+def _query_ms(model, queries) -> float:
+    t0 = time.perf_counter()
+    for q in queries:
+        model.encode([q], convert_to_numpy=True, normalize_embeddings=True)
+    return (time.perf_counter() - t0) * 1000 / len(queries)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="embedding backend recall@k vs float32")
+    ap.add_argument("--books", default="luckyday,romeoandjuliet")
+    ap.add_argument("--backends", default="torch-int8,onnx,onnx-int8")
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--samples", type=int, default=100)
+    ap.add_argument("--model", default=R._EMB_MODEL_NAME)
+    ns = ap.parse_args()
+
+    book_dir = Path(R.__file__).parent
+    data = {}
+    for book in ns.books.split(","):
+        chunks = R.make_chunks(R.read_text(book_dir / f"{book}.txt"), unit="para")
+        data[book] = (chunks, _queries(book, chunks, ns.samples))
+
+    print(f"[INFO] baseline: {ns.model} (st, float32)")
+    base = load_emb_model(ns.model, "st")
+    baseline = {}
+    for book, (chunks, queries) in data.items():
+        vecs, secs = _encode(base, chunks)
+        qv, _ = _encode(base, queries)
+        baseline[book] = (vecs, _top_k(qv, vecs, ns.k))
+        print(f"[OK] {book:>15} st         | chunks={len(chunks)} queries={len(queries)} | "
+              f"{len(chunks) / secs:7.1f} chunks/s | query {_query_ms(base, queries[:20]):6.1f}ms")
+    del base
+
+    for backend in ns.backends.split(","):
+        model = load_emb_model(ns.model, backend)
+        for book, (chunks, queries) in data.items():
+            base_vecs, base_top = baseline[book]
+            vecs, secs = _encode(model, chunks)
+            qv, _ = _encode(model, queries)
+            reingest = recall_at_k(base_top, _top_k(qv, vecs, ns.k))
+            query_only = recall_at_k(base_top, _top_k(qv, base_vecs, ns.k))
+            print(f"[OK] {book:>15} {backend:<10} | recall@{ns.k} reingest={reingest:.3f} "
+                  f"query={query_only:.3f} | {len(chunks) / secs:7.1f} chunks/s | "
+                  f"query {_query_ms(model, queries[:20]):6.1f}ms")
+        del model
+
+
+if __name__ == "__main__":
+    main()
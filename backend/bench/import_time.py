@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+import 시간 예산: uvicorn 워커 하나가 뜰 때 `import app` 에 드는 시간과 그때 딸려 오는 모듈
+
+- 모듈마다 새 프로세스에서 python -X importtime -c "import <module>" 를 --runs 번 실행
+  → 전체 import 시간 (중앙값 / 최소), 누적 시간이 큰 모듈 상위 --top 개 (첫 실행 기준)
+- 가드: 중앙값이 --budget-ms 를 넘거나, --forbid 에 있는 무거운 모듈이 import 되면 exit 1
+  (torch / numpy / faiss / openai 등은 첫 요청이나 warm-up 에서 import 돼야 함 — warmup.py)
+- --modules 로 다른 모듈도 같이 측정 (예: model.read_summarize.mvp_reader — 예산 가드는 첫 모듈에만)
+
+실행 (backend/ 에서):
+  python bench/import_time.py
+  python bench/import_time.py --runs 7 --budget-ms 800 --modules app,model.read_summarize.mvp_reader
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+FORBID = "torch,transformers,sentence_transformers,diffusers,onnxruntime,faiss,numpy,openai,httpx,rank_bm25,gradio"
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _measure(module: str) -> list[tuple[str, int, int, int]]:
+    """새 프로세스에서 import → [(모듈, self µs, 누적 µs, 깊이)] (import 된 순서)"""
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "mock")
+    env.setdefault("APP_WARMUP", "")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BACKEND, env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    if proc.returncode != 0 or not rows:
+        raise SystemExit(f"[ERROR] import {module} 실패:\n{proc.stderr.strip()[-2000:]}")
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="import 시간 예산 / 무거운 모듈 import 가드")
+    ap.add_argument("--modules", default="app", help="측정할 모듈 (쉼표 구분, 첫 모듈에 가드 적용)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=12, help="누적 시간 상위 N개 모듈 출력")
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1000")))
+    ap.add_argument("--forbid", default=FORBID, help="import 되면 실패로 볼 모듈 (최상위 이름, 빈 값이면 검사 안 함)")
+    ns = ap.parse_args()
+
+    forbid = {m.strip() for m in ns.forbid.split(",") if m.strip()}
+    failed = False
+    for i, module in enumerate(ns.modules.split(",")):
+        runs = [_measure(module) for _ in range(ns.runs)]
+        totals = [next(r[2] for r in rows if r[0] == module) / 1000 for rows in runs]
+        med = statistics.median(totals)
+        print(f"[INFO] import {module}: median {med:.0f}ms | min {min(totals):.0f}ms ({ns.runs} runs)")
+
+        rows = runs[0]
+        for name, _self_us, cum_us, depth in sorted(rows, key=lambda r: -r[2])[:ns.top]:
+            print(f"       {cum_us / 1000:8.1f}ms  {'  ' * depth}{name}")
+
+        if i:
+            continue
+        roots = sorted({r[0].split(".")[0] for r in rows} & forbid)
+        if roots:
+            print(f"[WARN] {module} import 에 무거운 모듈 포함: {', '.join(roots)} "
+                  f"(첫 사용 때 import 하도록 옮길 것)")
+            failed = True
+        if med > ns.budget_ms:
+            print(f"[WARN] {module} import {med:.0f}ms > 예산 {ns.budget_ms:.0f}ms")
+            failed = True
+        if not failed:
+            print(f"[OK] {module}: 예산 {ns.budget_ms:.0f}ms 이내, 금지 모듈 없음")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
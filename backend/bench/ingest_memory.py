@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+스트리밍 ingest 의 최대 메모리(peak RSS) / 처리량: 책 크기별 stream vs batch
+
+- 책: 번들 도서를 --sizes(MB) 만큼 반복 (반복마다 문장 끝에 번호를 붙여 chunk 가 모두 다름)
+- stream: ingest_stream (파일을 블록 단위로 읽고 RAG_INGEST_BATCH 개씩 임베딩 → 바로 스토어에 append)
+- batch : 이전 방식 (read_text → make_chunks → embed_chunks → write_store, 전부 메모리에)
+- 크기/모드마다 새 프로세스에서 실행해 ru_maxrss 를 비교 (임시 storage, 서재/요약/임베딩 캐시 끔)
+- 임베딩: 기본은 토큰 해시 기반 가짜 임베딩 (--dim 차원, 모델 메모리를 빼고 ingest 자체만 측정)
+          --model 이면 실제 EMB_MODEL
+
+실행 (backend/ 에서):
+  python bench/ingest_memory.py --sizes 1,8,32
+  python bench/ingest_memory.py --sizes 4 --model
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+
+def _make_book(path: Path, mb: float, source: Path):
+    text = source.read_text(encoding="utf-8", errors="ignore")
+    target, i = int(mb * 2**20), 0
+    with open(path, "w", encoding="utf-8") as f:
+        while f.tell() < target:
+            f.write(text.replace(". ", f" ({i}). ").replace("\n\n", f" [{i}]\n\n"))
+            i += 1
+
+
+def _child(ns):
+    os.environ.update({"RAG_LIBRARY": "0", "RAG_SUMMARY_ON_INGEST": "0", "EMB_CACHE": "0", "LLM_CACHE": "0"})
+    import numpy as np
+    from model.read_summarize import mvp_reader as R, rag_store, store_writer
+
+    if not ns.model:
+        def fake(texts):
+            out = np.zeros((len(texts), ns.dim), dtype=np.float32)
+            for row, t in enumerate(texts):
+                for tok in R.simple_tokenize(t):
+                    out[row, int(hashlib.md5(tok.encode()).hexdigest()[:8], 16) % ns.dim] += 1
+            return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-9, None)
+        store_writer.embed_texts = fake  # ChunkEmbedder 가 쓰는 이름
+    rag_store.STORAGE_ROOT = Path(ns.storage)
+    path = Path(ns.path)
+
+    t0 = time.perf_counter()
+    if ns.mode == "stream":
+        store, _ = R.ingest_stream("bench", path, unit=ns.unit, window=ns.window, stride=ns.stride,
+                                   index_kind="flat")
+        n = len(store.chunks)
+    else:
+        chunks = R.make_chunks(R.read_text(path), unit=ns.unit, window=ns.window, stride=ns.stride)
+        vecs, _ = R.embed_chunks(chunks)
+        R.write_store("bench", chunks, vecs, R.build_bm25_index(chunks), index_kind="flat")
+        n = len(chunks)
+    secs = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    print(json.dumps({"chunks": n, "secs": secs, "peak_mb": peak}))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="streaming ingest peak RSS vs book size")
+    ap.add_argument("--sizes", default="1,8,32", help="책 크기(MB), 쉼표로 구분")
+    ap.add_argument("--modes", default="stream,batch")
+    ap.add_argument("--book", default="romeoandjuliet")
+    ap.add_argument("--unit", default="para")
+    ap.add_argument("--window", type=int, default=1)
+    ap.add_argument("--stride", type=int, default=1)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--model", action="store_true", help="가짜 임베딩 대신 EMB_MODEL 사용")
+    ap.add_argument("--child", choices=["stream", "batch"], help=argparse.SUPPRESS)
+    ap.add_argument("--storage", help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    ns = ap.parse_args()
+
+    if ns.child:
+        ns.mode = ns.child
+        return _child(ns)
+
+    source = Path(__file__).resolve().parents[1] / "model" / "read_summarize" / f"{ns.book}.txt"
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in [float(x) for x in ns.sizes.split(",")]:
+            book = Path(tmp) / f"book_{mb:g}mb.txt"
+            _make_book(book, mb, source)
+            for mode in ns.modes.split(","):
+                storage = Path(tmp) / f"{mode}_{mb:g}mb"
+                cmd = [sys.executable, __file__, "--child", mode, "--storage", str(storage),
+                       "--unit", ns.unit, "--window", str(ns.window), "--stride", str(ns.stride),
+                       "--dim", str(ns.dim), "--path", str(book)] + (["--model"] if ns.model else [])
+                out = subprocess.run(cmd, capture_output=True, text=True)
+                if out.returncode != 0:
+                    print(f"[WARN] {mode} {mb:g}MB 실패:\n{out.stderr[-2000:]}")
+                    continue
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"[OK] {mb:6.1f}MB {mode:<6} | chunks={r['chunks']:>7} | peak RSS {r['peak_mb']:7.1f}MB | "
+                      f"{r['secs']:6.1f}s ({r['chunks'] / r['secs']:7.0f} chunks/s)")
+
+
+if __name__ == "__main__":
+    main()
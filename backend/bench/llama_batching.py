@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+로컬 Llama: 한 번에 하나씩 model.generate (이전 llama_chat) vs llama_server 엔진 (continuous batching + prefix KV 캐시)
+
+- 프롬프트: build_answer_prompt(질문, 번들 도서에서 뽑은 근거 문단) — 규칙 부분이 모든 요청에 공통
+- sequential : 요청마다 model.generate (greedy), 순서대로
+- engine     : --concurrency 개 스레드가 동시에 llama_server.LlamaEngine 에 요청
+- engine-nopc: 같은 엔진, prefix KV 캐시 끔 (prefix 캐시만의 효과)
+- 출력: 처리 시간, 생성 tokens/s, 요청별 지연(p50/p95), 엔진은 첫 토큰까지 시간(TTFT p50)과 prefix 캐시로 건너뛴 프롬프트 토큰 수
+- --tiny: HF_MODEL 대신 번들 도서로 만든 BPE 토크나이저 + 무작위 초기화 Llama (--tiny-hidden/--tiny-layers)
+          (다운로드 없이 속도만 측정, 답변 내용은 의미 없음)
+
+실행 (backend/ 에서):
+  python bench/llama_batching.py -n 16 --concurrency 8 --max-tokens 64
+  python bench/llama_batching.py --tiny -n 32 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+QUESTIONS = [
+    "김 첨지는 왜 오늘을 운수 좋은 날이라고 생각했나요?",
+    "김 첨지가 설렁탕을 사가려 한 이유는 무엇인가요?",
+    "김 첨지의 아내가 병이 악화된 원인은 무엇이라고 나오나요?",
+    "김 첨지가 집에 돌아가기 싫어했던 이유는 무엇인가요?",
+    "마지막 장면에서 김 첨지는 왜 울다가 웃다가 반복하나요?",
+]
+
+
+def _tiny_model(book: Path, hidden: int, layers: int):
+    """토크나이저(번들 도서로 학습한 byte-level BPE) + 무작위 초기화 Llama (hidden/layers 크기)"""
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    bpe = Tokenizer(models.BPE(unk_token="<unk>"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator([book.read_text(encoding="utf-8")], trainers.BpeTrainer(
+        vocab_size=2000, special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    tok = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<s>", eos_token="</s>", unk_token="<unk>")
+    tok.chat_template = ("<s>{% for m in messages %}[{{ m['role'] }}] {{ m['content'] }}\n{% endfor %}"
+                         "{% if add_generation_prompt %}[assistant] {% endif %}")
+    torch.manual_seed(0)
+    cfg = LlamaConfig(vocab_size=len(tok), hidden_size=hidden, intermediate_size=hidden * 11 // 4,
+                      num_hidden_layers=layers, num_attention_heads=hidden // 64, num_key_value_heads=max(1, hidden // 256),
+                      max_position_embeddings=8192, bos_token_id=1, eos_token_id=2)
+    return tok, LlamaForCausalLM(cfg).eval()
+
+
+def _prompts(ns, book: Path):
+    from model.read_summarize.mvp_reader import build_answer_prompt, make_chunks, read_text
+    rnd = random.Random(0)
+    paras = [p for p in make_chunks(read_text(book)) if len(p) > 80]
+    return [build_answer_prompt(QUESTIONS[i % len(QUESTIONS)], rnd.sample(paras, ns.contexts))
+            for i in range(ns.n)]
+
+
+def _sequential(tok, model, prompts, ns):
+    import torch
+    latency, tokens = [], 0
+    t0 = time.perf_counter()
+    for p in prompts:
+        text = tok.apply_chat_template([{"role": "user", "content": p}], add_generation_prompt=True, tokenize=False)
+        ids = torch.tensor([tok(text, add_special_tokens=False)["input_ids"]])
+        t = time.perf_counter()
+        with torch.inference_mode():
+            out = model.generate(ids, attention_mask=torch.ones_like(ids), max_new_tokens=ns.max_tokens,
+                                 do_sample=False, pad_token_id=tok.eos_token_id)
+        latency.append(time.perf_counter() - t)
+        tokens += out.shape[1] - ids.shape[1]
+    return time.perf_counter() - t0, tokens, latency, []
+
+
+def _engine(tok, model, prompts, ns, prefix: bool):
+    from model.read_summarize import llama_server as L
+    cache = L.PrefixCache() if prefix else L.PrefixCache(max_entries=0)
+    engine = L.LlamaEngine("bench", max_batch=ns.max_batch, prefix_cache=cache, model=model, tokenizer=tok).load()
+    latency, ttft, tokens = [], [], [0]
+    lock = threading.Lock()
+    todo = list(prompts)
+
+    def worker():
+        while True:
+            with lock:
+                if not todo:
+                    return
+                p = todo.pop(0)
+            req = L.GenRequest(engine.encode_chat([{"role": "user", "content": p}]), ns.max_tokens, 0.0, 1.0)
+            r = engine.submit(req).result()
+            with lock:
+                latency.append(time.perf_counter() - req.created)
+                ttft.append(req.first_token - req.created)
+                tokens[0] += r["completion_tokens"]
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(ns.concurrency)]
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return time.perf_counter() - t0, tokens[0], latency, ttft, engine.stats()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="local Llama: sequential generate vs continuous batching engine")
+    ap.add_argument("-n", type=int, default=16, help="요청 수")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--max-batch", type=int, default=8)
+    ap.add_argument("--max-tokens", type=int, default=64)
+    ap.add_argument("--contexts", type=int, default=3, help="프롬프트에 넣을 근거 문단 수")
+    ap.add_argument("--modes", default="sequential,engine,engine-nopc")
+    ap.add_argument("--book", default="luckyday")
+    ap.add_argument("--tiny", action="store_true", help="무작위 초기화 작은 Llama (다운로드 없음)")
+    ap.add_argument("--tiny-hidden", type=int, default=1024, help="--tiny 모델 hidden 크기 (1B Llama: 2048)")
+    ap.add_argument("--tiny-layers", type=int, default=8, help="--tiny 모델 층 수 (1B Llama: 16)")
+    ns = ap.parse_args()
+
+    book = Path(__file__).resolve().parents[1] / "model" / "read_summarize" / f"{ns.book}.txt"
+    if ns.tiny:
+        tok, model = _tiny_model(book, ns.tiny_hidden, ns.tiny_layers)
+        print(f"[INFO] tiny Llama: {sum(p.numel() for p in model.parameters()) / 1e6:.0f}M params")
+    else:
+        from model.read_summarize import llama_server as L
+        engine = L.LlamaEngine().load()
+        tok, model = engine.tok, engine.model
+    prompts = _prompts(ns, book)
+    print(f"[INFO] {len(prompts)} prompts | concurrency={ns.concurrency} max_batch={ns.max_batch} "
+          f"max_tokens={ns.max_tokens}")
+
+    for mode in ns.modes.split(","):
+        stats = None
+        if mode == "sequential":
+            secs, tokens, latency, ttft = _sequential(tok, model, prompts, ns)
+        else:
+            secs, tokens, latency, ttft, stats = _engine(tok, model, prompts, ns, prefix=(mode == "engine"))
+        q = statistics.quantiles(latency, n=20) if len(latency) > 1 else latency * 19
+        line = (f"[OK] {mode:<11} | {secs:7.1f}s | {tokens:6d} tokens | {tokens / secs:7.1f} tok/s | "
+                f"latency p50 {statistics.median(latency):6.2f}s p95 {q[18]:6.2f}s")
+        if stats is not None:
+            pc = stats["prefix_cache"]
+            line += (f" | TTFT p50 {statistics.median(ttft):5.2f}s | avg batch {stats['avg_batch']:.1f} | "
+                     f"prefix 재사용 {pc['reused_tokens']} tokens ({pc['hits']} hits)")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
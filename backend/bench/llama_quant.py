@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+로컬 Llama 가중치 양자화: float32 vs int8 (torch dynamic) vs gguf (llama.cpp, int4 등)
+
+- 프롬프트: llama_batching 과 같은 build_answer_prompt(번들 도서 질문 + 근거 문단)
+- 모드마다 새 프로세스에서 모델 로딩 → 요청을 하나씩 greedy 생성 (llama_chat 과 같은 엔진 경로)
+- 출력: 로딩 시간, 로딩 후 RSS, 최대 RSS(로딩 중 포함), 생성 tokens/s, 평균 첫 토큰 시간(prefill),
+        float32 와 답이 같은 요청 수
+- --tiny: 무작위 초기화 Llama (다운로드 없이 속도 / 메모리만, 답 일치율은 의미 없음). gguf 는 제외
+- gguf: --gguf (또는 LLAMA_GGUF) 에 HF_MODEL 을 변환한 파일, pip install llama-cpp-python 필요
+
+실행 (backend/ 에서, Linux — RSS 는 /proc 와 getrusage 로 측정):
+  python bench/llama_quant.py -n 8 --max-tokens 64 --gguf models/Llama-3.2-1B-Instruct-Q4_K_M.gguf
+  python bench/llama_quant.py --tiny --modes fp32,int8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+
+def _rss_mb() -> tuple[float, float]:
+    """(현재 RSS, 최대 RSS) MB"""
+    cur = peak = 0.0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    cur = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return cur, peak
+
+
+def _worker(ns) -> dict:
+    """한 모드 측정 (별도 프로세스) → dict"""
+    from llama_batching import _prompts, _tiny_model
+    from model.read_summarize import llama_server as L
+
+    book = Path(__file__).resolve().parents[1] / "model" / "read_summarize" / f"{ns.book}.txt"
+    prompts = _prompts(ns, book)
+    quant = "none" if ns.worker == "fp32" else ns.worker
+    import torch  # noqa: F401  (라이브러리 메모리는 RSS 증가분에서 제외)
+    base_rss, _ = _rss_mb()
+    t0 = time.perf_counter()
+    if ns.worker == "gguf":
+        engine = L.GGUFEngine(gguf_path=ns.gguf).load()
+    elif ns.tiny:
+        tok, model = _tiny_model(book, ns.tiny_hidden, ns.tiny_layers)
+        if quant == "int8":
+            L.quantize_int8(model)
+        engine = L.LlamaEngine("bench", model=model, tokenizer=tok, quant=quant).load()
+    else:
+        engine = L.LlamaEngine(quant=quant).load()
+    load_s = time.perf_counter() - t0
+    load_rss, _ = _rss_mb()
+
+    texts, ttft, tokens = [], [], 0
+    t0 = time.perf_counter()
+    for p in prompts:
+        req = L.GenRequest(engine.encode_chat([{"role": "user", "content": p}]), ns.max_tokens, 0.0, 1.0)
+        r = engine.submit(req).result()
+        texts.append(r["text"])
+        ttft.append(req.first_token - req.created)
+        tokens += r["completion_tokens"]
+    secs = time.perf_counter() - t0
+    _, peak = _rss_mb()
+    return {"mode": ns.worker, "load_s": load_s, "rss_mb": load_rss - base_rss, "peak_mb": peak,
+            "secs": secs, "tokens": tokens, "ttft": sum(ttft) / len(ttft), "texts": texts}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="local Llama: float32 vs int8 vs gguf (tokens/s, RSS)")
+    ap.add_argument("-n", type=int, default=8, help="요청 수")
+    ap.add_argument("--max-tokens", type=int, default=64)
+    ap.add_argument("--contexts", type=int, default=3, help="프롬프트에 넣을 근거 문단 수")
+    ap.add_argument("--modes", default="fp32,int8,gguf")
+    ap.add_argument("--gguf", default=os.getenv("LLAMA_GGUF", ""), help="gguf 모드 모델 파일")
+    ap.add_argument("--book", default="luckyday")
+    ap.add_argument("--tiny", action="store_true", help="무작위 초기화 작은 Llama (다운로드 없음)")
+    ap.add_argument("--tiny-hidden", type=int, default=1024)
+    ap.add_argument("--tiny-layers", type=int, default=8)
+    ap.add_argument("--worker", help=argparse.SUPPRESS)
+    ns = ap.parse_args()
+
+    if ns.worker:
+        print(json.dumps(_worker(ns), ensure_ascii=False))
+        return
+
+    print(f"[INFO] {ns.n} prompts | max_tokens={ns.max_tokens} | {'tiny' if ns.tiny else 'HF_MODEL'}")
+    base = None
+    for mode in ns.modes.split(","):
+        if mode == "gguf" and (ns.tiny or not ns.gguf):
+            print("[WARN] gguf 건너뜀: --gguf 파일 필요 (--tiny 와 같이 쓸 수 없음)")
+            continue
+        cmd = [sys.executable, __file__, "--worker", mode] + sys.argv[1:]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"[WARN] {mode} 실패:\n{proc.stderr.strip()[-2000:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        if mode == "fp32":
+            base = r["texts"]
+        same = f" | fp32 와 같은 답 {sum(a == b for a, b in zip(base, r['texts']))}/{len(r['texts'])}" if base else ""
+        print(f"[OK] {mode:<5} | load {r['load_s']:5.1f}s | RSS +{r['rss_mb']:7.0f}MB (peak {r['peak_mb']:7.0f}MB) | "
+              f"{r['tokens'] / r['secs']:6.1f} tok/s | prefill {r['ttft']:5.2f}s{same}")
+
+
+if __name__ == "__main__":
+    main()
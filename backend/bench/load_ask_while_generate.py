@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+부하 테스트: /generate 가 바쁠 때도 /ask 지연(p99)이 유지되는지 확인
+
+  1) baseline: /ask 만 일정 RPS로 호출
+  2) busy:     /generate 를 동시에 계속 호출하면서 같은 RPS로 /ask 호출
+  → 두 구간의 p50/p99 를 비교하고, p99 비율이 --max-ratio 를 넘으면 exit 1
+
+예시 (backend/ 에서 서버 실행 후):
+  uvicorn app:app --port 8000
+  python bench/load_ask_while_generate.py --doc-id luckyday --rps 4 --duration 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+
+def _pct(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def _ask_loop(client: httpx.AsyncClient, ns, latencies: list, errors: list):
+    interval = 1.0 / ns.rps
+    deadline = time.perf_counter() + ns.duration
+    tasks = []
+
+    async def one():
+        t0 = time.perf_counter()
+        try:
+            r = await client.post("/ask", json={"doc_id": ns.doc_id, "question": ns.question, "k": ns.k})
+            if r.status_code != 200:
+                errors.append(r.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    # open-loop: 응답을 기다리지 않고 일정 간격으로 발사
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.create_task(one()))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+
+
+async def _generate_loop(client: httpx.AsyncClient, ns, stop: asyncio.Event, done: list):
+    while not stop.is_set():
+        try:
+            r = await client.post("/generate", data={"prompt": ns.prompt, "steps": ns.steps},
+                                  timeout=None)
+            done.append(r.status_code)
+        except httpx.HTTPError as e:
+            done.append(type(e).__name__)
+
+
+def _report(name, latencies, errors):
+    print(f"[{name}] n={len(latencies)} errors={len(errors)} "
+          f"p50={_pct(latencies, .50):.1f}ms p95={_pct(latencies, .95):.1f}ms "
+          f"p99={_pct(latencies, .99):.1f}ms mean={statistics.fmean(latencies):.1f}ms")
+
+
+async def main(ns) -> int:
+    async with httpx.AsyncClient(base_url=ns.base_url, timeout=ns.timeout) as client:
+        base_lat, base_err = [], []
+        await _ask_loop(client, ns, base_lat, base_err)
+        _report("baseline", base_lat, base_err)
+
+        stop, gen_done = asyncio.Event(), []
+        gens = [asyncio.create_task(_generate_loop(client, ns, stop, gen_done))
+                for _ in range(ns.generate_concurrency)]
+        await asyncio.sleep(ns.warmup)  # /generate 가 실제로 돌기 시작할 때까지
+        busy_lat, busy_err = [], []
+        await _ask_loop(client, ns, busy_lat, busy_err)
+        stop.set()
+        _report("busy", busy_lat, busy_err)
+        print(f"[generate] finished={len(gen_done)} (in-flight 요청은 끝날 때까지 대기)")
+
+        pools = (await client.get("/stats/pools")).json()
+        for name, st in pools.items():
+            print(f"[pool:{name}] {st}")
+
+        for g in gens:
+            g.cancel()
+
+    ratio = _pct(busy_lat, .99) / _pct(base_lat, .99)
+    print(f"p99 ratio busy/baseline = {ratio:.2f} (max {ns.max_ratio})")
+    return 0 if ratio <= ns.max_ratio else 1
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="/ask p99 under /generate load")
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--doc-id", default="luckyday")
+    ap.add_argument("--question", default="김 첨지는 왜 오늘을 운수 좋은 날이라고 생각했나요?")
+    ap.add_argument("-k", type=int, default=6)
+    ap.add_argument("--rps", type=float, default=4.0)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--prompt", default="rainy alley in seoul, watercolor style")
+    ap.add_argument("--steps", type=int, default=20)
+    ap.add_argument("--generate-concurrency", type=int, default=2)
+    ap.add_argument("--warmup", type=float, default=3.0)
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--max-ratio", type=float, default=1.5)
+    sys.exit(asyncio.run(main(ap.parse_args())))
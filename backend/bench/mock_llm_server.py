@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+오프라인 벤치마크용 OpenAI 호환 가짜 LLM 서버 (/v1/chat/completions)
+
+- 첫 토큰까지 --ttft-ms, 이후 토큰마다 --token-ms 만큼 지연
+- stream=true 면 SSE chunk 로, 아니면 전체 응답을 한 번에 반환
+- --rate-limit 확률로 429 (Retry-After) 를 돌려줘 재시도 로직을 시험
+
+예시:
+  python bench/mock_llm_server.py --port 8900 --ttft-ms 400 --token-ms 25
+  OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock uvicorn app:app
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    cfg: argparse.Namespace
+    counter = {"requests": 0, "rate_limited": 0}
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):  # 요청 로그 생략
+        pass
+
+    def _tokens(self, prompt: str, max_tokens: int):
+        n = min(self.cfg.tokens, max_tokens or self.cfg.tokens)
+        seed = sum(map(ord, prompt[:200]))
+        return [f"토큰{(seed + i) % 97} " for i in range(n)]
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.lock:
+            self.counter["requests"] += 1
+            limited = random.random() < self.cfg.rate_limit
+            if limited:
+                self.counter["rate_limited"] += 1
+        if limited:
+            payload = json.dumps({"error": {"message": "rate limited (mock)", "type": "rate_limit"}}).encode()
+            self.send_response(429)
+            self.send_header("Retry-After", "0.2")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        tokens = self._tokens(prompt, body.get("max_tokens"))
+        model = body.get("model", "mock")
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        time.sleep(self.cfg.ttft_ms / 1000)
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, tok in enumerate(tokens):
+                if i:
+                    time.sleep(self.cfg.token_ms / 1000)
+                chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model,
+                         "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        time.sleep(self.cfg.token_ms * max(0, len(tokens) - 1) / 1000)
+        payload = json.dumps({
+            "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(tokens).strip()}}],
+            "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(tokens),
+                      "total_tokens": len(prompt) // 2 + len(tokens)},
+        }, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start(port: int = 8900, ttft_ms: float = 400, token_ms: float = 25, tokens: int = 60,
+          rate_limit: float = 0.0) -> ThreadingHTTPServer:
+    """다른 벤치 스크립트에서 같은 프로세스로 띄울 때 사용 (백그라운드 스레드)"""
+    cfg = argparse.Namespace(ttft_ms=ttft_ms, token_ms=token_ms, tokens=tokens, rate_limit=rate_limit)
+    handler = type("Handler", (MockLLMHandler,), {"cfg": cfg})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OpenAI-compatible mock LLM server")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--ttft-ms", type=float, default=400)
+    ap.add_argument("--token-ms", type=float, default=25)
+    ap.add_argument("--tokens", type=int, default=60)
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="429 응답 확률 (0~1)")
+    ns = ap.parse_args()
+    srv = start(ns.port, ns.ttft_ms, ns.token_ms, ns.tokens, ns.rate_limit)
+    print(f"[mock-llm] http://127.0.0.1:{ns.port}/v1 (ttft={ns.ttft_ms}ms, token={ns.token_ms}ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+요약 트리(map-reduce) 생성 시간: 동시 요청 수(RAG_SUMMARY_CONCURRENCY)별 비교
+
+- 같은 프로세스에 mock LLM 서버(bench/mock_llm_server.py)를 띄워 지연/429 비율을 재현
+- 동시 요청 수마다 빈 스토리지에서 트리를 새로 만들고, 요약 순서가 직렬 결과와 같은지 확인
+
+실행 (backend/ 에서):
+  python bench/summarize_mapreduce.py --path model/read_summarize/romeoandjuliet.txt \
+      --concurrency 1,4,8,16 --ttft-ms 300 --rate-limit 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import mock_llm_server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="summary tree build time vs concurrency (mock LLM)")
+    ap.add_argument("--path", default="model/read_summarize/romeoandjuliet.txt")
+    ap.add_argument("--unit", choices=["para", "sent"], default="para")
+    ap.add_argument("--concurrency", default="1,4,8,16")
+    ap.add_argument("--port", type=int, default=8901)
+    ap.add_argument("--ttft-ms", type=float, default=300)
+    ap.add_argument("--token-ms", type=float, default=5)
+    ap.add_argument("--tokens", type=int, default=40)
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="mock 서버의 429 응답 확률")
+    ns = ap.parse_args()
+
+    mock_llm_server.start(ns.port, ns.ttft_ms, ns.token_ms, ns.tokens, ns.rate_limit)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{ns.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["LLM_CACHE"] = "0"  # 매 실행이 실제로 LLM을 부르도록
+    from model.read_summarize import mvp_reader as R, rag_store
+
+    chunks = R.make_chunks(R.read_text(Path(ns.path)), unit=ns.unit)
+    counter = mock_llm_server.MockLLMHandler.counter
+    print(f"[INFO] chunks={len(chunks)} ttft={ns.ttft_ms}ms rate_limit={ns.rate_limit}")
+
+    baseline = None
+    for concurrency in [int(c) for c in ns.concurrency.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            rag_store.STORAGE_ROOT = Path(tmp)
+            (rag_store.STORAGE_ROOT / "bench").mkdir()
+            before = dict(counter)
+            R.set_summary_concurrency(concurrency)
+            t0 = time.perf_counter()
+            tree = R.build_summary_tree("bench", chunks, concurrency=concurrency)
+            elapsed = time.perf_counter() - t0
+        summaries = [n["summary"] for level in tree.levels for n in level]
+        if baseline is None:
+            baseline = summaries
+        requests = counter["requests"] - before["requests"]
+        limited = counter["rate_limited"] - before["rate_limited"]
+        print(f"[OK] concurrency={concurrency:>3} | {elapsed:6.2f}s | nodes={len(summaries)} "
+              f"requests={requests} 429={limited} | order_ok={summaries == baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTFB 벤치마크: 일반 엔드포인트 vs /stream 엔드포인트
+
+- 일반(/summarize_text 등): 전체 답변이 끝나야 첫 바이트 → TTFB ≈ 전체 시간
+- 스트리밍(/summarize_text/stream): 첫 token 이벤트까지의 시간
+
+오프라인 실행 (backend/ 에서):
+  python bench/mock_llm_server.py --port 8900 --ttft-ms 400 --token-ms 25 &
+  OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock uvicorn app:app --port 8000 &
+  python bench/ttfb_stream.py --endpoint summarize_text -n 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import httpx
+
+BODIES = {
+    "summarize_text": lambda ns: {"text": ns.text, "sentences": 2},
+    "ask": lambda ns: {"doc_id": ns.doc_id, "question": ns.question, "k": 6},
+    "summarize": lambda ns: {"doc_id": ns.doc_id, "sentences": 5},
+}
+
+
+def _measure_plain(client: httpx.Client, path: str, body: dict) -> float:
+    t0 = time.perf_counter()
+    with client.stream("POST", path, json=body) as r:
+        for _ in r.iter_bytes():
+            return (time.perf_counter() - t0) * 1000
+    return (time.perf_counter() - t0) * 1000
+
+
+def _measure_stream(client: httpx.Client, path: str, body: dict):
+    t0 = time.perf_counter()
+    first_byte = first_token = None
+    with client.stream("POST", path, json=body) as r:
+        for line in r.iter_lines():
+            now = (time.perf_counter() - t0) * 1000
+            if first_byte is None:
+                first_byte = now
+            if line.startswith("event: token") and first_token is None:
+                first_token = now
+    return first_byte, first_token, (time.perf_counter() - t0) * 1000
+
+
+def _fmt(values):
+    return f"p50={statistics.median(values):.0f}ms max={max(values):.0f}ms"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="TTFB: plain vs streaming endpoints")
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--endpoint", choices=sorted(BODIES), default="summarize_text")
+    ap.add_argument("-n", type=int, default=10)
+    ap.add_argument("--doc-id", default="luckyday")
+    ap.add_argument("--question", default="김 첨지가 설렁탕을 사가려 한 이유는 무엇인가요?")
+    ap.add_argument("--text", default="새침하게 흐린 품이 눈이 올 듯하더니 눈은 아니 오고 얼다가 만 비가 "
+                                      "추적추적 내리는 날이었다.")
+    ns = ap.parse_args()
+
+    body = BODIES[ns.endpoint](ns)
+    plain, byte, token, total = [], [], [], []
+    with httpx.Client(base_url=ns.base_url, timeout=120) as client:
+        for _ in range(ns.n):
+            plain.append(_measure_plain(client, f"/{ns.endpoint}", body))
+            b, t, d = _measure_stream(client, f"/{ns.endpoint}/stream", body)
+            byte.append(b)
+            token.append(t if t is not None else d)
+            total.append(d)
+
+    print(f"[/{ns.endpoint}]         TTFB   {_fmt(plain)}")
+    print(f"[/{ns.endpoint}/stream]  TTFB   {_fmt(byte)}")
+    print(f"[/{ns.endpoint}/stream]  1st token {_fmt(token)}  total {_fmt(total)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+워크로드별 실행 풀 (FastAPI 이벤트 루프를 막지 않기 위한 bounded pool)
+
+- llm:       OpenAI 등 네트워크 I/O (AsyncOpenAI 코루틴은 동시성만 제한)
+- embed:     질의 임베딩 + BM25/FAISS 검색 (CPU)
+- ingest:    문서 분할/임베딩/인덱스 저장
+(Stable Diffusion 은 별도 워커 프로세스 — model/generate/diffusion_worker.py)
+
+각 풀은 대기열 상한(max_pending)을 넘으면 PoolFullError 를 던지고,
+대기 깊이 / 대기 시간 / 실행 시간 지표를 stats() 로 제공한다.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+_LATENCY_WINDOW = 512  # 최근 N건으로 p50/p99 계산
+
+
+class PoolFullError(RuntimeError):
+    """풀 대기열이 가득 찼을 때 (HTTP 503으로 응답)"""
+
+    def __init__(self, name: str, pending: int):
+        super().__init__(f"[{name}] 요청이 많아 처리할 수 없습니다 (대기 {pending}건)")
+        self.name = name
+        self.pending = pending
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class WorkPool:
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=f"pool-{name}")
+        self._semaphore = None  # run_async 용 (이벤트 루프에서 lazy 생성)
+        self._lock = threading.Lock()
+        self.pending = 0    # 대기 + 실행 중
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_ms = deque(maxlen=_LATENCY_WINDOW)
+        self._run_ms = deque(maxlen=_LATENCY_WINDOW)
+
+    # ---------- 내부 ----------
+    def _admit(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolFullError(self.name, self.pending)
+        self.pending += 1
+
+    def _started(self, enqueued: float) -> float:
+        start = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self._wait_ms.append((start - enqueued) * 1000)
+        return start
+
+    def _finished(self, start: float, ok: bool):
+        with self._lock:
+            self.running -= 1
+            self._run_ms.append((time.perf_counter() - start) * 1000)
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    # ---------- 공개 API ----------
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """블로킹 함수를 전용 스레드 풀에서 실행"""
+        self._admit()
+        return await self._run_admitted(fn, args, kwargs)
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "asyncio.Task[T]":
+        """run() 을 기다리지 않고 백그라운드 작업으로 (대기열이 가득 차면 호출 시점에 PoolFullError)"""
+        self._admit()
+        return asyncio.ensure_future(self._run_admitted(fn, args, kwargs))
+
+    async def _run_admitted(self, fn: Callable[..., T], args, kwargs) -> T:
+        enqueued = time.perf_counter()
+
+        def task():
+            start = self._started(enqueued)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                self._finished(start, ok)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, task)
+        finally:
+            self.pending -= 1
+
+    async def run_async(self, coro_fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """코루틴(AsyncOpenAI 등)은 스레드 없이 동시 실행 수만 max_workers로 제한"""
+        self._admit()
+        enqueued = time.perf_counter()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        try:
+            async with self._semaphore:
+                start = self._started(enqueued)
+                ok = False
+                try:
+                    result = await coro_fn(*args, **kwargs)
+                    ok = True
+                    return result
+                finally:
+                    self._finished(start, ok)
+        finally:
+            self.pending -= 1
+
+    async def run_stream(self, agen_fn: Callable[..., AsyncIterator[T]], *args,
+                         **kwargs) -> AsyncIterator[T]:
+        """스트리밍 응답(async generator)은 마지막 조각까지 슬롯을 잡고 있음"""
+        self._admit()
+        enqueued = time.perf_counter()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        try:
+            async with self._semaphore:
+                start = self._started(enqueued)
+                ok = False
+                try:
+                    async for item in agen_fn(*args, **kwargs):
+                        yield item
+                    ok = True
+                finally:
+                    self._finished(start, ok)
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            wait, run = list(self._wait_ms), list(self._run_ms)
+            running = self.running
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queue_depth": self.pending - running,
+            "running": running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(_percentile(wait, 0.50), 2),
+            "wait_ms_p99": round(_percentile(wait, 0.99), 2),
+            "run_ms_p50": round(_percentile(run, 0.50), 2),
+            "run_ms_p99": round(_percentile(run, 0.99), 2),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+pools: Dict[str, WorkPool] = {
+    "llm": WorkPool("llm", _env_int("POOL_LLM_WORKERS", 32), _env_int("POOL_LLM_PENDING", 256)),
+    "embed": WorkPool("embed", _env_int("POOL_EMBED_WORKERS", 2), _env_int("POOL_EMBED_PENDING", 64)),
+    "ingest": WorkPool("ingest", _env_int("POOL_INGEST_WORKERS", 1), _env_int("POOL_INGEST_PENDING", 8)),
+}
+
+
+def pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in pools.items()}
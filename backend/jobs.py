@@ -0,0 +1,137 @@
+"""
+백그라운드 작업(Job) 상태 저장소
+
+- 작업 상태/진행률/결과를 메모리에 보관 (완료된 작업은 max_finished 개까지만, 오래된 것부터 제거)
+- idempotency key 로 같은 요청의 재시도/재접속이 기존 작업을 그대로 돌려받게 함
+- update()는 어느 스레드에서 불러도 되고, watch()는 변경될 때마다 스냅샷을 내보냄 (SSE 용)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+FINISHED = ("done", "error")
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    status: str = "queued"          # queued | running | done | error
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    key: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    version: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        out = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        if include_result:
+            out["result"] = self.result
+        return out
+
+
+class JobStore:
+    def __init__(self, max_finished: int = 64):
+        self.max_finished = max_finished
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, kind: str, key: Optional[str] = None) -> Tuple[Job, bool]:
+        """(job, created) — key가 같은 작업이 남아있으면 새로 만들지 않음"""
+        with self._lock:
+            if key is not None and key in self._by_key:
+                job = self._jobs.get(self._by_key[key])
+                if job is not None and job.status != "error":
+                    return job, False
+            job = Job(job_id=uuid.uuid4().hex, kind=kind, key=key)
+            self._jobs[job.job_id] = job
+            if key is not None:
+                self._by_key[key] = job.job_id
+            return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            job.version += 1
+            if job.finished:
+                self._jobs.move_to_end(job_id)
+                self._evict()
+            waiters = self._waiters.pop(job_id, [])
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_wake, fut)
+
+    def _evict(self):
+        finished = [j for j in self._jobs.values() if j.finished]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.job_id]
+            if job.key is not None and self._by_key.get(job.key) == job.job_id:
+                del self._by_key[job.key]
+
+    async def watch(self, job_id: str, keepalive: float = 15.0) -> AsyncIterator[Optional[Job]]:
+        """변경될 때마다 job을 내보내고, 변경이 없으면 keepalive 초마다 None (완료 시 종료)"""
+        seen = -1
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if job.version == seen:
+                    fut = loop.create_future()
+                    self._waiters.setdefault(job_id, []).append((loop, fut))
+                else:
+                    fut = None
+            if fut is None:
+                seen = job.version
+                yield job
+                if job.finished:
+                    return
+                continue
+            try:
+                await asyncio.wait_for(fut, timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": counts, "max_finished": self.max_finished}
+
+
+def _wake(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
@@ -0,0 +1,452 @@
+"""
+Stable Diffusion 전용 워커 프로세스 (요청 큐 + micro-batching)
+
+- 워커 프로세스 1개가 파이프라인(약 4GB)을 들고, 로컬 포트의 multiprocessing manager로
+  job 큐를 노출한다. 여러 uvicorn 워커는 같은 주소로 접속하므로 모델이 중복 로딩되지 않는다.
+- 같은 (steps, height, width) 요청은 max_wait 동안 모아 최대 max_batch 개를
+  한 번의 pipe([prompt, ...]) 호출로 처리한다.
+- diffusers step callback 으로 ("progress", job_id, (step, total)) 를 결과 큐에 흘려보낸다.
+- 파이프라인은 PipelineHolder 가 lock 으로 한 번만 로딩하고, 로딩 직후 적은 step 의 dummy 추론으로
+  커널 / 버퍼를 미리 준비한다. DIFFUSION_PRELOAD=1 이면 워커가 뜨자마자 백그라운드로 로딩
+  (첫 사용자 요청이 모델 로딩을 기다리지 않음). 상태(state)는 stats() 로 앱의 /ready 에 노출된다.
+
+단독 실행 (uvicorn 워커가 여러 개일 때 권장):
+  python -m model.generate.diffusion_worker      # backend/ 에서
+앱은 DIFFUSION_WORKER_ADDR 로 접속하고, 워커가 없으면 자식 프로세스로 직접 띄운다.
+
+인증: manager 는 받은 메시지를 unpickle 하므로 키를 아는 프로세스는 워커 안에서 코드를 실행할 수 있다.
+DIFFUSION_WORKER_AUTHKEY 가 없으면 처음 쓰는 프로세스가 무작위 키를 만들어 DIFFUSION_WORKER_KEYFILE
+(기본 ~/.cache/readingmate/diffusion_worker.key, 권한 600)에 저장 → 같은 사용자의 앱 / 워커만 공유.
+여러 사용자·호스트에서 접속하면 DIFFUSION_WORKER_AUTHKEY 를 직접 지정한다.
+"""
+
+from __future__ import annotations
+
+import base64
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from io import BytesIO
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+SD_MODEL_PATH = Path(__file__).resolve().parent / "models" / "stable_diffusion"
+
+DEFAULT_ADDR = os.getenv("DIFFUSION_WORKER_ADDR", "127.0.0.1:50055")
+_KEYFILE = Path(os.getenv("DIFFUSION_WORKER_KEYFILE",
+                          str(Path.home() / ".cache" / "readingmate" / "diffusion_worker.key")))
+MAX_BATCH = int(os.getenv("DIFFUSION_MAX_BATCH", "4"))
+MAX_WAIT_MS = float(os.getenv("DIFFUSION_MAX_WAIT_MS", "200"))
+PRELOAD = os.getenv("DIFFUSION_PRELOAD", "1") == "1"
+WARMUP_STEPS = int(os.getenv("DIFFUSION_WARMUP_STEPS", "1"))      # 로딩 직후 dummy 추론 step 수 (0이면 안 함)
+READY_TIMEOUT_S = float(os.getenv("DIFFUSION_READY_TIMEOUT_S", "900"))
+_CONNECT_TIMEOUT_S = 60.0
+
+
+def _parse_addr(addr: str) -> Tuple[str, int]:
+    host, port = addr.rsplit(":", 1)
+    return host, int(port)
+
+
+def worker_authkey() -> bytes:
+    """DIFFUSION_WORKER_AUTHKEY, 없으면 키 파일 (없으면 무작위로 만들어 원자적으로 생성 — 동시에 뜬 워커끼리 같은 키)"""
+    key = os.getenv("DIFFUSION_WORKER_AUTHKEY")
+    if key:
+        return key.encode()
+    try:
+        return _KEYFILE.read_bytes().strip()
+    except FileNotFoundError:
+        pass
+    _KEYFILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _KEYFILE.with_name(f"{_KEYFILE.name}.{uuid.uuid4().hex}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secrets.token_hex(32).encode())
+    try:
+        os.link(tmp, _KEYFILE)  # 이미 있으면 실패 → 먼저 만든 쪽 키를 씀
+    except FileExistsError:
+        pass
+    finally:
+        tmp.unlink()
+    return _KEYFILE.read_bytes().strip()
+
+
+@dataclass
+class DiffusionJob:
+    job_id: str
+    client_id: str
+    prompt: str
+    steps: int
+    height: Optional[int] = None
+    width: Optional[int] = None
+
+    @property
+    def batch_key(self) -> Tuple:
+        return (self.steps, self.height, self.width)
+
+
+# =========================================================
+# 워커 프로세스 쪽
+# =========================================================
+def load_pipeline(model_path: Path):
+    import torch
+    from diffusers import StableDiffusionPipeline, DDIMScheduler
+
+    print(f"🚀 Loading Stable Diffusion from {model_path} ...")
+    # 디바이스 선택
+    if torch.backends.mps.is_available():
+        device = torch.device("mps")
+        dtype = torch.float16
+        print("✅ Using Apple MPS (float16)")
+    else:
+        device = torch.device("cpu")
+        dtype = torch.float32
+        print("✅ Using CPU (float32)")
+
+    pipe = StableDiffusionPipeline.from_pretrained(
+        str(model_path),
+        torch_dtype=dtype,
+        safety_checker=None,
+        local_files_only=True,
+    )
+    pipe.scheduler = DDIMScheduler.from_config(pipe.scheduler.config)
+    pipe.to(device)
+    print("✅ Stable Diffusion Ready.")
+    return pipe
+
+
+class PipelineHolder:
+    """
+    파이프라인을 프로세스에서 정확히 한 번 로딩 (from_pretrained + warm-up 추론)
+    preload 스레드와 배치 루프가 동시에 get() 해도 로딩은 lock 안에서 한 번 — 늦게 온 쪽은 기다렸다 같은 pipe 사용
+    실패하면 다음 get() / preload() 때 다시 시도
+    counters (broker stats) 에 state: idle | loading | warming | ready | error, load_s, warmup_s, load_error 기록
+    """
+
+    def __init__(self, model_path: Path, counters: dict, warmup_steps: int = WARMUP_STEPS):
+        self.model_path = Path(model_path)
+        self.counters = counters
+        self.warmup_steps = warmup_steps
+        self._lock = threading.Lock()
+        self._pipe = None
+        counters.update({"state": "idle", "loads": 0, "load_s": None, "warmup_s": None, "load_error": None})
+
+    def get(self):
+        if self._pipe is None:
+            with self._lock:
+                if self._pipe is None:
+                    self._pipe = self._load()
+        return self._pipe
+
+    def _load(self):
+        c = self.counters
+        c.update(state="loading", load_error=None)
+        try:
+            t0 = time.perf_counter()
+            pipe = load_pipeline(self.model_path)
+            c["loads"] += 1
+            c["load_s"] = round(time.perf_counter() - t0, 2)
+            if self.warmup_steps > 0:
+                # 기본 해상도로 한 번 돌려 첫 요청의 커널 선택 / 메모리 할당 비용을 미리 치름
+                c["state"] = "warming"
+                t0 = time.perf_counter()
+                pipe("warm-up", num_inference_steps=self.warmup_steps)
+                c["warmup_s"] = round(time.perf_counter() - t0, 2)
+        except Exception as e:
+            c.update(state="error", load_error=f"{type(e).__name__}: {e}")
+            raise
+        c.update(state="ready", loaded=True)
+        return pipe
+
+    def _preload(self):
+        try:
+            self.get()
+        except Exception as e:
+            print(f"[diffusion] preload 실패: {e}")
+
+    def preload(self) -> str:
+        """백그라운드 로딩 시작 (이미 로딩 중 / 완료면 아무것도 안 함) → 현재 state"""
+        if self._pipe is None and not self._lock.locked():
+            self.counters.update(state="loading", load_error=None)
+            threading.Thread(target=self._preload, name="diffusion-preload", daemon=True).start()
+        return self.counters["state"]
+
+
+def _to_png_base64(img) -> str:
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class _Broker:
+    """워커 프로세스 안에서 manager로 노출되는 job 큐 / 클라이언트별 결과 큐"""
+
+    def __init__(self):
+        self.jobs: "queue.Queue[DiffusionJob]" = queue.Queue()
+        self._results: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+        self.counters = {"jobs": 0, "batches": 0, "errors": 0, "loaded": False}
+
+    def results(self, client_id: str) -> queue.Queue:
+        with self._lock:
+            return self._results.setdefault(client_id, queue.Queue())
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+        out["queue_depth"] = self.jobs.qsize()
+        out["avg_batch"] = round(out["jobs"] / out["batches"], 2) if out["batches"] else 0.0
+        return out
+
+
+class _BrokerManager(BaseManager):
+    pass
+
+
+# 클라이언트용 등록 (워커 프로세스에서는 serve()가 callable과 함께 다시 등록)
+for _name in ("jobs", "results", "stats", "preload"):
+    _BrokerManager.register(_name)
+
+
+def _collect_batch(jobs: "queue.Queue[DiffusionJob]", deferred: Deque[DiffusionJob],
+                   max_batch: int, max_wait_s: float) -> List[DiffusionJob]:
+    """첫 job과 batch_key가 같은 job을 max_wait 동안 최대 max_batch개 모음 (나머지는 deferred)"""
+    first = deferred.popleft() if deferred else jobs.get()
+    batch = [first]
+
+    # 앞서 미뤄둔 job 중 같은 key 먼저
+    for job in list(deferred):
+        if len(batch) >= max_batch:
+            break
+        if job.batch_key == first.batch_key:
+            deferred.remove(job)
+            batch.append(job)
+
+    deadline = time.monotonic() + max_wait_s
+    while len(batch) < max_batch:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            job = jobs.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if job.batch_key == first.batch_key:
+            batch.append(job)
+        else:
+            deferred.append(job)
+    return batch
+
+
+def serve(model_path: str = str(SD_MODEL_PATH), address: str = DEFAULT_ADDR,
+          max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS, preload: bool = PRELOAD,
+          authkey: Optional[bytes] = None):
+    """
+    워커 메인 루프: manager 서버는 스레드에서, 배치 추론은 메인 스레드에서 (preload 면 로딩은 별도 스레드에서 바로 시작)
+    authkey: 없으면 worker_authkey() (앱이 띄울 때는 앱의 키를 그대로 넘김)
+    """
+    broker = _Broker()
+    holder = PipelineHolder(Path(model_path), broker.counters)
+    _BrokerManager.register("jobs", callable=lambda: broker.jobs)
+    _BrokerManager.register("results", callable=broker.results)
+    _BrokerManager.register("stats", callable=broker.stats)
+    _BrokerManager.register("preload", callable=holder.preload)
+    manager = _BrokerManager(address=_parse_addr(address), authkey=authkey or worker_authkey())
+    server = manager.get_server()  # 포트가 이미 사용 중이면 여기서 OSError
+    threading.Thread(target=server.serve_forever, name="diffusion-broker", daemon=True).start()
+    print(f"[diffusion] worker listening on {address} (max_batch={max_batch}, max_wait={max_wait_ms}ms)")
+    if preload:
+        holder.preload()
+
+    deferred: Deque[DiffusionJob] = deque()
+    while True:
+        batch = _collect_batch(broker.jobs, deferred, max_batch, max_wait_ms / 1000)
+        steps, height, width = batch[0].batch_key
+        kwargs = {"num_inference_steps": steps}
+        if height:
+            kwargs["height"] = height
+        if width:
+            kwargs["width"] = width
+
+        def on_step_end(_pipe, step, _timestep, callback_kwargs):
+            for job in batch:
+                broker.results(job.client_id).put(("progress", job.job_id, (step + 1, steps)))
+            return callback_kwargs
+
+        try:
+            for job in batch:
+                broker.results(job.client_id).put(("progress", job.job_id, (0, steps)))
+            pipe = holder.get()  # preload 중이면 끝날 때까지 대기 (두 번 로딩하지 않음)
+            images = pipe([job.prompt for job in batch], callback_on_step_end=on_step_end,
+                          **kwargs).images
+            for job, img in zip(batch, images):
+                broker.results(job.client_id).put(("done", job.job_id, _to_png_base64(img)))
+        except Exception as e:
+            broker.counters["errors"] += 1
+            for job in batch:
+                broker.results(job.client_id).put(("error", job.job_id, str(e)))
+        broker.counters["jobs"] += len(batch)
+        broker.counters["batches"] += 1
+
+
+# =========================================================
+# 앱(uvicorn 워커) 쪽
+# =========================================================
+class DiffusionClient:
+    """
+    diffusion 워커에 job을 넣고 concurrent.futures.Future 로 결과(PNG base64)를 받는다.
+    워커에 접속할 수 없으면 spawn=True 일 때 자식 프로세스로 워커를 띄운다.
+    """
+
+    def __init__(self, model_path: Path = SD_MODEL_PATH, address: str = DEFAULT_ADDR,
+                 spawn: bool = True):
+        self.model_path = Path(model_path)
+        self.address = address
+        self.spawn = spawn
+        self.client_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Future] = {}
+        self._on_progress: Dict[str, Callable[[int, int], None]] = {}
+        self._manager: Optional[_BrokerManager] = None
+        self._jobs = None
+        self._process: Optional[mp.Process] = None
+        self._authkey: Optional[bytes] = None  # 처음 접속할 때 (import 때 키 파일을 만들지 않음)
+
+    # ---------- 연결 ----------
+    def _try_connect(self) -> bool:
+        if self._authkey is None:
+            self._authkey = worker_authkey()
+        manager = _BrokerManager(address=_parse_addr(self.address), authkey=self._authkey)
+        try:
+            manager.connect()
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        self._manager = manager
+        self._jobs = manager.jobs()
+        results = manager.results(self.client_id)
+        threading.Thread(target=self._dispatch, args=(results,),
+                         name="diffusion-dispatch", daemon=True).start()
+        return True
+
+    def _spawn_worker(self):
+        ctx = mp.get_context("spawn")
+        self._process = ctx.Process(
+            target=serve, args=(str(self.model_path), self.address, MAX_BATCH, MAX_WAIT_MS, PRELOAD,
+                                self._authkey),
+            name="diffusion-worker", daemon=True,
+        )
+        self._process.start()
+
+    def _ensure_connected(self):
+        if self._manager is not None:
+            return
+        if self._try_connect():
+            return
+        if not self.spawn:
+            raise ConnectionError(f"diffusion worker에 접속할 수 없습니다: {self.address}")
+        self._spawn_worker()
+        deadline = time.monotonic() + _CONNECT_TIMEOUT_S
+        while time.monotonic() < deadline:
+            # 다른 uvicorn 워커가 먼저 띄웠다면 내 자식은 포트 충돌로 종료되고 그쪽에 접속됨
+            if self._try_connect():
+                return
+            time.sleep(0.2)
+        raise ConnectionError(f"diffusion worker 시작 시간 초과: {self.address}")
+
+    def _dispatch(self, results):
+        try:
+            while True:
+                kind, job_id, payload = results.get()
+                if kind == "progress":
+                    callback = self._on_progress.get(job_id)
+                    if callback is not None:
+                        try:
+                            callback(*payload)
+                        except Exception as e:
+                            print(f"[diffusion] progress callback error: {e}")
+                    continue
+                with self._lock:
+                    fut = self._futures.pop(job_id, None)
+                    self._on_progress.pop(job_id, None)
+                if fut is None:
+                    continue
+                if kind == "done":
+                    fut.set_result(payload)
+                else:
+                    fut.set_exception(RuntimeError(payload))
+        except (EOFError, OSError) as e:
+            # 워커가 죽음 → 대기 중인 요청 실패 처리, 다음 submit에서 재접속
+            with self._lock:
+                pending, self._futures = self._futures, {}
+                self._on_progress = {}
+                self._manager = None
+            for fut in pending.values():
+                fut.set_exception(ConnectionError(f"diffusion worker 연결 끊김: {e}"))
+
+    # ---------- 공개 API ----------
+    def submit(self, prompt: str, steps: int, height: Optional[int] = None,
+               width: Optional[int] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> Future:
+        """
+        블로킹될 수 있음 (최초 접속/워커 기동) → 이벤트 루프에서는 to_thread 로 호출
+        on_progress(step, total)은 dispatcher 스레드에서 호출됨
+        """
+        with self._lock:
+            self._ensure_connected()
+            job = DiffusionJob(uuid.uuid4().hex, self.client_id, prompt, steps, height, width)
+            fut: Future = Future()
+            self._futures[job.job_id] = fut
+            if on_progress is not None:
+                self._on_progress[job.job_id] = on_progress
+            jobs = self._jobs
+        jobs.put(job)
+        return fut
+
+    def preload(self, timeout: float = READY_TIMEOUT_S) -> dict:
+        """
+        워커에 접속(없으면 기동)해 파이프라인 로딩 + warm-up 추론을 시작시키고 끝날 때까지 대기 → stats
+        블로킹 (앱은 warm-up 스레드에서 호출). 로딩 실패면 RuntimeError, 시간 초과면 TimeoutError
+        """
+        with self._lock:
+            self._ensure_connected()
+            manager = self._manager
+        manager.preload()
+        deadline = time.monotonic() + timeout
+        while True:
+            stats = self.stats()
+            if stats.get("state") == "ready":
+                return stats
+            if stats.get("state") == "error":
+                raise RuntimeError(f"Stable Diffusion 로딩 실패: {stats.get('load_error')}")
+            if not stats["connected"]:
+                raise ConnectionError(f"diffusion worker 연결 끊김: {self.address}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Stable Diffusion 로딩 시간 초과 ({timeout:.0f}s, state={stats.get('state')})")
+            time.sleep(0.5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            manager, waiting = self._manager, len(self._futures)
+        out = {"address": self.address, "connected": manager is not None, "waiting": waiting}
+        if manager is not None:
+            try:
+                out.update(manager.stats()._getvalue())
+            except (EOFError, OSError):
+                out["connected"] = False
+        return out
+
+    def close(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,268 @@
+"""
+Sparse 검색 (BM25)
+
+- SparseBM25: CSR(term → postings) 인덱스, rank_bm25.BM25Okapi 와 같은 점수 (tests/test_bm25.py)
+  bm25.json(vocab / 파라미터) + bm25_*.npy 로 저장하고 mmap 으로 읽음
+- BM25Builder: chunk 를 하나씩 add — spill_dir 를 주면 postings 를 디스크로 내보내 메모리는 책 크기와 무관,
+  base 를 주면 기존 인덱스 뒤에 이어 붙임
+- load_bm25: 이전 포맷 (피클된 BM25Okapi, bm25.pkl) 도 읽음
+
+환경 변수:
+  RAG_INGEST_BM25_BLOCK=1000000      postings 를 디스크로 내보내고 정렬하는 단위 (posting 당 ~64B)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pickle
+import sys
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from .chunking import simple_tokenize
+    from .rag_store import _RawColumn, _atomic_write
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import simple_tokenize
+    from rag_store import _RawColumn, _atomic_write
+
+# ---------- 스트리밍 ingest ----------
+_INGEST_BM25_BLOCK = int(os.getenv("RAG_INGEST_BM25_BLOCK", "1000000"))  # BM25 postings 를 디스크로 내보내고 정렬하는 단위 (posting 당 ~64B)
+
+# =========================================================
+# Sparse 검색 (BM25)
+# =========================================================
+_BM25_ARRAYS = ("indptr", "docs", "tf", "idf", "doc_len")
+
+class SparseBM25:
+    """
+    CSR(term → postings) 기반 BM25 (rank_bm25.BM25Okapi와 동일한 점수)
+    - indptr: int64 [V+1], docs: int32 [P], tf: float32 [P]
+    - 질의 토큰의 postings만 훑어서 점수 계산 (전체 문서 루프 없음)
+    - bm25.json(vocab/파라미터) + bm25_*.npy 로 저장 → np.load(mmap_mode="r")
+    """
+
+    def __init__(self, vocab: Dict[str, int], indptr: np.ndarray, docs: np.ndarray,
+                 tf: np.ndarray, idf: np.ndarray, doc_len: np.ndarray,
+                 k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.vocab = vocab
+        self.indptr, self.docs, self.tf = indptr, docs, tf
+        self.idf, self.doc_len = idf, doc_len
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.corpus_size = len(doc_len)
+        self.avgdl = float(doc_len.mean()) if self.corpus_size else 0.0
+        # 문서 길이 정규화 항은 질의와 무관 → 미리 계산
+        self._norm = (k1 * (1 - b + b * doc_len / self.avgdl)).astype(np.float32)
+
+    @classmethod
+    def build(cls, tokenized: Iterable[List[str]], k1: float = 1.5, b: float = 0.75,
+              epsilon: float = 0.25) -> "SparseBM25":
+        builder = BM25Builder()
+        for tokens in tokenized:
+            builder.add(tokens)
+        return builder.build(k1=k1, b=b, epsilon=epsilon)
+
+    def get_scores(self, query: List[str]) -> np.ndarray:
+        q_terms = Counter(t for t in query if t in self.vocab)
+        if not q_terms:
+            return np.zeros(self.corpus_size)
+        tids = [self.vocab[t] for t in q_terms]
+        starts, ends = self.indptr[tids], self.indptr[np.asarray(tids) + 1]
+        docs = np.concatenate([self.docs[a:e] for a, e in zip(starts, ends)])
+        tf = np.concatenate([self.tf[a:e] for a, e in zip(starts, ends)]).astype(np.float64)
+        # 질의에 같은 토큰이 여러 번 나오면 그만큼 더함 (rank_bm25 동작과 동일)
+        weight = np.repeat([self.idf[t] * c for t, c in zip(tids, q_terms.values())],
+                           ends - starts)
+        contrib = weight * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return np.bincount(docs, weights=contrib, minlength=self.corpus_size)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.indptr, self.docs, self.tf, self.idf, self.doc_len, self._norm)
+        return sum(a.nbytes for a in arrays) + sum(sys.getsizeof(t) for t in self.vocab)
+
+    def save(self, path: Path):
+        """path: bm25.json (같은 폴더에 bm25_*.npy 저장)"""
+        for name in _BM25_ARRAYS:
+            arr = getattr(self, name)
+            _atomic_write(path.parent / f"bm25_{name}.npy", lambda f: np.save(f, arr))
+        _save_bm25_meta(path, self.vocab, self.k1, self.b, self.epsilon)
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "SparseBM25":
+        meta = json.loads(path.read_text(encoding="utf-8"))
+        mode = "r" if mmap else None
+        arrays = {name: np.load(path.parent / f"bm25_{name}.npy", mmap_mode=mode)
+                  for name in _BM25_ARRAYS}
+        vocab = {t: i for i, t in enumerate(meta["terms"])}
+        return cls(vocab, k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"], **arrays)
+
+
+def _save_bm25_meta(path: Path, vocab: Dict[str, int], k1: float, b: float, epsilon: float):
+    terms = sorted(vocab, key=vocab.get)
+    meta = {"k1": k1, "b": b, "epsilon": epsilon, "terms": terms}
+    data = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    _atomic_write(path, lambda f: f.write(data))
+
+def _bm25_idf(df: np.ndarray, n: int, epsilon: float) -> np.ndarray:
+    # rank_bm25와 동일: 음수 idf는 epsilon * 평균 idf 로 바닥 처리
+    idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+    if len(idf):
+        idf[idf < 0] = epsilon * idf.mean()
+    return idf.astype(np.float32)
+
+_POSTING = np.dtype([("term", "<i8"), ("doc", "<i4"), ("tf", "<f4")])
+
+class BM25Builder:
+    """
+    chunk 를 하나씩 add 하며 (term, doc, tf) postings 를 array 에 쌓는 SparseBM25 빌더 (토큰 리스트는 안 모음)
+    spill_dir 를 주면 postings 가 RAG_INGEST_BM25_BLOCK 개 쌓일 때마다 디스크로 내보내고
+    save() 에서 term 구간별로 나눠 정렬 → 메모리는 책 크기와 무관 (스트리밍 ingest 용)
+    base 를 주면 그 인덱스의 문서 뒤에 이어 붙임 (기존 문서는 다시 토큰화하지 않음, spill 모드와 같이 못 씀)
+    """
+
+    def __init__(self, spill_dir: Optional[Path] = None, base: Optional[SparseBM25] = None):
+        if base is not None and spill_dir is not None:
+            raise ValueError("BM25Builder: base 와 spill_dir 는 같이 쓸 수 없음")
+        self.base = base
+        self.vocab: Dict[str, int] = dict(base.vocab) if base is not None else {}
+        self.n = base.corpus_size if base is not None else 0
+        self._reset()
+        self._spill: Optional[Dict[str, _RawColumn]] = None
+        if spill_dir is not None:
+            self._spill = {name: _RawColumn(spill_dir / f"bm25_{name}.tmp", dtype)
+                           for name, dtype in (("terms", "int64"), ("docs", "int32"),
+                                               ("tf", "float32"), ("doc_len", "float32"))}
+
+    def _reset(self):
+        self._terms, self._docs, self._counts = array("q"), array("i"), array("f")
+        self._doc_len = array("f")
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, tokens: List[str]):
+        d = self.n
+        self.n += 1
+        self._doc_len.append(len(tokens))
+        for term, c in Counter(tokens).items():
+            self._terms.append(self.vocab.setdefault(term, len(self.vocab)))
+            self._docs.append(d)
+            self._counts.append(c)
+        if self._spill is not None and len(self._terms) >= _INGEST_BM25_BLOCK:
+            self._flush()
+
+    def _flush(self):
+        for name, buf in (("terms", self._terms), ("docs", self._docs),
+                          ("tf", self._counts), ("doc_len", self._doc_len)):
+            self._spill[name].append(np.frombuffer(buf, dtype=self._spill[name].dtype))
+        self._reset()
+
+    def build(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> SparseBM25:
+        """메모리 안에서 CSR 로 (spill 모드가 아닐 때)"""
+        term_ids = np.frombuffer(self._terms, dtype=np.int64)
+        docs = np.frombuffer(self._docs, dtype=np.int32)
+        tf = np.frombuffer(self._counts, dtype=np.float32)
+        doc_len = np.array(self._doc_len, dtype=np.float32)
+        if self.base is not None:
+            # base 의 postings 를 앞에 (term id / doc id 가 그대로라 처음부터 만든 것과 같은 CSR)
+            old = self.base
+            term_ids = np.concatenate([np.repeat(np.arange(len(old.indptr) - 1, dtype=np.int64),
+                                                 np.diff(old.indptr)), term_ids])
+            docs = np.concatenate([old.docs, docs])
+            tf = np.concatenate([old.tf, tf])
+            doc_len = np.concatenate([old.doc_len, doc_len])
+        # 문서 순서로 쌓았으므로 stable sort 후 term 안에서 doc id는 오름차순
+        order = np.argsort(term_ids, kind="stable")
+        df = np.bincount(term_ids, minlength=len(self.vocab))
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        return SparseBM25(self.vocab, indptr, docs[order], tf[order],
+                          _bm25_idf(df, self.n, epsilon), doc_len,
+                          k1=k1, b=b, epsilon=epsilon)
+
+    def save(self, path: Path, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        """
+        spill 모드: bm25.json + bm25_*.npy 를 SparseBM25.save 와 같은 내용으로 저장
+        1) term 별 df → indptr   2) postings 를 (postings 수가 블록 이하인) term 구간 파일로 나눔
+        3) 구간마다 읽어 term 순 stable sort 후 docs/tf 에 이어 씀
+        """
+        if self._spill is None:
+            return self.build(k1, b, epsilon).save(path)
+        self._flush()
+        cols = self._spill
+        for col in cols.values():
+            col.close()
+        base, V, block = path.parent, len(self.vocab), _INGEST_BM25_BLOCK
+
+        df = np.zeros(V, dtype=np.int64)
+        for terms in cols["terms"].blocks(block):
+            df += np.bincount(terms, minlength=V)
+        indptr = np.zeros(V + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        total = int(indptr[-1])
+
+        edges = np.unique(np.concatenate([[0], np.searchsorted(indptr, np.arange(block, total, block)), [V]]))
+        parts = [base / f"bm25_part{r:04d}.tmp" for r in range(len(edges) - 1)]
+        files = [open(p, "wb") for p in parts]
+        try:
+            for terms, docs, tf in zip(cols["terms"].blocks(block), cols["docs"].blocks(block),
+                                       cols["tf"].blocks(block)):
+                rec = np.empty(len(terms), dtype=_POSTING)
+                rec["term"], rec["doc"], rec["tf"] = terms, docs, tf
+                part = np.searchsorted(edges, terms, side="right") - 1
+                order = np.argsort(part, kind="stable")
+                bounds = np.searchsorted(part[order], np.arange(len(parts) + 1))
+                for r, f in enumerate(files):
+                    if bounds[r] < bounds[r + 1]:
+                        f.write(rec[order[bounds[r]:bounds[r + 1]]].tobytes())
+        finally:
+            for f in files:
+                f.close()
+        for name in ("terms", "docs", "tf"):
+            cols[name].discard()
+
+        docs_out = _RawColumn(base / "bm25_docs.raw.tmp", "int32")
+        tf_out = _RawColumn(base / "bm25_tf.raw.tmp", "float32")
+        for p in parts:
+            rec = np.fromfile(p, dtype=_POSTING)
+            # 구간 파일 안에서도 문서 순서 그대로 → stable sort 후 term 안 doc id 오름차순 (build 와 같음)
+            order = np.argsort(rec["term"], kind="stable")
+            docs_out.append(rec["doc"][order])
+            tf_out.append(rec["tf"][order])
+            p.unlink()
+        docs_out.save_npy(base / "bm25_docs.npy")
+        tf_out.save_npy(base / "bm25_tf.npy")
+        cols["doc_len"].save_npy(base / "bm25_doc_len.npy")
+        idf = _bm25_idf(df, self.n, epsilon)
+        _atomic_write(base / "bm25_indptr.npy", lambda f: np.save(f, indptr))
+        _atomic_write(base / "bm25_idf.npy", lambda f: np.save(f, idf))
+        _save_bm25_meta(path, self.vocab, k1, b, epsilon)
+
+    def discard(self):
+        if self._spill is not None:
+            for col in self._spill.values():
+                col.discard()
+
+
+def build_bm25_index(chunks: Iterable[str]) -> SparseBM25:
+    return SparseBM25.build(simple_tokenize(c) for c in chunks)
+
+def save_bm25(bm25: SparseBM25, path: Path):
+    bm25.save(path)
+
+def load_bm25(path: Path) -> SparseBM25:
+    if path.suffix == ".json":
+        return SparseBM25.load(path)
+    # 이전 포맷: 피클된 rank_bm25.BM25Okapi
+    try:
+        import rank_bm25  # noqa: F401  (언피클에 필요)
+    except ImportError as e:
+        raise RuntimeError("[ERROR] pip install rank-bm25 (이전 bm25.pkl 스토리지)") from e
+    with open(path, "rb") as f:
+        return pickle.load(f)
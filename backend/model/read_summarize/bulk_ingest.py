@@ -0,0 +1,234 @@
+"""
+대량 ingest (bulk-ingest) — 책 수천 권을 한 프로세스에서
+
+- 읽기 / chunk / BM25 토큰화는 프로세스 풀, 임베딩은 모델 하나에 여러 책의 새 chunk 를 RAG_BULK_BATCH 개씩 모아서
+  (sentence-transformers 가 길이순으로 묶으므로 짧은 책이 많아도 배치가 참)
+- 책마다 결과를 상태 파일(JSONL)에 한 줄씩 남겨, 다시 실행하면 실패 / 미완료 / 바뀐 파일만 처리
+- 서재는 마지막에 한 번만 갱신 (library_add_many)
+
+환경 변수:
+  RAG_BULK_BATCH=2048                여러 책의 새 chunk 를 모아 한 번에 임베딩 모델에 넣을 수
+"""
+
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .chunking import iter_chunks, iter_units, simple_tokenize
+    from .dense_index import _INDEX_RETRAIN_FRAC
+    from .library import library_add_many
+    from .store_writer import _LIBRARY, ChunkEmbedder, StoreWriter
+    from .summary_tree import _SUMMARY_DEFAULT_SENTENCES, summarize_doc
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import iter_chunks, iter_units, simple_tokenize
+    from dense_index import _INDEX_RETRAIN_FRAC
+    from library import library_add_many
+    from store_writer import _LIBRARY, ChunkEmbedder, StoreWriter
+    from summary_tree import _SUMMARY_DEFAULT_SENTENCES, summarize_doc
+
+# ---------- 대량 ingest (bulk-ingest) ----------
+_BULK_BATCH = int(os.getenv("RAG_BULK_BATCH", "2048"))  # 여러 책의 새 chunk 를 모아 한 번에 임베딩 모델에 넣을 수
+
+
+def load_bulk_manifest(source: Path, unit: str = "para", window: int = 1, stride: int = 1) -> List[dict]:
+    """
+    source: 폴더 (아래 *.txt 전부, doc_id = 상대 경로를 '_' 로 이은 것) 또는
+            JSONL manifest ({"doc_id", "path", 선택 "unit", "window", "stride"}, path 는 manifest 기준 상대 경로 가능)
+    → [{doc_id, path, unit, window, stride}]
+    """
+    defaults = {"unit": unit, "window": window, "stride": stride}
+    if source.is_dir():
+        items = [dict(defaults, doc_id="_".join(p.relative_to(source).with_suffix("").parts), path=str(p))
+                 for p in sorted(source.rglob("*.txt")) if p.is_file()]
+    else:
+        items = []
+        with open(source, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if "doc_id" not in row or "path" not in row:
+                    raise SystemExit(f"[ERROR] {source}:{line_no}: doc_id / path 가 필요합니다")
+                path = Path(row["path"])
+                items.append(dict(defaults, **{k: row[k] for k in defaults if k in row},
+                                  doc_id=str(row["doc_id"]),
+                                  path=str(path if path.is_absolute() else source.parent / path)))
+    dup = [d for d, n in Counter(it["doc_id"] for it in items).items() if n > 1]
+    if dup:
+        raise SystemExit(f"[ERROR] doc_id 중복: {', '.join(dup[:10])}")
+    return items
+
+def _bulk_signature(item: dict) -> str:
+    """파일 크기/수정 시각 + chunk 설정 — 상태 파일의 done 과 다르면 다시 ingest"""
+    st = Path(item["path"]).stat()
+    return f"{st.st_size}:{st.st_mtime_ns}:{item['unit']}:{item['window']}:{item['stride']}"
+
+def _load_bulk_state(path: Path) -> Dict[str, dict]:
+    """doc_id → 마지막 기록 (중간에 죽어서 잘린 마지막 줄은 무시)"""
+    state: Dict[str, dict] = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            state[row["doc_id"]] = row
+    return state
+
+def _bulk_chunk(item: dict) -> Tuple[List[str], List[List[str]]]:
+    """(워커 프로세스) 파일 → chunk + BM25 토큰"""
+    chunks = list(iter_chunks(iter_units(Path(item["path"]), item["unit"]), item["window"], item["stride"]))
+    return chunks, [simple_tokenize(c) for c in chunks]
+
+class _BulkPending:
+    """chunk 는 끝났고 임베딩을 기다리는 책 하나"""
+
+    def __init__(self, item: dict, chunks: List[str], tokens: List[List[str]]):
+        self.item = item
+        self.chunks = chunks
+        self.tokens = tokens
+        self.embedder = ChunkEmbedder(previous=item["doc_id"])
+        self.keys, self.found, self.todo = self.embedder.split(chunks)
+
+def bulk_ingest(items: Sequence[dict], state_path: Path, workers: int = 1, batch_size: int = _BULK_BATCH,
+                index_kind: Optional[str] = None, summary: bool = False, force: bool = False) -> dict:
+    """
+    items: load_bulk_manifest 결과. state_path 에 책마다 {"doc_id", "sig", "status": done|error, ...} 를 이어 씀
+    force: 상태 파일을 무시하고 전부 다시
+    → {"docs", "failed", "skipped", "chunks", "secs", "docs_per_s", "chunks_per_s", "reuse", "embed_secs"}
+    """
+    state = {} if force else _load_bulk_state(state_path)
+    todo_items, skipped = [], 0
+    for it in items:
+        try:
+            it["sig"] = _bulk_signature(it)
+        except OSError:
+            it["sig"] = None  # 워커에서 FileNotFoundError 로 실패 기록
+        prev = state.get(it["doc_id"])
+        if prev is not None and prev.get("status") == "done" and prev.get("sig") == it["sig"]:
+            skipped += 1
+        else:
+            todo_items.append(it)
+    print(f"[INFO] bulk-ingest: {len(todo_items)}권 처리 / {skipped}권 건너뜀 (완료 기록) | "
+          f"workers={workers} batch={batch_size}")
+
+    stats = {"docs": 0, "failed": 0, "skipped": skipped, "chunks": 0, "embed_secs": 0.0,
+             "reuse": {"store": 0, "cache": 0, "embedded": 0}}
+    done_ids: List[str] = []
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_file = open(state_path, "a", encoding="utf-8")
+    t0 = last_report = time.perf_counter()
+
+    def record(item: dict, **fields):
+        row = {"doc_id": item["doc_id"], "path": item["path"], "sig": item["sig"], "ts": time.time(), **fields}
+        state_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        state_file.flush()
+        if fields["status"] == "done":
+            stats["docs"] += 1
+            stats["chunks"] += fields["chunks"]
+            done_ids.append(item["doc_id"])
+        else:
+            stats["failed"] += 1
+            print(f"[WARN] bulk-ingest 실패: {item['doc_id']} ({item['path']}): {fields['error']}")
+
+    def flush(pending: List[_BulkPending]):
+        # 여러 책의 새 chunk 를 모아 batch_size 개씩 임베딩 → 책마다 스토어 저장
+        todo: Dict[str, str] = {}
+        for p in pending:
+            todo.update(p.todo)
+        fresh: Dict[str, np.ndarray] = {}
+        pairs = list(todo.items())
+        t = time.perf_counter()
+        # batch_size 를 넘으면 고르게 나눔 (256 + 17 처럼 작은 나머지 호출이 생기지 않게)
+        step = -(-len(pairs) // max(1, -(-len(pairs) // batch_size)))
+        try:
+            for i in range(0, len(pairs), step or 1):
+                fresh.update(ChunkEmbedder.encode(dict(pairs[i:i + step])))
+        except Exception as e:
+            for p in pending:
+                record(p.item, status="error", error=f"임베딩 실패: {e}")
+            return
+        finally:
+            stats["embed_secs"] += time.perf_counter() - t
+
+        for p in pending:
+            doc_id = p.item["doc_id"]
+            try:
+                vecs = np.stack([np.asarray(p.found.get(k, fresh.get(k)), dtype=np.float32) for k in p.keys])
+                writer = StoreWriter(doc_id, update_library=False)
+                try:
+                    writer.add(p.chunks, vecs, p.tokens)
+                except BaseException:
+                    writer.abort()
+                    raise
+                changed = 1 - p.embedder.counts["store"] / writer.n
+                writer.finish(index_kind, trained_from=doc_id if changed <= _INDEX_RETRAIN_FRAC else None)
+            except Exception as e:
+                record(p.item, status="error", error=str(e))
+                continue
+            for k, v in p.embedder.counts.items():
+                stats["reuse"][k] += v
+            record(p.item, status="done", chunks=len(p.chunks))
+            if summary:
+                try:
+                    summarize_doc(doc_id, _SUMMARY_DEFAULT_SENTENCES)
+                except Exception as e:
+                    print(f"[WARN] 요약 트리 생성 실패: {doc_id}: {e}")
+
+    pending: List[_BulkPending] = []
+    remaining = iter(todo_items)
+    # spawn: 임베딩 모델(torch 스레드)을 올린 뒤 fork 하지 않도록
+    pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"))
+    try:
+        running: Dict[Future, dict] = {}
+        while True:
+            # chunk 작업은 워커 수의 2배까지만 띄움 (chunk 결과가 메모리에 쌓이지 않도록)
+            for it in islice(remaining, max(0, 2 * max(1, workers) - len(running))):
+                running[pool.submit(_bulk_chunk, it)] = it
+            if not running:
+                break
+            finished, _ = wait(running, timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                it = running.pop(fut)
+                try:
+                    chunks, tokens = fut.result()
+                    if not chunks:
+                        raise ValueError("[ERROR] 빈 문서")
+                    pending.append(_BulkPending(it, chunks, tokens))
+                except Exception as e:
+                    record(it, status="error", error=str(e) or type(e).__name__)
+            n_todo = sum(len(p.todo) for p in pending)
+            n_pending = sum(len(p.chunks) for p in pending)
+            if pending and (n_todo >= batch_size or n_pending >= 4 * batch_size or not running):
+                flush(pending)
+                pending = []
+            now = time.perf_counter()
+            if now - last_report >= 2.0:
+                last_report = now
+                print(f"[INFO] bulk-ingest: {stats['docs'] + stats['failed']}/{len(todo_items)}권 | "
+                      f"{stats['chunks']} chunks | {stats['chunks'] / (now - t0):.0f} chunks/s")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        state_file.close()
+
+    if done_ids and _LIBRARY:
+        try:
+            library_add_many(done_ids)
+        except Exception as e:
+            print(f"[WARN] 서재 갱신 실패: {e} (library --rebuild 로 다시 맞춤)")
+
+    secs = time.perf_counter() - t0
+    stats.update(secs=secs, docs_per_s=stats["docs"] / secs if secs else 0.0,
+                 chunks_per_s=stats["chunks"] / secs if secs else 0.0)
+    return stats
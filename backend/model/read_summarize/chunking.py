@@ -0,0 +1,224 @@
+"""
+텍스트 → 문단 / 문장 / chunk, 토큰 수와 예산 패킹, BM25 토크나이저
+
+- make_chunks / iter_units / iter_chunks: para(문단) 또는 sent(문장) 단위를 window/stride 로 묶음
+  (iter_*: 큰 파일을 블록 단위로 읽는 스트리밍 버전, 결과는 같음)
+- count_tokens / pack_units / fit_contexts: LLM_TOKENIZER 기준 토큰 예산 (tiktoken 없으면 근사치)
+- simple_tokenize: 형태소 분석 없는 한국어/영어 토크나이저 (BM25)
+
+환경 변수:
+  LLM_TOKENIZER=o200k_base           gpt-4o 계열
+  RAG_CONTEXT_TOKENS=3000            질문 답변 프롬프트의 근거 문맥 한도
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from collections import deque
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+# ---------- 토큰 예산 ----------
+_TOKENIZER_NAME = os.getenv("LLM_TOKENIZER", "o200k_base")       # gpt-4o 계열 (tiktoken 없으면 근사치)
+_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "3000"))    # 질문 답변 프롬프트의 근거 문맥 한도
+
+
+# =========================================================
+# 유틸
+# =========================================================
+def read_text(path: Path) -> str:
+    return path.read_text(encoding="utf-8", errors="ignore")
+
+def split_sentences(text: str) -> List[str]:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"\u3000|\xa0", " ", text)
+    parts = re.split(r"(?<=[\.!?？！。…])\s+|\n+", text)
+    return [p.strip() for p in parts if p and p.strip()]
+
+def split_paragraphs(text: str) -> List[str]:
+    paras = re.split(r"\n{2,}", text.replace("\r\n", "\n"))
+    return [p.strip() for p in paras if p.strip()]
+
+def make_chunks(text: str, unit: str = "para", window:int=1, stride:int=1) -> List[str]:
+    items = split_paragraphs(text) if unit == "para" else split_sentences(text)
+    return list(iter_chunks(items, window, stride))
+
+# ---------- 스트리밍 (큰 파일: 전체를 메모리에 올리지 않음) ----------
+_READ_BLOCK_CHARS = 1 << 20
+_PARA_SEP = re.compile(r"\n{2,}")
+_SENT_SEP = re.compile(r"(?<=[\.!?？！。…])\s+|\n+")
+
+def iter_units(path: Path, unit: str = "para",
+               on_read: Optional[Callable[[int], None]] = None) -> Iterator[str]:
+    """
+    파일을 블록 단위로 읽으며 문단/문장을 하나씩 (split_paragraphs / split_sentences 와 같은 결과)
+    블록 끝의 마지막 조각은 다음 블록과 이어서 다시 나눔. on_read(읽은 바이트 수) 로 진행률 전달
+    """
+    sep = _PARA_SEP if unit == "para" else _SENT_SEP
+    rest = ""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            block = f.read(_READ_BLOCK_CHARS)
+            if on_read is not None:
+                on_read(f.buffer.tell())
+            if unit != "para":
+                block = re.sub(r"\u3000|\xa0", " ", block)
+            parts = sep.split(rest + block)
+            rest = parts.pop() if block else ""
+            for p in parts:
+                if p and p.strip():
+                    yield p.strip()
+            if not block:
+                break
+
+def iter_chunks(units: Iterable[str], window: int = 1, stride: int = 1) -> Iterator[str]:
+    """make_chunks 의 window/stride 묶음을 generator 로 (앞에서부터 window 개씩, stride 만큼 이동)"""
+    if window <= 1:
+        yield from units
+        return
+    step = max(1, stride)
+    buf: deque = deque()
+    start = nxt = 0          # buf[0] 의 번호, 다음 chunk 의 시작 번호
+    n, last_end = 0, 0
+    for n, item in enumerate(units, 1):
+        buf.append(item)
+        while nxt + window <= n:
+            yield " ".join(list(buf)[nxt - start:nxt - start + window])
+            last_end = nxt + window
+            nxt += step
+            while start < nxt and buf:
+                buf.popleft()
+                start += 1
+    if nxt < n and last_end < n:  # 마지막 (window 보다 짧은) 묶음
+        yield " ".join(list(buf)[nxt - start:])
+
+# =========================================================
+# 토큰 수 / 패킹
+# =========================================================
+_tokenizer = None
+def _get_tokenizer():
+    """tiktoken 인코더 (미설치/인코딩 파일을 못 받으면 None → 근사치 사용)"""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding(_TOKENIZER_NAME)
+        except Exception as e:
+            print(f"[INFO] tiktoken 사용 불가, 토큰 수 근사치 사용: {type(e).__name__}")
+            _tokenizer = False
+    return _tokenizer or None
+
+_HANGUL_RE = re.compile(r"[가-힣]")
+def count_tokens(text: str) -> int:
+    enc = _get_tokenizer()
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    # 근사: 한글 음절 ≈ 1토큰, 그 외(영문/공백/기호) ≈ 4글자당 1토큰
+    hangul = len(_HANGUL_RE.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+_WS_RE = re.compile(r"\s")
+def split_to_budget(text: str, max_tokens: int) -> List[str]:
+    """
+    문장 경계가 없어 더 나눌 수 없는 텍스트를 max_tokens 이하 조각으로 (가능하면 공백에서, 아니면 글자 단위)
+    조각마다 토큰 수가 max_tokens 이하인 가장 긴 앞부분을 이분 탐색
+    """
+    pieces, rest = [], text.strip()
+    while rest:
+        if count_tokens(rest) <= max_tokens:
+            pieces.append(rest)
+            break
+        # 토큰 하나가 16글자를 넘는 일은 거의 없음 → 탐색 범위 제한 (그보다 길게 들어가도 예산 안)
+        lo, hi = 1, min(len(rest), max(1, max_tokens) * 16)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if count_tokens(rest[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        cut = lo
+        ws = [m.start() for m in _WS_RE.finditer(rest, cut // 2, cut)]
+        if ws:
+            cut = ws[-1]
+        piece, rest = rest[:cut].strip(), rest[cut:].strip()
+        if piece:
+            pieces.append(piece)
+    return pieces
+
+def pack_units(units: Sequence[str], max_tokens: int, sep: str = "\n\n") -> List[str]:
+    """
+    문단/문장을 자르지 않고 순서대로 max_tokens 이하 묶음으로
+    한 단위가 넘치면 문장으로 다시 나누고, 문장 하나도 넘치면 split_to_budget 로 자름 → 모든 묶음이 예산 안
+    """
+    packs, cur, used = [], [], 0
+    for unit in units:
+        n = count_tokens(unit)
+        if n > max_tokens:
+            sentences = split_sentences(unit)
+            if cur:
+                packs.append(sep.join(cur))
+                cur, used = [], 0
+            if len(sentences) > 1:
+                packs.extend(pack_units(sentences, max_tokens, sep=" "))
+            else:
+                packs.extend(split_to_budget(unit, max_tokens))
+            continue
+        if cur and used + n > max_tokens:
+            packs.append(sep.join(cur))
+            cur, used = [], 0
+        cur.append(unit)
+        used += n + (1 if len(cur) > 1 else 0)  # 구분자 몫
+    if cur:
+        packs.append(sep.join(cur))
+    return packs
+
+_DEDUPE_MIN_CHARS = 15  # 이보다 짧은 문장("네.", 인물 이름 등)은 반복돼도 유지
+def dedupe_sentences(texts: Sequence[str]) -> List[str]:
+    """앞선 텍스트에 이미 나온 문장을 뺌 (window>1 chunk 겹침, 겹치는 검색 결과)"""
+    seen, out = set(), []
+    for text in texts:
+        kept = []
+        for sentence in split_sentences(text):
+            key = re.sub(r"\s+", " ", sentence)
+            if len(key) >= _DEDUPE_MIN_CHARS:
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        if kept:
+            out.append(" ".join(kept))
+    return out
+
+def fit_contexts(contexts: Sequence[str], max_tokens: int = _CONTEXT_TOKENS) -> List[str]:
+    """검색 순위 순서로 중복 문장을 빼고 max_tokens 안에 들어가는 만큼만 (넘치는 문맥은 문장 단위로 자름)"""
+    out, used = [], 0
+    for ctx in dedupe_sentences(contexts):
+        n = count_tokens(ctx)
+        if used + n <= max_tokens:
+            out.append(ctx)
+            used += n
+            continue
+        remaining = max_tokens - used
+        if remaining > 0:
+            head = pack_units(split_sentences(ctx), remaining, sep=" ")
+            if head and count_tokens(head[0]) <= remaining:
+                out.append(head[0])
+        break
+    return out
+
+# =========================================================
+# 한국어 토크나이저 (BM25용)
+# =========================================================
+def simple_tokenize(text: str) -> List[str]:
+    """간단한 한국어/영어 토크나이저 (형태소 분석 없이)"""
+    # 공백 + 특수문자 기준 분리
+    text = re.sub(r'[^\w\s]', ' ', text)
+    tokens = text.lower().split()
+    # 한글은 음절 단위로도 추가 (짧은 단어 매칭 강화)
+    result = []
+    for t in tokens:
+        result.append(t)
+        if re.search(r'[가-힣]', t) and len(t) > 1:
+            result.extend(list(t))  # 음절 분리
+    return result
@@ -0,0 +1,240 @@
+"""
+Dense 인덱스
+
+- MmapFlatIndex: embeddings.npy 를 mmap 으로 열어 전체 내적 (정확, 작은 문서)
+- AnnIndex: ann.index (HNSW / IVF-SQ8 / IVF-PQ) 로 후보를 찾고 원본 벡터로 점수를 다시 계산 (큰 문서 / 서재 shard)
+- choose_index_kind / build_ann_index: ingest 때 chunk 수로 종류를 고르고 IVF 계열은 문서 벡터로 학습
+- faiss 는 인덱스를 만들거나 읽을 때 import
+
+환경 변수:
+  RAG_INDEX=auto                     auto | flat | hnsw | ivfsq8 | ivfpq
+  RAG_INDEX_HNSW_MIN=20000           auto: chunk 수가 이 이상이면 HNSW
+  RAG_INDEX_IVF_MIN=200000           auto: 이 이상이면 IVF-PQ
+  RAG_INDEX_TRAIN_MAX, RAG_INDEX_RETRAIN_FRAC, RAG_HNSW_M, RAG_HNSW_EF_SEARCH, RAG_IVF_NPROBE, RAG_PQ_M, RAG_PQ_REFINE
+"""
+
+from __future__ import annotations
+
+import importlib
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from .rag_store import _EMB_STORE_DTYPE, _atomic_write
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from rag_store import _EMB_STORE_DTYPE, _atomic_write
+
+# ---------- Dense 인덱스 (ingest 때 chunk 수로 선택) ----------
+_INDEX_KIND = os.getenv("RAG_INDEX", "auto")                        # auto | flat | hnsw | ivfsq8 | ivfpq
+_INDEX_HNSW_MIN = int(os.getenv("RAG_INDEX_HNSW_MIN", "20000"))     # auto: chunk 수가 이 이상이면 HNSW
+_INDEX_IVF_MIN = int(os.getenv("RAG_INDEX_IVF_MIN", "200000"))      # auto: 이 이상이면 IVF-PQ
+_INDEX_TRAIN_MAX = int(os.getenv("RAG_INDEX_TRAIN_MAX", "65536"))   # IVF/PQ 학습에 쓸 최대 벡터 수
+_INDEX_RETRAIN_FRAC = float(os.getenv("RAG_INDEX_RETRAIN_FRAC", "0.2"))  # 재 ingest 때 바뀐 비율이 이하면 IVF/PQ 학습 재사용 (shard append 는 커진 비율)
+_HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "128"))
+_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+_PQ_M = int(os.getenv("RAG_PQ_M", "64"))                            # PQ 벡터당 바이트 수 (d의 약수로 맞춤)
+_PQ_REFINE = int(os.getenv("RAG_PQ_REFINE", "4"))                   # IVF-PQ: k × N 개를 찾아 원본 벡터로 다시 정렬
+
+
+# ---------- 라이브러리 (무거운 것은 처음 쓸 때 import) ----------
+class _LazyModule:
+    """
+    처음 속성을 쓸 때 import 하는 모듈 대리 객체
+    faiss 는 인덱스 빌드 / 로드 때만 필요 → import 시간에 넣지 않고, 없을 때도 import 는 됨
+    (health check / 캐시 통계만 쓰는 프로세스가 faiss 때문에 죽지 않음)
+    """
+
+    def __init__(self, name: str, hint: str):
+        self._name = name
+        self._hint = hint
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            try:
+                self._module = importlib.import_module(self._name)
+            except ImportError as e:
+                raise ImportError(self._hint) from e
+        return getattr(self._module, attr)
+
+
+faiss = _LazyModule("faiss", "[ERROR] pip install faiss-cpu")
+
+
+# ---------- 상위 k 개 (dense / BM25 / hybrid 점수 공통) ----------
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    argpartition으로 k번째 점수를 찾은 뒤 그 이상인 것만 정렬 (동점은 chunk 순서)
+    argpartition 은 k번째와 동점인 것 중 아무거나 고르므로 경계의 동점은 모두 넣고 chunk 순서로 자름
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        part = np.flatnonzero(scores >= kth)
+    else:
+        part = np.arange(n)
+    order = np.lexsort((part, -scores[part]))[:k]
+    return part[order]
+
+def build_faiss_index(vectors: np.ndarray) -> faiss.IndexFlatIP:
+    dim = vectors.shape[1]
+    idx = faiss.IndexFlatIP(dim)
+    idx.add(vectors)
+    return idx
+
+def save_faiss(index: faiss.Index, path: Path):
+    faiss.write_index(index, str(path))
+
+def load_faiss(path: Path) -> faiss.Index:
+    return faiss.read_index(str(path))
+
+def save_embeddings(vectors: np.ndarray, path: Path, dtype: str = _EMB_STORE_DTYPE):
+    _atomic_write(path, lambda f: np.save(f, vectors.astype(dtype)))
+
+
+class MmapFlatIndex:
+    """
+    embeddings.npy를 mmap으로 열어 IndexFlatIP와 같은 인터페이스로 검색
+    (복사 없이 로드, 여러 워커 프로세스가 page cache를 공유)
+    """
+
+    def __init__(self, path: Path):
+        self.vectors = np.load(path, mmap_mode="r")
+        self.ntotal, self.d = self.vectors.shape
+
+    def search(self, qv: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        sims = np.asarray(self.vectors @ qv[0], dtype=np.float32)
+        top = _top_k(sims, k)
+        return sims[top][None, :], top[None, :]
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        return np.asarray(self.vectors[ids], dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+
+# ---------- 압축/근사 인덱스 (HNSW / IVF-SQ8 / IVF-PQ) ----------
+# 작은 문서는 flat (embeddings.npy 전체 내적, 정확), 큰 문서/라이브러리는 ann.index 로 후보만 찾고
+# 후보의 점수는 embeddings.npy 원본 벡터로 다시 계산한다 (PQ/SQ8 근사 점수는 랭킹에 안 씀).
+INDEX_KINDS = ("flat", "hnsw", "ivfsq8", "ivfpq")
+_ANN_ADD_BATCH = 65536
+
+def choose_index_kind(n: int, kind: str = _INDEX_KIND) -> str:
+    """RAG_INDEX=auto 이면 chunk 수로 선택: flat < RAG_INDEX_HNSW_MIN ≤ hnsw < RAG_INDEX_IVF_MIN ≤ ivfpq"""
+    if kind == "auto":
+        if n >= _INDEX_IVF_MIN:
+            return "ivfpq"
+        return "hnsw" if n >= _INDEX_HNSW_MIN else "flat"
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"unknown RAG_INDEX: {kind!r} (choose from auto, {', '.join(INDEX_KINDS)})")
+    return kind
+
+def _ivf_nlist(n: int) -> int:
+    # 클러스터 수 ≈ 4·√n, 클러스터당 학습 벡터 39개 이상 (faiss k-means 권장)
+    return max(1, min(int(4 * np.sqrt(n)), n // 39))
+
+def _pq_spec(n: int, d: int) -> str:
+    m = max(x for x in range(1, min(_PQ_M, d) + 1) if d % x == 0)
+    # 코드북 하나(2^nbits 개)를 학습할 벡터가 모자라면 nbits를 줄임
+    nbits = int(min(8, max(1, np.floor(np.log2(max(2, n // 39))))))
+    return f"PQ{m}" if nbits == 8 else f"PQ{m}x{nbits}"
+
+def build_ann_index(vectors: np.ndarray, kind: str,
+                    trained: Optional[faiss.Index] = None) -> Optional[faiss.Index]:
+    """
+    flat 이면 None. IVF 계열은 문서 자신의 벡터(최대 RAG_INDEX_TRAIN_MAX 개 샘플)로 학습
+    trained: 이전에 학습된 빈 IVF 인덱스 (재 ingest 때 centroid/codebook 재사용, 벡터만 다시 add)
+    """
+    if kind == "flat":
+        return None
+    n, d = vectors.shape
+    if trained is not None:
+        index = trained
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, _HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, 2 * _HNSW_M)
+    else:
+        nlist = _ivf_nlist(n)
+        spec = f"IVF{nlist},{'SQ8' if kind == 'ivfsq8' else _pq_spec(n, d)}"
+        index = faiss.index_factory(d, spec, faiss.METRIC_INNER_PRODUCT)
+        train = vectors
+        if n > _INDEX_TRAIN_MAX:
+            rng = np.random.default_rng(0)
+            train = vectors[np.sort(rng.choice(n, _INDEX_TRAIN_MAX, replace=False))]
+        index.train(np.ascontiguousarray(train, dtype=np.float32))
+    # embeddings.npy(mmap)에서 바로 만들 때 float32 사본이 한꺼번에 생기지 않도록 나눠서 add
+    for i in range(0, n, _ANN_ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[i:i + _ANN_ADD_BATCH], dtype=np.float32))
+    return index
+
+def save_ann_index(index: faiss.Index, path: Path):
+    tmp = path.with_name(path.name + ".tmp")
+    faiss.write_index(index, str(tmp))
+    os.replace(tmp, path)
+
+
+class AnnIndex:
+    """
+    ann.index 로 dense 후보를 찾고 embeddings.npy(mmap)로 정확한 점수를 다시 계산
+    (MmapFlatIndex 와 같은 search / reconstruct_batch 인터페이스)
+    nprobe (IVF) / ef_search (HNSW): 호출마다 지정 가능, 크면 recall↑ 지연↑
+    IVF-PQ 는 압축 오차가 커서 k × RAG_PQ_REFINE 개를 찾은 뒤 원본 점수로 상위 k 개만 남김
+    """
+    approximate = True
+
+    def __init__(self, ann_path: Path, emb_path: Path, kind: str):
+        self.kind = kind
+        self.flat = MmapFlatIndex(emb_path)
+        # IVF inverted list 는 mmap (여러 워커가 page cache 공유), HNSW 그래프는 메모리에 로드
+        self.index = faiss.read_index(str(ann_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        self.ann_bytes = ann_path.stat().st_size
+        self.refine = max(1, _PQ_REFINE) if kind == "ivfpq" else 1
+        self.ntotal, self.d = self.flat.ntotal, self.flat.d
+
+    def _params(self, nprobe: Optional[int], ef_search: Optional[int], k: int, sel=None):
+        extra = {} if sel is None else {"sel": sel}
+        if self.kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=max(k, ef_search or _HNSW_EF_SEARCH), **extra)
+        return faiss.SearchParametersIVF(nprobe=nprobe or _IVF_NPROBE, **extra)
+
+    def search(self, qv: np.ndarray, k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None,
+               allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """allowed: 이 id 들 안에서만 검색 (서재의 doc_id 필터)"""
+        if k >= self.ntotal and allowed is None:  # 전체 검색 요청은 원본 벡터로 정확히
+            return self.flat.search(qv, k)
+        q = np.ascontiguousarray(qv, dtype=np.float32)
+        fetch = min(self.ntotal, k * self.refine)
+        sel = None if allowed is None else faiss.IDSelectorBatch(np.asarray(allowed, dtype=np.int64))
+        _, ids = self.index.search(q, fetch, params=self._params(nprobe, ef_search, fetch, sel))
+        ids = ids[0][ids[0] >= 0]
+        sims = self.flat.reconstruct_batch(ids) @ q[0]
+        order = np.lexsort((ids, -sims))[:k]
+        return sims[order][None, :], ids[order][None, :]
+
+    def reconstruct_batch(self, ids: np.ndarray) -> np.ndarray:
+        return self.flat.reconstruct_batch(ids)
+
+    @property
+    def nbytes(self) -> int:
+        # 검색 때 embeddings.npy 는 후보 행만 읽으므로 상주 크기는 ann.index 기준
+        return self.ann_bytes
+
+
+def load_dense_index(path: Path, kind: str = "flat"):
+    """schema 2: embeddings.npy (mmap) [+ ann.index], schema 1: faiss.index"""
+    if path.suffix == ".npy":
+        ann_path = path.with_name("ann.index")
+        if kind != "flat" and ann_path.exists():
+            return AnnIndex(ann_path, path, kind)
+        return MmapFlatIndex(path)
+    return load_faiss(path)
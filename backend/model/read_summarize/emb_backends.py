@@ -0,0 +1,190 @@
+"""
+임베딩 백엔드 (EMB_BACKEND)
+
+- st          SentenceTransformer float32 (기본, 기존 동작)
+- torch-int8  SentenceTransformer + torch dynamic int8 양자화 (nn.Linear 가중치)
+- onnx        ONNX Runtime float32 (최초 1회 export → models/emb_onnx/<model>/model.onnx)
+- onnx-int8   ONNX Runtime + onnxruntime dynamic int8 양자화 (model.int8.onnx)
+              (onnx 계열은 cls / mean pooling 모델만 — max, lasttoken 등은 ValueError)
+
+모든 백엔드는 SentenceTransformer.encode 처럼 호출하고 정규화된 float32 [N, d] 를 돌려준다.
+양자화 백엔드는 벡터가 조금 달라지므로 float32 대비 검색 품질(recall@k)을
+python bench/embed_recall.py 로 확인한 뒤 선택한다.
+
+필요 패키지: onnx / onnx-int8 → onnxruntime, onnx (export 할 때만 torch + sentence-transformers)
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+BACKENDS = ("st", "torch-int8", "onnx", "onnx-int8")
+ONNX_ROOT = Path(__file__).parent / "models" / "emb_onnx"
+
+
+# =========================================================
+# SentenceTransformer (float32 / torch int8)
+# =========================================================
+def _load_st(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _load_torch_int8(model_name: str):
+    import torch
+    model = _load_st(model_name).to("cpu")
+    # Linear 가중치만 int8, 활성값은 실행 시 양자화 (CPU 전용)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8,
+                                               inplace=True)
+
+
+_ONNX_POOLING = ("cls", "mean")  # OnnxEmbedder 가 numpy 로 재현하는 pooling
+
+
+def _pooling_mode(st_model) -> str:
+    for module in st_model:
+        if hasattr(module, "get_pooling_mode_str"):
+            return module.get_pooling_mode_str()
+    return "cls"
+
+
+def _check_pooling(model_name: str, pooling: str):
+    if pooling not in _ONNX_POOLING:
+        raise ValueError(f"{model_name}: '{pooling}' pooling 은 ONNX 백엔드가 지원하지 않음 "
+                         f"({', '.join(_ONNX_POOLING)}만 가능 → EMB_BACKEND=st 또는 torch-int8)")
+
+
+# =========================================================
+# ONNX Runtime
+# =========================================================
+def onnx_dir(model_name: str) -> Path:
+    return ONNX_ROOT / model_name.replace("/", "__")
+
+
+def export_onnx(model_name: str, out_dir: Path) -> Path:
+    """SentenceTransformer 의 transformer 부분을 ONNX 로 export (pooling/정규화는 numpy에서)"""
+    import torch
+
+    st = _load_st(model_name).to("cpu").eval()
+    _check_pooling(model_name, _pooling_mode(st))  # export 전에 (다르게 pooling 된 임베딩이 섞이지 않게)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    dummy = st.tokenizer(["임베딩 export"], return_tensors="pt")
+    path = out_dir / "model.onnx"
+    axes = {0: "batch", 1: "seq"}
+    with torch.no_grad():
+        # 2GB 가 넘는 모델(XLM-R large 등)은 가중치가 external data 파일로 저장됨
+        torch.onnx.export(
+            _Encoder(st[0].auto_model), (dummy["input_ids"], dummy["attention_mask"]), str(path),
+            input_names=["input_ids", "attention_mask"], output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "last_hidden_state": axes},
+            opset_version=17,
+        )
+    st.tokenizer.save_pretrained(str(out_dir))
+    meta = {"model": model_name, "pooling": _pooling_mode(st),
+            "max_seq_length": st.max_seq_length, "dim": st.get_sentence_embedding_dimension()}
+    (out_dir / "export.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    print(f"[OK] ONNX export: {path} ({meta['pooling']} pooling, dim={meta['dim']})")
+    return path
+
+
+def quantize_onnx(src: Path, dst: Path) -> Path:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8)
+    print(f"[OK] ONNX int8: {dst}")
+    return dst
+
+
+class OnnxEmbedder:
+    """SentenceTransformer.encode 와 같은 인터페이스의 ONNX Runtime 인코더"""
+
+    def __init__(self, onnx_path: Path, export_dir: Path):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        meta = json.loads((export_dir / "export.json").read_text(encoding="utf-8"))
+        self.pooling = meta["pooling"]
+        _check_pooling(meta["model"], self.pooling)
+        self.max_seq_length = meta["max_seq_length"]
+        self.dim = meta["dim"]
+        self.tokenizer = AutoTokenizer.from_pretrained(str(export_dir))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), options,
+                                            providers=["CPUExecutionProvider"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        if self.pooling == "mean":
+            mask = mask[..., None].astype(np.float32)
+            return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        raise ValueError(f"unsupported pooling: {self.pooling!r} (choose from {', '.join(_ONNX_POOLING)})")
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True, **_) -> np.ndarray:
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        # 길이순으로 묶어 배치 안 padding 최소화 (SentenceTransformer 와 같은 방식)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for i in range(0, len(texts), batch_size):
+            idx = order[i:i + batch_size]
+            enc = self.tokenizer([texts[j] for j in idx], padding=True, truncation=True,
+                                 max_length=self.max_seq_length, return_tensors="np")
+            mask = enc["attention_mask"].astype(np.int64)
+            hidden = self.session.run(["last_hidden_state"], {
+                "input_ids": enc["input_ids"].astype(np.int64), "attention_mask": mask,
+            })[0]
+            out[idx] = self._pool(hidden, mask)
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out
+
+
+def _load_onnx(model_name: str, int8: bool) -> OnnxEmbedder:
+    out_dir = onnx_dir(model_name)
+    fp32 = out_dir / "model.onnx"
+    if not (fp32.exists() and (out_dir / "export.json").exists()):
+        print(f"[INFO] ONNX export (최초 1회): {model_name} → {out_dir}")
+        export_onnx(model_name, out_dir)
+    path = fp32
+    if int8:
+        path = out_dir / "model.int8.onnx"
+        if not path.exists():
+            quantize_onnx(fp32, path)
+    return OnnxEmbedder(path, out_dir)
+
+
+# =========================================================
+# 선택
+# =========================================================
+def load_emb_model(model_name: str, backend: str = "st"):
+    """EMB_BACKEND 값에 맞는 인코더 (encode(texts, batch_size, convert_to_numpy, normalize_embeddings))"""
+    if backend == "st":
+        return _load_st(model_name)
+    if backend == "torch-int8":
+        return _load_torch_int8(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return _load_onnx(model_name, int8=backend == "onnx-int8")
+    raise ValueError(f"unknown EMB_BACKEND: {backend!r} (choose from {', '.join(BACKENDS)})")
+
+
+def recall_at_k(base_top: List[List[int]], cand_top: List[List[int]]) -> float:
+    """질의별 top-k 집합이 겹치는 비율의 평균 (float32 결과를 정답으로)"""
+    if not base_top:
+        return 1.0
+    return float(np.mean([len(set(b) & set(c)) / max(1, len(b)) for b, c in zip(base_top, cand_top)]))
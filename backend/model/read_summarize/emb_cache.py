@@ -0,0 +1,158 @@
+"""
+chunk 임베딩 캐시 (content-addressed)
+
+- key:      sha256(임베딩 모델 id + chunk 원문) → 정규화된 float32 벡터
+- 같은 chunk 는 오타만 고쳐 다시 올린 책이든, 다른 doc_id 로 올린 같은 책이든 모델을 다시 돌리지 않음
+- 저장소:   SQLite 파일 하나 (llm_cache 와 같은 방식, 여러 워커/CLI 공유)
+            max_entries 를 넘으면 last_used 가 오래된 것부터 제거 (LRU)
+
+환경 변수:
+  EMB_CACHE=0                        캐시 끔 (이전 스토어 재사용은 그대로 동작)
+  EMB_CACHE_PATH=.../emb_cache.sqlite3
+  EMB_CACHE_MAX_ENTRIES=500000       (BGE-m3 1024차원 기준 약 2GB)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:  # numpy 는 벡터를 다룰 때 import (app import 시간에 넣지 않음)
+    import numpy as np
+
+DEFAULT_PATH = Path(__file__).parent / "cache" / "emb_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key        TEXT PRIMARY KEY,
+    vector     BLOB NOT NULL,            -- float32
+    last_used  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used);
+"""
+
+_BATCH = 500          # SQLite 변수 개수 제한 안에서 한 번에 조회할 key 수
+_PURGE_EVERY = 64     # put_many N번마다 LRU 정리
+
+
+def chunk_key(model_id: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(model_id.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path = DEFAULT_PATH, max_entries: int = 500000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts = 0
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        import numpy as np
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), _BATCH):
+                batch = keys[i:i + _BATCH]
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                found.update((k, np.frombuffer(v, dtype=np.float32)) for k, v in rows)
+            if found:
+                now = time.time()
+                db.executemany("UPDATE embeddings SET last_used=? WHERE key=?",
+                               [(now, k) for k in found])
+                db.commit()
+            self.counters["hits"] += len(found)
+            self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        import numpy as np
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items.items()]
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO embeddings(key, vector, last_used) VALUES (?, ?, ?)", rows)
+            db.commit()
+            self._puts += 1
+            if self._puts % _PURGE_EVERY == 0:
+                self._purge()
+
+    def _purge(self):
+        db = self._db()
+        over = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+        if over > 0:
+            removed = db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (over,)).rowcount
+            db.commit()
+            self.counters["evictions"] += removed
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM embeddings")
+            db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["entries"] = self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / total, 4) if total else 0.0
+        out.update({"path": str(self.path), "max_entries": self.max_entries})
+        return out
+
+
+# =========================================================
+# 프로세스 전역 캐시
+# =========================================================
+def _from_env() -> Optional[EmbeddingCache]:
+    if os.getenv("EMB_CACHE", "1") == "0":
+        return None
+    return EmbeddingCache(
+        path=Path(os.getenv("EMB_CACHE_PATH", str(DEFAULT_PATH))),
+        max_entries=int(os.getenv("EMB_CACHE_MAX_ENTRIES", "500000")),
+    )
+
+
+emb_cache: Optional[EmbeddingCache] = _from_env()
+
+
+def lookup_vectors(keys: List[str]) -> Dict[str, np.ndarray]:
+    return emb_cache.get_many(keys) if emb_cache is not None else {}
+
+
+def store_vectors(items: Dict[str, np.ndarray]):
+    if emb_cache is not None:
+        emb_cache.put_many(items)
+
+
+def emb_cache_stats() -> dict:
+    if emb_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **emb_cache.stats()}
@@ -0,0 +1,180 @@
+"""
+임베딩 모델 (chunk / 질의)
+
+- get_emb_model / embed_texts: EMB_MODEL 을 EMB_BACKEND 로 한 번만 로드 (emb_backends.py), 정규화된 float32
+- QueryEmbedder (query_embedder): 동시에 들어온 질의를 micro-batch 로 모아 인코딩 + 최근 질의 LRU
+- 이전 스토어 / 임베딩 캐시의 chunk 벡터 재사용은 store_writer.ChunkEmbedder
+
+환경 변수:
+  EMB_MODEL=dragonkue/BGE-m3-ko
+  EMB_BACKEND=st                     st | torch-int8 | onnx | onnx-int8
+  RAG_QUERY_BATCH=32                 한 번에 인코딩할 최대 질의 수 (1이면 배칭 끔)
+  RAG_QUERY_BATCH_WAIT_MS=2
+  RAG_QUERY_CACHE=2048               최근 질의 임베딩 LRU (0이면 끔)
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .emb_backends import load_emb_model
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from emb_backends import load_emb_model
+
+# ---------- 임베딩 모델 ----------
+_EMB_MODEL_NAME = os.getenv("EMB_MODEL", "dragonkue/BGE-m3-ko")
+_EMB_BACKEND = os.getenv("EMB_BACKEND", "st")  # st | torch-int8 | onnx | onnx-int8 (emb_backends.py)
+
+# ---------- 질의 임베딩 micro-batching ----------
+_QUERY_BATCH = int(os.getenv("RAG_QUERY_BATCH", "32"))               # 한 번에 인코딩할 최대 질의 수 (1이면 배칭 끔)
+_QUERY_BATCH_WAIT_MS = float(os.getenv("RAG_QUERY_BATCH_WAIT_MS", "2"))
+_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE", "2048"))        # 최근 질의 임베딩 LRU (0이면 끔)
+
+
+# =========================================================
+# Dense 임베딩
+# =========================================================
+_emb_model = None
+_emb_model_lock = threading.Lock()
+def get_emb_model():
+    """EMB_MODEL 을 EMB_BACKEND(st/torch-int8/onnx/onnx-int8)로 한 번만 로드"""
+    global _emb_model
+    if _emb_model is None:
+        with _emb_model_lock:
+            if _emb_model is None:
+                print(f"[INFO] Loading embedding model: {_EMB_MODEL_NAME} ({_EMB_BACKEND})")
+                _emb_model = load_emb_model(_EMB_MODEL_NAME, _EMB_BACKEND)
+    return _emb_model
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    model = get_emb_model()
+    vecs = model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+    return vecs.astype("float32")
+
+def emb_model_id() -> str:
+    return f"{_EMB_MODEL_NAME}|{_EMB_BACKEND}"
+
+
+class QueryEmbedder:
+    """
+    질의 임베딩 micro-batcher: 동시에 들어온 질의를 max_wait_ms 동안(최대 max_batch개) 모아
+    embed_texts 한 번으로 인코딩하고 각 호출자의 Future에 나눠줌. 최근 질의는 LRU에서 바로 반환.
+    """
+
+    def __init__(self, max_batch: int = _QUERY_BATCH, max_wait_ms: float = _QUERY_BATCH_WAIT_MS,
+                 cache_size: int = _QUERY_CACHE_SIZE, encode=None):
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._encode = encode  # None이면 호출 시점의 embed_texts
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"requests": 0, "cache_hits": 0, "batches": 0, "encoded": 0, "errors": 0}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return (self._encode or embed_texts)(texts)
+
+    def _cache_get(self, text: str) -> Optional[np.ndarray]:
+        with self._lock:
+            self.counters["requests"] += 1
+            vec = self._cache.get(text)
+            if vec is not None:
+                self._cache.move_to_end(text)
+                self.counters["cache_hits"] += 1
+            return vec
+
+    def _cache_put(self, text: str, vec: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        vec.setflags(write=False)  # 여러 호출자가 같은 배열을 공유
+        with self._lock:
+            self._cache[text] = vec
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="query-embedder", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        last_size = 1
+        while True:
+            batch = [self._queue.get()]
+            # 직전 배치가 1개였으면(동시 요청 없음) 기다리지 않고 바로 인코딩
+            deadline = time.monotonic() + (self.max_wait_s if last_size > 1 else 0)
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    # 인코딩 중에 쌓인 요청은 기다리지 않고 바로 가져감
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            last_size = len(batch)
+            texts = list(dict.fromkeys(text for text, _ in batch))  # 배치 안 중복 질의는 한 번만
+            try:
+                vecs = self._encode_batch(texts)
+            except Exception as e:
+                with self._lock:
+                    self.counters["errors"] += 1
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            by_text = dict(zip(texts, vecs))
+            for text, vec in by_text.items():
+                self._cache_put(text, vec)
+            with self._lock:
+                self.counters["batches"] += 1
+                self.counters["encoded"] += len(texts)
+            for text, fut in batch:
+                fut.set_result(by_text[text])
+
+    # ---------- 공개 API ----------
+    def submit(self, text: str) -> Future:
+        """
+        [d] float32 임베딩 Future (캐시 hit이면 이미 완료된 Future) — asyncio에서는 wrap_future
+        인코딩은 항상 배치 스레드에서 (max_batch=1 이어도 호출자 = 이벤트 루프를 막지 않음)
+        """
+        vec = self._cache_get(text)
+        fut: Future = Future()
+        if vec is not None:
+            fut.set_result(vec)
+        else:
+            self._ensure_thread()
+            self._queue.put((text, fut))
+        return fut
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.submit(text).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            out["cache_entries"] = len(self._cache)
+        out["queue_depth"] = self._queue.qsize()
+        out["avg_batch"] = round(out["encoded"] / out["batches"], 2) if out["batches"] else 0.0
+        lookups = out["requests"]
+        out["cache_hit_rate"] = round(out["cache_hits"] / lookups, 4) if lookups else 0.0
+        return out
+
+
+query_embedder = QueryEmbedder()
+
+def embed_query(text: str) -> np.ndarray:
+    """[1, d] 질의 임베딩 (micro-batching + LRU)"""
+    return query_embedder.embed(text)[None, :]
@@ -0,0 +1,327 @@
+"""
+서재 (전체 책 통합 검색, storage/_library)
+
+여러 책의 chunk 를 이어붙인 shard 스토어들과 library.json (shard 별 책 구간).
+책 ingest 가 끝나면 StoreWriter 가 library_add 를, bulk-ingest 는 마지막에 library_add_many 를 부름.
+
+환경 변수:
+  RAG_LIBRARY_SHARD_CHUNKS=100000    shard 하나의 최대 chunk 수
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .chunking import simple_tokenize
+    from .dense_index import AnnIndex, _top_k
+    from .embedding import emb_model_id, embed_query
+    from .rag_store import LIBRARY_DIR, RAGStore, _atomic_write, doc_path, list_stores, read_store_meta
+    from .retrieval import _RETRIEVE_CANDIDATES, _normalize
+    from .store_cache import LoadedStore, _store_cache, get_store
+    from .store_writer import _INGEST_BATCH, StoreWriter
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import simple_tokenize
+    from dense_index import AnnIndex, _top_k
+    from embedding import emb_model_id, embed_query
+    from rag_store import LIBRARY_DIR, RAGStore, _atomic_write, doc_path, list_stores, read_store_meta
+    from retrieval import _RETRIEVE_CANDIDATES, _normalize
+    from store_cache import LoadedStore, _store_cache, get_store
+    from store_writer import _INGEST_BATCH, StoreWriter
+
+try:
+    import fcntl  # 서재 갱신을 프로세스 간 직렬화 (Windows 에는 없음 → 프로세스 안에서만 lock)
+except ImportError:
+    fcntl = None
+
+_LIBRARY_SHARD_CHUNKS = int(os.getenv("RAG_LIBRARY_SHARD_CHUNKS", "100000"))  # shard 하나의 최대 chunk 수
+
+
+# =========================================================
+# 서재 (전체 책 통합 검색)
+# =========================================================
+# storage/_library/
+#   library.json   {"version", "generation", "emb_dim",
+#                   "shards": [{"name": "_library/s000007", "docs": [{"doc_id", "start", "end"}]}]}
+#   s000007/       일반 schema 2 스토어 — 여러 책의 chunk 를 이어붙인 것 (책마다 연속 구간)
+#                  dense 인덱스는 RAG_INDEX 규칙 그대로 (큰 shard 는 HNSW / IVF-PQ)
+# 새 책은 마지막 shard 에 이어 붙여 (가득 차면 새 shard) 같은 이름의 새 버전으로 게시한다: 기존 chunk /
+# 임베딩은 바이트 복사, BM25 는 기존 postings 에 추가, HNSW / 학습된 IVF 는 새 벡터만 add
+# (IVF/PQ 는 학습 때보다 RAG_INDEX_RETRAIN_FRAC 넘게 커졌을 때만 다시 학습).
+# 이미 든 책을 다시 ingest / 삭제하면 그 shard 만 책별 스토어의 chunks/embeddings 로 다시 만들고
+# (재임베딩 없음) library.json 을 원자적으로 교체한 뒤 이전 shard 를 지운다.
+# 검색: shard 마다 BM25 top-N ∪ dense top-N 후보의 원래 점수를 모아 전체 최댓값으로 정규화해 결합.
+LIBRARY_VERSION = 1
+_library_lock = threading.Lock()
+
+def _library_root() -> Path:
+    return doc_path(LIBRARY_DIR)
+
+def load_library() -> dict:
+    path = _library_root() / "library.json"
+    if not path.exists():
+        return {"version": LIBRARY_VERSION, "generation": 0, "emb_dim": None, "shards": []}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def _save_library(lib: dict):
+    data = json.dumps(lib, ensure_ascii=False, indent=2).encode("utf-8")
+    _atomic_write(_library_root() / "library.json", lambda f: f.write(data))
+
+@contextmanager
+def _library_update_lock():
+    """같은 프로세스의 스레드 + (가능하면) 다른 프로세스의 동시 갱신을 막음"""
+    with _library_lock:
+        _library_root().mkdir(parents=True, exist_ok=True)
+        with open(_library_root() / ".lock", "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+def _shard_size(shard: dict) -> int:
+    return shard["docs"][-1]["end"] if shard["docs"] else 0
+
+def _add_books(lib: dict, writer: "StoreWriter", doc_ids: Sequence[str]) -> List[dict]:
+    """책별 스토어의 chunks + embeddings 를 배치 단위로 writer 에 이어 씀 → 추가된 책 구간 (없어진 책은 빠짐)"""
+    entries = []
+    for doc_id in doc_ids:
+        try:
+            store = RAGStore.load(doc_id)
+        except FileNotFoundError:
+            continue
+        if store.schema_version < 2:
+            print(f"[WARN] 서재: {doc_id} 는 이전 포맷 (convert 필요) → 제외")
+            continue
+        if lib.get("emb_dim") not in (None, store.emb_dim) or store.emb_model not in (None, emb_model_id()):
+            print(f"[WARN] 서재: {doc_id} 임베딩 모델이 다름 ({store.emb_model}, dim={store.emb_dim}) → 제외")
+            continue
+        lib["emb_dim"] = store.emb_dim
+        vecs = np.load(store.index_path, mmap_mode="r")
+        entries.append({"doc_id": doc_id, "start": writer.n, "end": writer.n + len(store.chunks)})
+        for i in range(0, len(store.chunks), _INGEST_BATCH):
+            writer.add(store.chunks[i:i + _INGEST_BATCH], vecs[i:i + _INGEST_BATCH])
+    return entries
+
+def _write_shard(lib: dict, doc_ids: Sequence[str], trained_from: Optional[str] = None) -> Optional[dict]:
+    """책별 스토어의 chunks + embeddings 로 새 shard 저장"""
+    name = f"{LIBRARY_DIR}/s{lib['generation'] + 1:06d}"
+    writer = StoreWriter(name, update_library=False)
+    try:
+        entries = _add_books(lib, writer, doc_ids)
+    except BaseException:
+        writer.abort()
+        raise
+    if not entries:
+        writer.abort()
+        return None
+    lib["generation"] += 1
+    writer.finish(trained_from=trained_from)
+    return {"name": name, "docs": entries}
+
+def _append_shard(lib: dict, pos: int, doc_ids: Sequence[str]):
+    """
+    shard 뒤에 새 책들을 이어 붙여 같은 이름의 새 버전으로 게시 → library.json 교체
+    (기존 chunk 는 다시 읽거나 토큰화하지 않음, ann 은 새 벡터만 add — StoreWriter(append=True))
+    게시 후 library.json 교체 전에 검색하는 쪽은 shard 가 더 길어도 이전 구간만 봄 (library_retrieve)
+    """
+    shard = lib["shards"][pos]
+    writer = StoreWriter(shard["name"], update_library=False, append=True)
+    try:
+        entries = _add_books(lib, writer, doc_ids)
+    except BaseException:
+        writer.abort()
+        raise
+    if not entries:
+        writer.abort()
+        return
+    writer.finish()
+    shard["docs"].extend(entries)
+    lib["generation"] += 1
+    _save_library(lib)
+
+def _drop_shard(name: str):
+    _store_cache.invalidate(name)
+    shutil.rmtree(doc_path(name), ignore_errors=True)
+
+def _replace_shard(lib: dict, pos: Optional[int], doc_ids: Sequence[str]):
+    """shard 하나를 다시 만들어 library.json 교체 (pos=None 이면 새 shard 추가)"""
+    old = lib["shards"][pos]["name"] if pos is not None else None
+    new = _write_shard(lib, doc_ids, trained_from=old)
+    if pos is None:
+        if new is not None:
+            lib["shards"].append(new)
+    elif new is None:
+        del lib["shards"][pos]
+    else:
+        lib["shards"][pos] = new
+    _save_library(lib)
+    if old is not None:
+        _drop_shard(old)
+
+def library_add(doc_id: str):
+    """책 하나를 서재에 추가/교체 (그 책이 든 shard 하나만 다시 만듦)"""
+    library_add_many([doc_id])
+
+def library_add_many(doc_ids: Sequence[str]):
+    """
+    여러 책을 한 번에 서재에 추가/교체 (bulk-ingest 용 — 책마다 library_add 를 부르면 마지막 shard 를 책 수만큼 다시 만듦)
+    - 이미 서재에 있는 책: 그 책들이 든 shard 를 한 번씩 다시 만듦
+    - 새 책: 마지막 shard 에 이어 붙이고 (_append_shard — 비용은 새 책 크기만큼), RAG_LIBRARY_SHARD_CHUNKS 를 넘으면 새 shard
+    """
+    doc_ids = list(dict.fromkeys(doc_ids))
+    sizes = {d: read_store_meta(d)["chunks"] for d in doc_ids}
+    with _library_update_lock():
+        lib = load_library()
+        where = {d["doc_id"]: pos for pos, shard in enumerate(lib["shards"]) for d in shard["docs"]}
+        for pos in sorted({where[d] for d in doc_ids if d in where}, reverse=True):
+            _replace_shard(lib, pos, [d["doc_id"] for d in lib["shards"][pos]["docs"]])
+
+        new = [d for d in doc_ids if d not in where]
+        pos = len(lib["shards"]) - 1 if lib["shards"] else None
+        size = _shard_size(lib["shards"][pos]) if pos is not None else 0
+        group = []  # pos shard 에 붙일 새 책
+        for doc_id in new + [None]:
+            n = sizes.get(doc_id, 0)
+            if doc_id is None or (size and size + n > _LIBRARY_SHARD_CHUNKS):
+                if group and pos is not None:
+                    _append_shard(lib, pos, group)
+                elif group:
+                    _replace_shard(lib, None, group)
+                pos, group, size = None, [], 0
+            if doc_id is not None:
+                group.append(doc_id)
+                size += n
+    print(f"[OK] 서재 갱신: {doc_ids[0] if len(doc_ids) == 1 else f'{len(doc_ids)}권'}")
+
+def library_remove(doc_id: str):
+    with _library_update_lock():
+        lib = load_library()
+        for pos, shard in enumerate(lib["shards"]):
+            doc_ids = [d["doc_id"] for d in shard["docs"]]
+            if doc_id in doc_ids:
+                doc_ids.remove(doc_id)
+                _replace_shard(lib, pos, doc_ids)
+                return True
+    return False
+
+def library_rebuild() -> dict:
+    """storage 아래 모든 책으로 서재를 처음부터 다시 만듦 (shard 당 RAG_LIBRARY_SHARD_CHUNKS)"""
+    doc_ids = list_stores()
+    with _library_update_lock():
+        lib = load_library()
+        old = [s["name"] for s in lib["shards"]]
+        lib.update(shards=[], emb_dim=None)
+        group, size = [], 0
+        for doc_id in doc_ids + [None]:
+            n = 0
+            if doc_id is not None:
+                n = read_store_meta(doc_id)["chunks"]
+            if group and (doc_id is None or size + n > _LIBRARY_SHARD_CHUNKS):
+                shard = _write_shard(lib, group)
+                if shard is not None:
+                    lib["shards"].append(shard)
+                group, size = [], 0
+            if doc_id is not None:
+                group.append(doc_id)
+                size += n
+        _save_library(lib)
+        for name in old:
+            _drop_shard(name)
+    return lib
+
+def library_docs() -> List[dict]:
+    return [{"doc_id": d["doc_id"], "chunks": d["end"] - d["start"], "shard": s["name"]}
+            for s in load_library()["shards"] for d in s["docs"]]
+
+def _shard_candidates(loaded: LoadedStore, query_tokens: List[str], qv: np.ndarray, n_cand: int,
+                      allowed: Optional[np.ndarray], nprobe: Optional[int], ef_search: Optional[int]
+                      ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """shard 안 후보 (chunk id, BM25 원점수, dense 원점수) — allowed 가 있으면 그 chunk 들만"""
+    n = len(loaded.store.chunks)
+    bm25_all = np.asarray(loaded.bm25.get_scores(query_tokens), dtype=np.float64)
+    pool = np.arange(n) if allowed is None else allowed
+    if n_cand <= 0 or n_cand >= len(pool):
+        cand = pool
+    else:
+        bm25_top = pool[_top_k(bm25_all[pool], n_cand)]
+        if isinstance(loaded.index, AnnIndex):
+            _, dense_ids = loaded.index.search(qv, n_cand, nprobe=nprobe, ef_search=ef_search,
+                                               allowed=allowed)
+        elif allowed is None:
+            _, dense_ids = loaded.index.search(qv, n_cand)
+        else:
+            sims = loaded.index.reconstruct_batch(allowed) @ qv[0]
+            dense_ids = allowed[_top_k(sims, n_cand)][None, :]
+        dense_ids = dense_ids[0][dense_ids[0] >= 0]
+        cand = np.union1d(bm25_top, dense_ids)
+    dense = loaded.index.reconstruct_batch(cand) @ qv[0]
+    return cand, bm25_all[cand], dense.astype(np.float64)
+
+def library_retrieve(query: str, k: int = 10, alpha: float = 0.5,
+                     doc_ids: Optional[Sequence[str]] = None,
+                     candidates: Optional[int] = None,
+                     qv: Optional[np.ndarray] = None,
+                     nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None) -> List[dict]:
+    """
+    서재 전체(또는 doc_ids 책들)에서 Hybrid 검색 → [{doc_id, chunk_id, score, text}] (점수 순)
+    chunk_id 는 책별 스토어의 chunk 번호와 같음. 점수 결합은 hybrid_retrieve 와 같은 방식.
+    """
+    lib = load_library()
+    if not lib["shards"]:
+        raise FileNotFoundError("[RAG] 서재가 비어 있습니다 (ingest 또는 library --rebuild)")
+    if candidates is None:
+        candidates = _RETRIEVE_CANDIDATES
+    wanted = set(doc_ids) if doc_ids else None
+    query_tokens = simple_tokenize(query)
+    if qv is None:
+        qv = embed_query(query)
+
+    found = []  # (shard, ranges, ids, bm25, dense)
+    for shard in lib["shards"]:
+        ranges = [d for d in shard["docs"] if wanted is None or d["doc_id"] in wanted]
+        if not ranges:
+            continue
+        try:
+            loaded = get_store(shard["name"])
+        except FileNotFoundError:
+            # 검색 도중 다른 ingest 가 shard 를 교체함 → 최신 library.json 으로 다시
+            if load_library()["generation"] == lib["generation"]:
+                raise
+            return library_retrieve(query, k, alpha, doc_ids, candidates, qv, nprobe, ef_search)
+        allowed = None
+        # shard 에 책이 막 이어 붙었는데 library.json 은 아직 이전 것이면 뒤쪽 chunk 는 구간 밖 → 제한
+        if len(ranges) < len(shard["docs"]) or len(loaded.store.chunks) != _shard_size(shard):
+            allowed = np.concatenate([np.arange(d["start"], d["end"]) for d in ranges])
+        ids, bm25, dense = _shard_candidates(loaded, query_tokens, qv, max(candidates, k) if candidates else 0,
+                                             allowed, nprobe, ef_search)
+        found.append((loaded, ranges, ids, bm25, dense))
+    if not found:
+        return []
+
+    bm25_max = max(float(f[3].max(initial=0.0)) for f in found)
+    dense_max = max(float(f[4].max(initial=0.0)) for f in found)
+    scored = []
+    for loaded, ranges, ids, bm25, dense in found:
+        hybrid = alpha * _normalize(bm25, bm25_max) + (1 - alpha) * _normalize(dense, dense_max)
+        for j in _top_k(hybrid, k):
+            scored.append((float(hybrid[j]), loaded, ranges, int(ids[j])))
+    scored.sort(key=lambda x: -x[0])
+
+    hits = []
+    for score, loaded, ranges, i in scored[:k]:
+        doc = next(d for d in ranges if d["start"] <= i < d["end"])
+        hits.append({"doc_id": doc["doc_id"], "chunk_id": i - doc["start"], "score": score,
+                     "text": loaded.store.chunks[i]})
+    return hits
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+로컬 Llama 추론 엔진 (CPU) + OpenAI 호환 HTTP 서버 (/v1/chat/completions)
+
+- prefix KV 캐시: build_answer_prompt / 요약 프롬프트는 앞부분(chat 템플릿 + 규칙 지시문)이 매번 같음.
+                  최근 프롬프트 앞부분(최대 LLAMA_PREFIX_TOKENS)의 KV 를 LRU 로 들고 있다가, 새 요청과
+                  LLAMA_PREFIX_MIN_TOKENS 이상 겹치면 겹친 만큼은 prefill 하지 않고 그 뒤 토큰만 계산
+                  (RoPE 가 적용된 key 를 그대로 쓰므로 결과는 처음부터 prefill 한 것과 같음)
+- continuous batching: 스케줄러 스레드 하나가 매 step 새 요청을 합류시키고(prefill) 끝난 요청을 빼면서,
+                  실행 중인 요청 전체를 forward 한 번으로 한 토큰씩 decode (left padding + attention mask)
+- temperature <= LLAMA_GREEDY_BELOW 이면 greedy(argmax), 아니면 temperature + top_p 샘플링
+- 모델은 프로세스에 하나 (get_engine). HTTP 요청 스레드들은 큐에 넣고 기다리기만 함
+- LLM_QUANT: 가중치 양자화 (float32 1B ≈ 5GB RAM)
+    none : float32 (기본)
+    int8 : torch dynamic int8 — 모든 nn.Linear 가중치를 채널별 int8 로, 활성값은 매 호출 동적 양자화
+           (같은 엔진 그대로: batching / prefix 캐시 유지. 로딩 중에는 잠깐 float32 크기만큼 필요)
+    gguf : llama.cpp (pip install llama-cpp-python) 로 LLAMA_GGUF 파일 실행 (Q4_K_M 등 int4)
+           토크나이저 / chat 템플릿은 HF_MODEL 것을 그대로 쓰고 토큰 id 를 넘김. 요청은 하나씩 처리하고
+           prefix 재사용은 llama.cpp 가 직전 요청과 겹치는 앞부분으로 알아서 함
+
+단독 실행 (backend/ 에서):
+  python -m model.read_summarize.llama_server --port 8001
+  OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=local uvicorn app:app   # /ask 등이 로컬 Llama 사용
+
+환경 변수:
+  HF_MODEL=meta-llama/Llama-3.2-1B-Instruct, HF_API_TOKEN
+  LLAMA_MAX_BATCH=8             동시에 decode 할 최대 요청 수 (나머지는 대기)
+  LLAMA_PREFIX_CACHE=4          prefix KV 캐시 항목 수 (1B float32 기준 512 토큰 ≈ 32MB)
+  LLAMA_PREFIX_TOKENS=512       항목 하나에 저장할 프롬프트 앞부분 최대 토큰 수
+  LLAMA_PREFIX_MIN_TOKENS=64    이만큼 이상 겹칠 때만 재사용 (chat 템플릿 머리말만 겹치는 경우 제외)
+  LLAMA_GREEDY_BELOW=0.3        temperature 가 이 값 이하면 greedy
+  LLAMA_THREADS=<cpu 수>        torch intra-op 스레드 수 (gguf: llama.cpp 스레드 수)
+  LLM_QUANT=none|int8|gguf      가중치 양자화 (위 참고)
+  LLAMA_GGUF=models/Llama-3.2-1B-Instruct-Q4_K_M.gguf   LLM_QUANT=gguf 일 때 모델 파일
+  LLAMA_N_CTX=4096              LLM_QUANT=gguf 일 때 context 길이
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# ---------- 모델 ----------
+_LLM_MODEL_NAME = os.getenv("HF_MODEL", "meta-llama/Llama-3.2-1B-Instruct")
+_HF_TOKEN = os.getenv("HF_API_TOKEN", None)
+
+# ---------- 스케줄러 / 캐시 ----------
+_MAX_BATCH = int(os.getenv("LLAMA_MAX_BATCH", "8"))
+_PREFIX_CACHE = int(os.getenv("LLAMA_PREFIX_CACHE", "4"))
+_PREFIX_TOKENS = int(os.getenv("LLAMA_PREFIX_TOKENS", "512"))
+_PREFIX_MIN_TOKENS = int(os.getenv("LLAMA_PREFIX_MIN_TOKENS", "64"))
+_GREEDY_BELOW = float(os.getenv("LLAMA_GREEDY_BELOW", "0.3"))
+_THREADS = int(os.getenv("LLAMA_THREADS", "0"))  # 0: torch 기본값
+
+# ---------- 양자화 ----------
+_QUANT = os.getenv("LLM_QUANT", "none").lower()
+_GGUF_PATH = os.getenv("LLAMA_GGUF", "")
+_N_CTX = int(os.getenv("LLAMA_N_CTX", "4096"))
+
+KV = List[Tuple["torch.Tensor", "torch.Tensor"]]  # layer 별 (key, value) [batch, heads, seq, head_dim]
+
+
+# =========================================================
+# KV 캐시 ↔ transformers Cache (4.x: legacy tuple, 5.x: DynamicCache(layers))
+# =========================================================
+def _to_cache(kv: KV):
+    from transformers import DynamicCache
+    if hasattr(DynamicCache, "from_legacy_cache"):
+        return DynamicCache.from_legacy_cache(tuple(kv))
+    return DynamicCache(ddp_cache_data=kv)
+
+def _from_cache(cache) -> KV:
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "to_legacy_cache"):
+        return list(cache.to_legacy_cache())
+    return list(cache)
+
+def _kv_slice(kv: KV, rows=slice(None), cols=slice(None)) -> KV:
+    return [(k[rows, :, cols], v[rows, :, cols]) for k, v in kv]
+
+def _kv_left_pad(kv: KV, n: int) -> KV:
+    if n <= 0:
+        return kv
+    import torch
+    out = []
+    for k, v in kv:
+        zk = k.new_zeros(k.shape[0], k.shape[1], n, k.shape[3])
+        zv = v.new_zeros(v.shape[0], v.shape[1], n, v.shape[3])
+        out.append((torch.cat([zk, k], dim=2), torch.cat([zv, v], dim=2)))
+    return out
+
+def _kv_nbytes(kv: KV) -> int:
+    return sum(k.numel() * k.element_size() + v.numel() * v.element_size() for k, v in kv)
+
+
+# =========================================================
+# 양자화
+# =========================================================
+def quantize_int8(model):
+    """
+    nn.Linear → DynamicQuantizedLinear (가중치 채널별 int8, 활성값은 호출마다 동적 양자화)
+    inplace 로 바꿔서 float32 사본을 하나 더 만들지 않음. 임베딩 / RMSNorm 은 float32 그대로
+    버려진 float32 가중치 메모리는 malloc_trim 으로 OS 에 돌려줌 (glibc, 안 하면 RSS 가 그대로 남음)
+    """
+    import ctypes
+    import gc
+    import warnings
+    import torch
+    from torch.ao.quantization import per_channel_dynamic_qconfig, quantize_dynamic
+    with warnings.catch_warnings():  # torch.ao.quantization deprecation 경고
+        warnings.simplefilter("ignore")
+        quantize_dynamic(model, {torch.nn.Linear: per_channel_dynamic_qconfig}, dtype=torch.qint8, inplace=True)
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):  # glibc 가 아닌 플랫폼
+        pass
+    return model
+
+
+# =========================================================
+# prefix KV 캐시
+# =========================================================
+class PrefixCache:
+    """
+    최근 프롬프트 앞부분 토큰 → KV (LRU). lookup 은 가장 길게 겹치는 항목을 찾음
+    항목 수가 적어(LLAMA_PREFIX_CACHE) 선형 비교로 충분
+    """
+
+    def __init__(self, max_entries: int = _PREFIX_CACHE, max_tokens: int = _PREFIX_TOKENS,
+                 min_tokens: int = _PREFIX_MIN_TOKENS):
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self._entries: "OrderedDict[Tuple[int, ...], KV]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "reused_tokens": 0}
+
+    @staticmethod
+    def _common(a: Sequence[int], b: Sequence[int]) -> int:
+        n = min(len(a), len(b))
+        for i in range(n):
+            if a[i] != b[i]:
+                return i
+        return n
+
+    def lookup(self, ids: Sequence[int]) -> Tuple[int, Optional[KV]]:
+        """→ (재사용할 토큰 수, KV[:, :, :n]) — 마지막 토큰은 logits 가 필요하므로 항상 새로 계산"""
+        best, best_key = 0, None
+        for key in self._entries:
+            n = self._common(key, ids)
+            if n > best:
+                best, best_key = n, key
+        best = min(best, len(ids) - 1)
+        if best_key is None or best < self.min_tokens:
+            self.counters["misses"] += 1
+            return 0, None
+        self._entries.move_to_end(best_key)
+        self.counters["hits"] += 1
+        self.counters["reused_tokens"] += best
+        return best, _kv_slice(self._entries[best_key], cols=slice(0, best))
+
+    def put(self, ids: Sequence[int], kv: KV):
+        """프롬프트 앞부분(max_tokens) 저장. 이미 같은 앞부분을 가진 항목이 있으면 그대로 둠"""
+        if self.max_entries <= 0:
+            return
+        n = min(len(ids), self.max_tokens)
+        if n < self.min_tokens:
+            return
+        key = tuple(ids[:n])
+        for other in self._entries:
+            if self._common(other, key) >= n:
+                self._entries.move_to_end(other)
+                return
+        self._entries[key] = [(k.clone(), v.clone()) for k, v in _kv_slice(kv, cols=slice(0, n))]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.counters["hits"] + self.counters["misses"]
+        return {**self.counters, "entries": len(self._entries),
+                "bytes": sum(_kv_nbytes(kv) for kv in self._entries.values()),
+                "hit_rate": round(self.counters["hits"] / total, 4) if total else 0.0}
+
+
+# =========================================================
+# 엔진
+# =========================================================
+@dataclass
+class GenRequest:
+    ids: List[int]
+    max_new_tokens: int = 256
+    temperature: float = 0.2
+    top_p: float = 0.9
+    on_text: Optional[Callable[[str], None]] = None   # 새로 확정된 텍스트 조각 (스트리밍)
+    future: Future = field(default_factory=Future)    # → {"text", "prompt_tokens", "completion_tokens", "finish_reason"}
+    created: float = field(default_factory=time.perf_counter)
+    first_token: Optional[float] = None               # 첫 토큰이 나온 시각 (perf_counter, TTFT 측정용)
+
+@dataclass
+class _Seq:
+    req: GenRequest
+    length: int                     # 패딩을 뺀 실제 길이 (다음 토큰의 position)
+    out: List[int] = field(default_factory=list)
+    emitted: int = 0                # on_text 로 내보낸 글자 수
+    reused: int = 0                 # prefix 캐시로 건너뛴 프롬프트 토큰 수
+
+
+class LlamaEngine:
+    """
+    submit(GenRequest) 는 바로 반환하고, 스케줄러 스레드가 요청들을 묶어서 처리
+    generate / stream 은 그 위의 동기 API (여러 스레드에서 동시에 불러도 됨)
+    """
+
+    def __init__(self, model_name: str = _LLM_MODEL_NAME, max_batch: int = _MAX_BATCH,
+                 prefix_cache: Optional[PrefixCache] = None, model=None, tokenizer=None,
+                 quant: str = _QUANT):
+        self.model_name = model_name
+        self.quant = quant
+        self.max_batch = max(1, max_batch)
+        self.prefix = prefix_cache if prefix_cache is not None else PrefixCache()
+        self.model, self.tok = model, tokenizer
+        self._queue: "queue.Queue[GenRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._eos: set = set()
+        self.counters = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                         "steps": 0, "batched_tokens": 0, "busy_s": 0.0}
+        self._active = 0
+
+    # ---------- 로딩 ----------
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                import torch
+                from transformers import AutoModelForCausalLM, AutoTokenizer
+                if _THREADS > 0:
+                    torch.set_num_threads(_THREADS)
+                kwargs = {"token": _HF_TOKEN} if _HF_TOKEN else {}
+                print(f"🔧 Loading model: {self.model_name} (CPU, continuous batching, quant={self.quant})")
+                self.tok = AutoTokenizer.from_pretrained(self.model_name, **kwargs)
+                self.model = AutoModelForCausalLM.from_pretrained(
+                    self.model_name, torch_dtype=torch.float32, low_cpu_mem_usage=True, **kwargs)
+                self.model.to("cpu")
+                if self.quant == "int8":
+                    quantize_int8(self.model)
+            self.model.eval()
+            self._set_eos(getattr(self.model.generation_config, "eos_token_id", None))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llama-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def _set_eos(self, eos):
+        eos = eos if isinstance(eos, (list, tuple)) else [eos]
+        self._eos = {e for e in list(eos) + [self.tok.eos_token_id] if e is not None}
+
+    def encode_chat(self, messages: Sequence[dict]) -> List[int]:
+        """chat 템플릿 적용 → 토큰 id (템플릿에 BOS 가 들어 있으므로 special token 은 추가하지 않음)"""
+        self.load()
+        text = self.tok.apply_chat_template(list(messages), add_generation_prompt=True, tokenize=False)
+        return list(self.tok(text, add_special_tokens=False)["input_ids"])
+
+    # ---------- 동기 API ----------
+    def submit(self, req: GenRequest) -> Future:
+        self.load()
+        self._queue.put(req)
+        return req.future
+
+    def generate(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.2,
+                 top_p: float = 0.9) -> str:
+        ids = self.encode_chat([{"role": "user", "content": prompt}])
+        return self.submit(GenRequest(ids, max_new_tokens, temperature, top_p)).result()["text"]
+
+    def stream(self, prompt: str, max_new_tokens: int = 256, temperature: float = 0.2,
+               top_p: float = 0.9) -> Iterator[str]:
+        ids = self.encode_chat([{"role": "user", "content": prompt}])
+        pieces: "queue.Queue[Optional[str]]" = queue.Queue()
+        fut = self.submit(GenRequest(ids, max_new_tokens, temperature, top_p, on_text=pieces.put))
+        fut.add_done_callback(lambda _: pieces.put(None))
+        while True:
+            piece = pieces.get()
+            if piece is None:
+                break
+            yield piece
+        fut.result()  # 오류면 여기서 전달
+
+    # ---------- 스케줄러 ----------
+    def _loop(self):
+        import torch
+        seqs: List[_Seq] = []
+        cache = None          # batch 전체의 KV (transformers Cache, decode step 마다 제자리에서 늘어남)
+        pad: List[int] = []
+        with torch.inference_mode():
+            while True:
+                # 1) 합류: 빈 자리만큼 대기 요청을 prefill (실행 중인 요청이 없으면 올 때까지 대기)
+                while len(seqs) < self.max_batch:
+                    try:
+                        req = self._queue.get(block=not seqs)
+                    except queue.Empty:
+                        break
+                    t0 = time.perf_counter()
+                    try:
+                        seq, seq_cache = self._prefill(req)
+                    except Exception as e:
+                        req.future.set_exception(e)
+                        continue
+                    finally:
+                        self.counters["busy_s"] += time.perf_counter() - t0
+                    if self._finished(seq):
+                        self._complete(seq)
+                        continue
+                    # 같은 길이 L 로 맞춰 batch 에 붙임 (짧은 쪽 왼쪽에 0 패딩, mask 로 가림)
+                    # batch 구성이 바뀔 때만 KV 를 새로 만들고, decode step 사이에는 같은 Cache 를 계속 씀
+                    if cache is None:
+                        cache, pad = seq_cache, [0]
+                    else:
+                        kv, seq_kv = _from_cache(cache), _from_cache(seq_cache)
+                        cur, new = kv[0][0].shape[2], seq_kv[0][0].shape[2]
+                        kv = _kv_left_pad(kv, new - cur)
+                        pad = [p + max(0, new - cur) for p in pad]
+                        seq_kv = _kv_left_pad(seq_kv, cur - new)
+                        cache = _to_cache([(torch.cat([k, k2]), torch.cat([v, v2]))
+                                           for (k, v), (k2, v2) in zip(kv, seq_kv)])
+                        pad.append(max(0, cur - new))
+                    seqs.append(seq)
+                self._active = len(seqs)
+                if not seqs:
+                    continue
+
+                # 2) decode 한 step (실행 중인 요청 전체를 forward 한 번으로)
+                t0 = time.perf_counter()
+                try:
+                    cache = self._decode_step(seqs, cache, pad)
+                except Exception as e:
+                    for s in seqs:
+                        s.req.future.set_exception(e)
+                    seqs, cache, pad = [], None, []
+                    continue
+                finally:
+                    self.counters["busy_s"] += time.perf_counter() - t0
+
+                # 3) 끝난 요청 빼고, 모든 행에 공통인 왼쪽 패딩 잘라냄
+                keep = [i for i, s in enumerate(seqs) if not self._finished(s)]
+                for i, s in enumerate(seqs):
+                    if i not in keep:
+                        self._complete(s)
+                if len(keep) < len(seqs):
+                    seqs = [seqs[i] for i in keep]
+                    pad = [pad[i] for i in keep]
+                    if seqs:
+                        rows = torch.tensor(keep)
+                        trim = min(pad)
+                        cache = _to_cache([(k.index_select(0, rows)[:, :, trim:], v.index_select(0, rows)[:, :, trim:])
+                                           for k, v in _from_cache(cache)])
+                        pad = [p - trim for p in pad]
+                    else:
+                        cache = None
+                self._active = len(seqs)
+
+    def _prefill(self, req: GenRequest):
+        """prefix 캐시에 있는 앞부분은 건너뛰고 나머지 프롬프트를 계산 → 첫 토큰까지"""
+        import torch
+        ids = req.ids
+        reused, prefix_kv = self.prefix.lookup(ids)
+        rest = torch.tensor([ids[reused:]])
+        out = self.model(
+            input_ids=rest,
+            attention_mask=torch.ones(1, len(ids), dtype=torch.long),
+            position_ids=torch.arange(reused, len(ids)).unsqueeze(0),
+            past_key_values=_to_cache(prefix_kv) if prefix_kv is not None else None,
+            use_cache=True,
+        )
+        self.prefix.put(ids, _from_cache(out.past_key_values))
+        seq = _Seq(req=req, length=len(ids), reused=reused)
+        self._append(seq, out.logits[:, -1, :])
+        self.counters["requests"] += 1
+        self.counters["prompt_tokens"] += len(ids)
+        return seq, out.past_key_values
+
+    def _decode_step(self, seqs: List[_Seq], cache, pad: List[int]):
+        import torch
+        total = cache.get_seq_length()
+        mask = torch.ones(len(seqs), total + 1, dtype=torch.long)
+        for row, p in enumerate(pad):
+            mask[row, :p] = 0
+        out = self.model(
+            input_ids=torch.tensor([[s.out[-1]] for s in seqs]),
+            attention_mask=mask,
+            position_ids=torch.tensor([[s.length - 1] for s in seqs]),
+            past_key_values=cache,
+            use_cache=True,
+        )
+        logits = out.logits[:, -1, :]
+        for row, s in enumerate(seqs):
+            self._append(s, logits[row:row + 1])
+        self.counters["steps"] += 1
+        self.counters["batched_tokens"] += len(seqs)
+        return out.past_key_values
+
+    # ---------- 토큰 선택 / 출력 ----------
+    def _append(self, seq: _Seq, logits):
+        self._push(seq, self._pick(logits, seq.req.temperature, seq.req.top_p))
+
+    def _push(self, seq: _Seq, token: int):
+        seq.out.append(token)
+        seq.length += 1
+        if seq.req.first_token is None:
+            seq.req.first_token = time.perf_counter()
+        self.counters["completion_tokens"] += 1
+        if seq.req.on_text is not None and seq.out[-1] not in self._eos:
+            text = self.tok.decode(seq.out, skip_special_tokens=True)
+            # 한글 등 여러 토큰에 걸친 글자는 완성될 때까지 보류
+            if len(text) > seq.emitted and not text.endswith("�"):
+                seq.req.on_text(text[seq.emitted:])
+                seq.emitted = len(text)
+
+    @staticmethod
+    def _pick(logits, temperature: float, top_p: float) -> int:
+        import torch
+        if temperature is None or temperature <= _GREEDY_BELOW:
+            return int(torch.argmax(logits, dim=-1))
+        probs = torch.softmax(logits.float() / temperature, dim=-1)[0]
+        if top_p is not None and top_p < 1.0:
+            sorted_p, order = torch.sort(probs, descending=True)
+            cut = torch.cumsum(sorted_p, dim=0) - sorted_p >= top_p   # 앞의 누적합이 top_p 를 넘은 토큰 제외
+            sorted_p[cut] = 0
+            return int(order[torch.multinomial(sorted_p / sorted_p.sum(), 1)])
+        return int(torch.multinomial(probs, 1))
+
+    def _finished(self, seq: _Seq) -> bool:
+        return seq.out[-1] in self._eos or len(seq.out) >= seq.req.max_new_tokens
+
+    def _complete(self, seq: _Seq):
+        reason = "stop" if seq.out[-1] in self._eos else "length"
+        text = self.tok.decode(seq.out, skip_special_tokens=True)
+        if seq.req.on_text is not None and len(text) > seq.emitted:
+            seq.req.on_text(text[seq.emitted:])
+        seq.req.future.set_result({"text": text.strip(), "prompt_tokens": len(seq.req.ids),
+                                   "completion_tokens": len(seq.out), "reused_prompt_tokens": seq.reused,
+                                   "finish_reason": reason})
+
+    def stats(self) -> dict:
+        c = dict(self.counters)
+        c.update(active=self._active, waiting=self._queue.qsize(), max_batch=self.max_batch,
+                 model=self.model_name, quant=self.quant, prefix_cache=self.prefix.stats())
+        c["avg_batch"] = round(c["batched_tokens"] / c["steps"], 2) if c["steps"] else 0.0
+        c["tokens_per_s"] = round(c["completion_tokens"] / c["busy_s"], 2) if c["busy_s"] else 0.0
+        return c
+
+
+class GGUFEngine(LlamaEngine):
+    """
+    LLM_QUANT=gguf: llama.cpp (llama-cpp-python) 로 GGUF(int4 등) 모델 실행. LlamaEngine 과 같은 API
+    - 토크나이저 / chat 템플릿 / 스트리밍 디코딩은 HF_MODEL 것을 그대로 쓰고 llama.cpp 에는 토큰 id 만 넘김
+      (GGUF 가 같은 모델을 변환한 것이어야 함)
+    - llama.cpp 컨텍스트는 하나라 요청을 순서대로 처리 (max_batch=1). Llama.generate 가 직전 요청과
+      겹치는 앞부분 KV 를 재사용하므로 PrefixCache 는 통계만 기록
+    """
+
+    def __init__(self, gguf_path: str = _GGUF_PATH, n_ctx: int = _N_CTX, **kwargs):
+        kwargs.setdefault("quant", "gguf")
+        super().__init__(max_batch=1, **kwargs)
+        self.gguf_path = gguf_path
+        self.n_ctx = n_ctx
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                try:
+                    from llama_cpp import Llama
+                except ImportError as e:
+                    raise RuntimeError("LLM_QUANT=gguf 에는 llama-cpp-python 이 필요합니다 "
+                                       "(pip install llama-cpp-python)") from e
+                if not self.gguf_path or not os.path.exists(self.gguf_path):
+                    raise RuntimeError(f"LLAMA_GGUF 파일이 없습니다: {self.gguf_path!r}")
+                from transformers import AutoTokenizer
+                kwargs = {"token": _HF_TOKEN} if _HF_TOKEN else {}
+                print(f"🔧 Loading model: {self.gguf_path} (CPU, llama.cpp, tokenizer={self.model_name})")
+                self.tok = AutoTokenizer.from_pretrained(self.model_name, **kwargs)
+                self.model = Llama(model_path=self.gguf_path, n_ctx=self.n_ctx, verbose=False,
+                                   **({"n_threads": _THREADS} if _THREADS > 0 else {}))
+            self._set_eos(self.model.token_eos())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="llama-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            req = self._queue.get()
+            t0 = time.perf_counter()
+            self._active = 1
+            try:
+                seq = self._run(req)
+            except Exception as e:
+                req.future.set_exception(e)
+            else:
+                self._complete(seq)
+            finally:
+                self.counters["busy_s"] += time.perf_counter() - t0
+                self._active = 0
+
+    def _run(self, req: GenRequest) -> _Seq:
+        if len(req.ids) + req.max_new_tokens > self.n_ctx:
+            raise ValueError(f"prompt {len(req.ids)} + max_new_tokens {req.max_new_tokens} > n_ctx {self.n_ctx}")
+        # Llama.generate 가 건너뛸 앞부분 (마지막 토큰은 logits 때문에 항상 다시 계산)
+        reused = min(PrefixCache._common(list(self.model._input_ids), req.ids), len(req.ids) - 1)
+        pc = self.prefix.counters
+        pc["hits" if reused else "misses"] += 1
+        pc["reused_tokens"] += reused
+        seq = _Seq(req=req, length=len(req.ids), reused=reused)
+        self.counters["requests"] += 1
+        self.counters["prompt_tokens"] += len(req.ids)
+        greedy = req.temperature is None or req.temperature <= _GREEDY_BELOW
+        for token in self.model.generate(req.ids, temp=0.0 if greedy else req.temperature,
+                                         top_p=1.0 if greedy else (req.top_p or 1.0), top_k=0, min_p=0.0,
+                                         repeat_penalty=1.0):
+            self._push(seq, int(token))
+            self.counters["steps"] += 1
+            self.counters["batched_tokens"] += 1
+            if self._finished(seq):
+                break
+        return seq
+
+
+_engine: Optional[LlamaEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> LlamaEngine:
+    """프로세스 전역 엔진 (처음 부를 때 모델 로딩 + 스케줄러 시작). LLM_QUANT=gguf 면 GGUFEngine"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = GGUFEngine() if _QUANT == "gguf" else LlamaEngine()
+    return _engine.load()
+
+
+# =========================================================
+# OpenAI 호환 HTTP 서버
+# =========================================================
+class LlamaHandler(BaseHTTPRequestHandler):
+    engine: LlamaEngine
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # 요청 로그 생략
+        pass
+
+    def _json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": self.engine.model_name, "object": "model"}]})
+        elif path.endswith("/stats"):
+            self._json(200, self.engine.stats())
+        elif path in ("", "/health"):
+            self._json(200, {"status": "ok", "model": self.engine.model_name})
+        else:
+            self._json(404, {"error": {"message": f"not found: {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"not found: {self.path}"}})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            ids = self.engine.encode_chat(body["messages"])
+        except (ValueError, KeyError, TypeError) as e:
+            self._json(400, {"error": {"message": f"bad request: {e}", "type": "invalid_request_error"}})
+            return
+        temperature = body.get("temperature")
+        req = GenRequest(ids, max_new_tokens=int(body.get("max_tokens") or 256),
+                         temperature=1.0 if temperature is None else float(temperature),
+                         top_p=float(body.get("top_p") or 1.0))
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model") or self.engine.model_name
+
+        if not body.get("stream"):
+            try:
+                r = self.engine.submit(req).result()
+            except Exception as e:
+                self._json(500, {"error": {"message": str(e), "type": "server_error"}})
+                return
+            self._json(200, {
+                "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": r["finish_reason"],
+                             "message": {"role": "assistant", "content": r["text"]}}],
+                "usage": {"prompt_tokens": r["prompt_tokens"], "completion_tokens": r["completion_tokens"],
+                          "total_tokens": r["prompt_tokens"] + r["completion_tokens"]},
+            })
+            return
+
+        pieces: "queue.Queue[Optional[str]]" = queue.Queue()
+        req.on_text = pieces.put
+        fut = self.engine.submit(req)
+        fut.add_done_callback(lambda _: pieces.put(None))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(delta: dict, finish: Optional[str] = None):
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            send({"role": "assistant"})
+            while True:
+                piece = pieces.get()
+                if piece is None:
+                    break
+                send({"content": piece})
+            exc = fut.exception()
+            if exc is not None:
+                self.wfile.write(f"data: {json.dumps({'error': {'message': str(exc)}})}\n\n".encode())
+            else:
+                send({}, fut.result()["finish_reason"])
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 끊어도 생성은 끝까지 (다음 step 에서 batch 에서 빠짐)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8001, engine: Optional[LlamaEngine] = None,
+          background: bool = False) -> ThreadingHTTPServer:
+    engine = engine.load() if engine is not None else get_engine()
+    handler = type("Handler", (LlamaHandler,), {"engine": engine})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Local Llama server (OpenAI-compatible, continuous batching)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ns = ap.parse_args()
+    srv = serve(ns.host, ns.port)
+    print(f"[llama] http://{ns.host}:{ns.port}/v1 (model={_LLM_MODEL_NAME}, quant={_QUANT}, max_batch={_MAX_BATCH}, "
+          f"prefix_cache={_PREFIX_CACHE}x{_PREFIX_TOKENS} tokens)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        srv.shutdown()
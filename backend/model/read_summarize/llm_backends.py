@@ -0,0 +1,761 @@
+"""
+LLM 백엔드 (LLM_BACKEND)
+
+- openai   OpenAI Chat Completions (기본, LLM_MODEL=gpt-4o-mini). OPENAI_BASE_URL 로 호환 서버도 가능
+- llama    로컬 Llama — llama_server 엔진을 같은 프로세스에서 (continuous batching + prefix KV 캐시, LLM_QUANT)
+- mock     네트워크 / 모델 없이 프롬프트로 정해지는 답 (개발, 부하 테스트 — LLM_MOCK_LATENCY_S)
+
+모든 백엔드는 같은 방법으로 호출: chat / stream (동기), achat / astream (async)
+- 응답 캐시(llm_cache exact)는 백엔드의 cache_model 이름으로 (openai 는 이전과 같은 키)
+- deadline: 호출 하나에 timeout 초 (기본 LLM_TIMEOUT_S) — 재시도 / backoff 대기까지 포함한 전체 시간
+- 재시도: timeout / 429 / 5xx / 연결 오류면 Retry-After 또는 지수 backoff(+jitter) 후 다시 (deadline 안에서만).
+          stream 은 첫 조각이 오기 전까지만 재시도
+- hedging: LLM_HEDGE_AFTER_S 초 안에 답이 없으면 같은 요청을 하나 더 보내 먼저 온 답 사용 (openai, 0 이면 끔)
+- circuit breaker: 연속 LLM_BREAKER_FAILURES 번 재시도 대상 오류가 나면 LLM_BREAKER_COOLDOWN_S 동안
+          보내지 않고 바로 실패, 그 뒤 요청 하나로 회복 확인
+- 실패는 오류 문자열이 아니라 LLMError (kind: timeout | rate_limit | unavailable | circuit_open | bad_request | error)
+- openai 는 httpx 연결 풀(LLM_POOL_CONNECTIONS) 을 프로세스에서 하나만 만들어 재사용
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+try:
+    from .llm_cache import llm_cache, exact_key
+except ImportError:  # 패키지 밖에서 직접 import 할 때
+    from llm_cache import llm_cache, exact_key
+
+# ---------- 백엔드 / 모델 ----------
+_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+_OPENAI_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+_TEMPERATURE, _TOP_P = 0.2, 0.9
+
+# ---------- deadline / 재시도 / hedging ----------
+_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "60"))
+_CONNECT_TIMEOUT_S = 5.0
+_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+_BACKOFF_BASE_S, _BACKOFF_MAX_S = 0.5, 20.0
+_HEDGE_AFTER_S = float(os.getenv("LLM_HEDGE_AFTER_S", "0"))
+
+# ---------- circuit breaker ----------
+_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))   # 0 이면 끔
+_BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+
+# ---------- HTTP 연결 풀 ----------
+_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "64"))
+_POOL_KEEPALIVE = int(os.getenv("LLM_POOL_KEEPALIVE", "32"))
+
+_RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+
+# =========================================================
+# 오류 / circuit breaker
+# =========================================================
+class LLMError(RuntimeError):
+    """LLM 호출 실패. kind 로 재시도 여부와 HTTP 상태를 정함"""
+
+    RETRYABLE = ("timeout", "rate_limit", "unavailable")
+    HTTP_STATUS = {"timeout": 504, "rate_limit": 503, "unavailable": 503, "circuit_open": 503}
+
+    def __init__(self, message: str, kind: str = "error", backend: str = "",
+                 status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(f"[{backend}] {message}" if backend else message)
+        self.kind = kind
+        self.backend = backend
+        self.status = status            # upstream HTTP 상태 (있으면)
+        self.retry_after = retry_after  # 초
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in self.RETRYABLE
+
+    @property
+    def http_status(self) -> int:
+        return self.HTTP_STATUS.get(self.kind, 502)
+
+    def to_dict(self) -> dict:
+        return {"error": str(self), "kind": self.kind, "backend": self.backend}
+
+
+class CircuitBreaker:
+    """
+    closed → (연속 failures 번 실패) → open: cooldown 동안 바로 LLMError(circuit_open)
+    → half-open: 요청 하나만 보내 보고 성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, failures: int = _BREAKER_FAILURES, cooldown_s: float = _BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None   # half-open 확인 요청을 보낸 시각
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() >= self._opened_at + self.cooldown_s else "open"
+
+    def admit(self, backend: str = ""):
+        if self.failures <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.cooldown_s - now
+            # 확인 요청이 응답 없이 사라진 경우(취소 등)를 위해 cooldown 이 지나면 다시 하나 허용
+            probing = self._probe_at is not None and now - self._probe_at < self.cooldown_s
+            if remaining > 0 or probing:
+                raise LLMError(f"circuit open ({self._consecutive} consecutive failures)", kind="circuit_open",
+                               backend=backend, retry_after=max(1.0, remaining))
+            self._probe_at = now
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = self._probe_at = None
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probe_at is not None or (self.failures > 0 and self._consecutive >= self.failures):
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probe_at = None
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive, "opened": self.opened}
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_lock = threading.Lock()
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(_POOL_CONNECTIONS, thread_name_prefix="llm-hedge")
+    return _hedge_executor
+
+
+# =========================================================
+# 공통
+# =========================================================
+class LLMBackend:
+    """
+    하위 클래스는 _complete / _stream (+ 필요하면 _acomplete / _astream, _map_error) 만 구현.
+    캐시, deadline, 재시도, hedging, circuit breaker, 통계는 여기서
+    """
+
+    name = "base"
+    use_cache = True
+
+    def __init__(self, model: str, temperature: float = _TEMPERATURE, top_p: float = _TOP_P,
+                 timeout: float = _TIMEOUT_S, retries: int = _RETRIES, hedge_after: float = 0.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.model = model
+        self.cache_model = model   # 응답 캐시 / 요약 트리에 기록할 모델 이름
+        self.temperature = temperature
+        self.top_p = top_p
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.counters = {"calls": 0, "cache_hits": 0, "retries": 0, "hedged": 0, "hedge_wins": 0}
+        self.errors: Dict[str, int] = {}
+
+    # ---------- 하위 클래스 ----------
+    def _complete(self, prompt: str, max_tokens: int, temperature: float, top_p: float, timeout: float) -> str:
+        raise NotImplementedError
+
+    def _stream(self, prompt: str, max_tokens: int, temperature: float, top_p: float,
+                deadline: float) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def _acomplete(self, prompt: str, max_tokens: int, temperature: float, top_p: float,
+                         timeout: float) -> str:
+        return await asyncio.to_thread(self._complete, prompt, max_tokens, temperature, top_p, timeout)
+
+    async def _astream(self, prompt: str, max_tokens: int, temperature: float, top_p: float,
+                       deadline: float) -> AsyncIterator[str]:
+        """
+        동기 _stream 을 스레드에서 돌리며 조각을 이벤트 루프로 넘김
+        받는 쪽이 중간에 끊으면 (클라이언트 연결 종료 / 취소) stop 이 켜지고 스레드는 다음 조각에서 멈춘 뒤
+        _stream 제너레이터를 close → 하위 클래스의 finally 에서 상류 스트림을 닫음
+        """
+        loop = asyncio.get_running_loop()
+        pieces: "asyncio.Queue[tuple]" = asyncio.Queue()
+        stop = threading.Event()
+
+        def emit(item):
+            if not stop.is_set():
+                try:
+                    loop.call_soon_threadsafe(pieces.put_nowait, item)
+                except RuntimeError:  # 이벤트 루프가 이미 닫힘
+                    stop.set()
+
+        def run():
+            upstream = self._stream(prompt, max_tokens, temperature, top_p, deadline)
+            try:
+                for piece in upstream:
+                    if stop.is_set():
+                        break
+                    emit((piece, None))
+            except BaseException as e:
+                emit((None, e))
+            else:
+                emit((None, None))
+            finally:
+                upstream.close()
+
+        loop.run_in_executor(None, run)
+        try:
+            while True:
+                piece, error = await pieces.get()
+                if piece is None:
+                    if error is not None:
+                        raise error
+                    return
+                yield piece
+        finally:
+            stop.set()
+
+    def _map_error(self, e: BaseException) -> LLMError:
+        if isinstance(e, LLMError):
+            return e
+        if isinstance(e, (TimeoutError, FutureTimeout)):
+            return LLMError(str(e) or "timeout", kind="timeout", backend=self.name)
+        if isinstance(e, ConnectionError):
+            return LLMError(str(e), kind="unavailable", backend=self.name)
+        if isinstance(e, ValueError):
+            return LLMError(str(e), kind="bad_request", backend=self.name)
+        return LLMError(f"{type(e).__name__}: {e}", backend=self.name)
+
+    # ---------- 캐시 ----------
+    def _cache_key(self, prompt: str, max_tokens: int, temperature: float, top_p: float) -> Optional[str]:
+        if llm_cache is None or not self.use_cache:
+            return None
+        return exact_key(self.cache_model, prompt, max_tokens, temperature, top_p)
+
+    def _cached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        value = llm_cache.get(key)
+        if value is not None:
+            self.counters["cache_hits"] += 1
+        return value
+
+    # async 경로: 캐시는 SQLite (get 도 UPDATE + commit, 쓰기 lock 대기 최대 5s) → 이벤트 루프 밖 스레드에서
+    async def _acached(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        return await asyncio.to_thread(self._cached, key)
+
+    async def _aput(self, key: Optional[str], value: str):
+        if key is not None:
+            await asyncio.to_thread(llm_cache.put, key, value)
+
+    # ---------- 재시도 / breaker ----------
+    def _failed(self, e: BaseException) -> LLMError:
+        err = self._map_error(e)
+        self.errors[err.kind] = self.errors.get(err.kind, 0) + 1
+        if err.retryable:
+            self.breaker.failure()
+        elif err.kind != "circuit_open":
+            self.breaker.success()  # 4xx 등: 서버는 응답했음
+        return err
+
+    def _retry_delay(self, err: LLMError, attempt: int, retries: int, deadline: float) -> Optional[float]:
+        """다시 보낼 거면 기다릴 초, 아니면 None (재시도 대상 아님 / 횟수 초과 / deadline 넘김)"""
+        if not err.retryable or attempt >= retries:
+            return None
+        delay = err.retry_after
+        if delay is None:
+            delay = min(_BACKOFF_MAX_S, _BACKOFF_BASE_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+        if time.monotonic() + delay >= deadline:
+            return None
+        self.counters["retries"] += 1
+        print(f"[WARN] LLM 재시도 {attempt + 1}/{retries} ({delay:.1f}s 후): {err}")
+        return delay
+
+    def _remaining(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError("deadline exceeded", kind="timeout", backend=self.name)
+        return remaining
+
+    def _params(self, temperature: Optional[float], top_p: Optional[float]):
+        return (self.temperature if temperature is None else temperature,
+                self.top_p if top_p is None else top_p)
+
+    # ---------- hedging ----------
+    def _attempt(self, call: Callable[[float], str], deadline: float) -> str:
+        timeout = self._remaining(deadline)
+        if self.hedge_after <= 0 or timeout <= self.hedge_after:
+            return call(timeout)
+        first = _hedge_pool().submit(call, timeout)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        self.counters["hedged"] += 1
+        second = _hedge_pool().submit(call, self._remaining(deadline))
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    if f is second:
+                        self.counters["hedge_wins"] += 1
+                    return f.result()
+                error = f.exception()
+        raise error
+
+    async def _aattempt(self, acall: Callable, deadline: float) -> str:
+        timeout = self._remaining(deadline)
+        if self.hedge_after <= 0 or timeout <= self.hedge_after:
+            return await acall(timeout)
+        tasks = [asyncio.ensure_future(acall(timeout))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done:
+                return tasks[0].result()
+            self.counters["hedged"] += 1
+            tasks.append(asyncio.ensure_future(acall(self._remaining(deadline))))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is tasks[1]:
+                            self.counters["hedge_wins"] += 1
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in tasks:  # 늦게 온 쪽 / 호출자가 취소한 경우
+                if not t.done():
+                    t.cancel()
+
+    # ---------- 공개 API ----------
+    def chat(self, prompt: str, max_tokens: int = 300, *, temperature: Optional[float] = None,
+             top_p: Optional[float] = None, timeout: Optional[float] = None,
+             retries: Optional[int] = None) -> str:
+        """답변 문자열 (실패하면 LLMError)"""
+        temperature, top_p = self._params(temperature, top_p)
+        key = self._cache_key(prompt, max_tokens, temperature, top_p)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        retries = self.retries if retries is None else retries
+
+        def call(t: float) -> str:
+            return self._complete(prompt, max_tokens, temperature, top_p, t)
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.admit(self.name)
+                answer = self._attempt(call, deadline)
+                break
+            except Exception as e:
+                err = self._failed(e)
+                delay = self._retry_delay(err, attempt, retries, deadline)
+                if delay is None:
+                    raise err from (None if err is e else e)
+                time.sleep(delay)
+                attempt += 1
+        self.breaker.success()
+        if key is not None:
+            llm_cache.put(key, answer)
+        return answer
+
+    async def achat(self, prompt: str, max_tokens: int = 300, *, temperature: Optional[float] = None,
+                    top_p: Optional[float] = None, timeout: Optional[float] = None,
+                    retries: Optional[int] = None) -> str:
+        """chat 의 async 버전 (FastAPI 이벤트 루프용)"""
+        temperature, top_p = self._params(temperature, top_p)
+        key = self._cache_key(prompt, max_tokens, temperature, top_p)
+        cached = await self._acached(key)
+        if cached is not None:
+            return cached
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        retries = self.retries if retries is None else retries
+
+        async def acall(t: float) -> str:
+            return await self._acomplete(prompt, max_tokens, temperature, top_p, t)
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.admit(self.name)
+                answer = await self._aattempt(acall, deadline)
+                break
+            except Exception as e:
+                err = self._failed(e)
+                delay = self._retry_delay(err, attempt, retries, deadline)
+                if delay is None:
+                    raise err from (None if err is e else e)
+                await asyncio.sleep(delay)
+                attempt += 1
+        self.breaker.success()
+        await self._aput(key, answer)
+        return answer
+
+    def stream(self, prompt: str, max_tokens: int = 300, *, temperature: Optional[float] = None,
+               top_p: Optional[float] = None, timeout: Optional[float] = None,
+               retries: Optional[int] = None) -> Iterator[str]:
+        """생성되는 텍스트 조각을 바로 yield (캐시 hit 이면 한 번에)"""
+        temperature, top_p = self._params(temperature, top_p)
+        key = self._cache_key(prompt, max_tokens, temperature, top_p)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        retries = self.retries if retries is None else retries
+        parts, attempt = [], 0
+        while True:
+            try:
+                self.breaker.admit(self.name)
+                for piece in self._stream(prompt, max_tokens, temperature, top_p, deadline):
+                    parts.append(piece)
+                    yield piece
+                break
+            except Exception as e:
+                err = self._failed(e)
+                delay = None if parts else self._retry_delay(err, attempt, retries, deadline)
+                if delay is None:
+                    raise err from (None if err is e else e)
+                time.sleep(delay)
+                attempt += 1
+        self.breaker.success()
+        if key is not None and parts:
+            llm_cache.put(key, "".join(parts).strip())
+
+    async def astream(self, prompt: str, max_tokens: int = 300, *, temperature: Optional[float] = None,
+                      top_p: Optional[float] = None, timeout: Optional[float] = None,
+                      retries: Optional[int] = None) -> AsyncIterator[str]:
+        """stream 의 async 버전"""
+        temperature, top_p = self._params(temperature, top_p)
+        key = self._cache_key(prompt, max_tokens, temperature, top_p)
+        cached = await self._acached(key)
+        if cached is not None:
+            yield cached
+            return
+        self.counters["calls"] += 1
+        deadline = time.monotonic() + (timeout or self.timeout)
+        retries = self.retries if retries is None else retries
+        parts, attempt = [], 0
+        while True:
+            try:
+                self.breaker.admit(self.name)
+                upstream = self._astream(prompt, max_tokens, temperature, top_p, deadline)
+                try:
+                    async for piece in upstream:
+                        parts.append(piece)
+                        yield piece
+                finally:
+                    # 받는 쪽이 끊어도 GC 를 기다리지 않고 바로 상류 스트림 정리
+                    await upstream.aclose()
+                break
+            except Exception as e:
+                err = self._failed(e)
+                delay = None if parts else self._retry_delay(err, attempt, retries, deadline)
+                if delay is None:
+                    raise err from (None if err is e else e)
+                await asyncio.sleep(delay)
+                attempt += 1
+        self.breaker.success()
+        if parts:
+            await self._aput(key, "".join(parts).strip())
+
+    def warmup(self):
+        """첫 요청 전에 클라이언트 / 모델 준비 (app 의 백그라운드 warm-up 에서 호출)"""
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model, **self.counters, "errors": dict(self.errors),
+                "timeout_s": self.timeout, "retries_max": self.retries, "hedge_after_s": self.hedge_after,
+                "breaker": self.breaker.stats()}
+
+
+# =========================================================
+# OpenAI
+# =========================================================
+def _retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI / 호환 서버. 동기·async 클라이언트를 하나씩만 만들고 httpx 연결 풀을 공유 (SDK 재시도는 끄고 여기서)"""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None, **kwargs):
+        kwargs.setdefault("hedge_after", _HEDGE_AFTER_S)
+        super().__init__(model or _OPENAI_MODEL, **kwargs)
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+        self._client = None
+        self._aclient = None
+        self._lock = threading.Lock()
+
+    def _http_options(self) -> dict:
+        import httpx
+        return {"limits": httpx.Limits(max_connections=_POOL_CONNECTIONS, max_keepalive_connections=_POOL_KEEPALIVE),
+                "timeout": httpx.Timeout(self.timeout, connect=_CONNECT_TIMEOUT_S)}
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import httpx
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                      http_client=httpx.Client(**self._http_options()))
+        return self._client
+
+    @property
+    def aclient(self):
+        with self._lock:
+            if self._aclient is None:
+                import httpx
+                from openai import AsyncOpenAI
+                self._aclient = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                            http_client=httpx.AsyncClient(**self._http_options()))
+        return self._aclient
+
+    def warmup(self):
+        # openai / httpx import 와 연결 풀 생성 (첫 연결은 첫 요청 때)
+        self.client, self.aclient
+
+    def _request(self, prompt: str, max_tokens: int, temperature: float, top_p: float) -> dict:
+        return {"model": self.model, "messages": [{"role": "user", "content": prompt}],
+                "max_tokens": max_tokens, "temperature": temperature, "top_p": top_p}
+
+    def _complete(self, prompt, max_tokens, temperature, top_p, timeout):
+        response = self.client.with_options(timeout=timeout).chat.completions.create(
+            **self._request(prompt, max_tokens, temperature, top_p))
+        return (response.choices[0].message.content or "").strip()
+
+    async def _acomplete(self, prompt, max_tokens, temperature, top_p, timeout):
+        response = await self.aclient.with_options(timeout=timeout).chat.completions.create(
+            **self._request(prompt, max_tokens, temperature, top_p))
+        return (response.choices[0].message.content or "").strip()
+
+    def _stream(self, prompt, max_tokens, temperature, top_p, deadline):
+        stream = self.client.with_options(timeout=self._remaining(deadline)).chat.completions.create(
+            **self._request(prompt, max_tokens, temperature, top_p), stream=True)
+        try:
+            for event in stream:
+                self._remaining(deadline)
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            stream.close()
+
+    async def _astream(self, prompt, max_tokens, temperature, top_p, deadline):
+        stream = await self.aclient.with_options(timeout=self._remaining(deadline)).chat.completions.create(
+            **self._request(prompt, max_tokens, temperature, top_p), stream=True)
+        try:
+            async for event in stream:
+                self._remaining(deadline)
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            await stream.close()
+
+    def _map_error(self, e):
+        from openai import APIConnectionError, APIStatusError, APITimeoutError
+        if isinstance(e, APITimeoutError):
+            return LLMError(str(e), kind="timeout", backend=self.name)
+        if isinstance(e, APIConnectionError):
+            return LLMError(str(e), kind="unavailable", backend=self.name)
+        if isinstance(e, APIStatusError):
+            status = e.status_code
+            kind = ("rate_limit" if status == 429 else "unavailable" if status in _RETRYABLE_STATUS
+                    else "bad_request" if 400 <= status < 500 else "error")
+            return LLMError(str(e), kind=kind, backend=self.name, status=status, retry_after=_retry_after(e))
+        return super()._map_error(e)
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.close()
+        if self._client is not None:
+            self._client.close()
+
+
+# =========================================================
+# 로컬 Llama (llama_server 엔진)
+# =========================================================
+def _llama_server():
+    try:
+        from . import llama_server
+    except ImportError:
+        import llama_server
+    return llama_server
+
+
+class LlamaBackend(LLMBackend):
+    """
+    같은 프로세스의 llama_server 엔진에 요청 (여러 스레드 / 코루틴의 요청이 한 batch 로 decode).
+    다시 보내도 같은 엔진이 같은 답을 내므로 기본 재시도 0, deadline 이 지나면 기다리기만 멈춤
+    """
+
+    name = "llama"
+
+    def __init__(self, model: Optional[str] = None, **kwargs):
+        kwargs.setdefault("retries", 0)
+        super().__init__(model or os.getenv("HF_MODEL", "meta-llama/Llama-3.2-1B-Instruct"), **kwargs)
+        quant = os.getenv("LLM_QUANT", "none").lower()
+        # 양자화하면 답이 달라질 수 있으므로 응답 캐시 키에 포함
+        self.cache_model = self.model if quant == "none" else f"{self.model}@{quant}"
+
+    @property
+    def engine(self):
+        return _llama_server().get_engine()
+
+    def warmup(self):
+        self.engine
+
+    def _submit(self, prompt, max_tokens, temperature, top_p, on_text=None):
+        L = _llama_server()
+        engine = self.engine
+        req = L.GenRequest(engine.encode_chat([{"role": "user", "content": prompt}]), max_tokens,
+                           temperature, top_p, on_text=on_text)
+        return engine.submit(req)
+
+    def _complete(self, prompt, max_tokens, temperature, top_p, timeout):
+        future = self._submit(prompt, max_tokens, temperature, top_p)
+        try:
+            return future.result(timeout=timeout)["text"]
+        except FutureTimeout:
+            raise LLMError(f"no answer in {timeout:.0f}s", kind="timeout", backend=self.name) from None
+
+    async def _acomplete(self, prompt, max_tokens, temperature, top_p, timeout):
+        future = self._submit(prompt, max_tokens, temperature, top_p)
+        try:
+            return (await asyncio.wait_for(asyncio.wrap_future(future), timeout))["text"]
+        except asyncio.TimeoutError:
+            raise LLMError(f"no answer in {timeout:.0f}s", kind="timeout", backend=self.name) from None
+
+    def _stream(self, prompt, max_tokens, temperature, top_p, deadline):
+        pieces: "queue.Queue[Optional[str]]" = queue.Queue()
+        future = self._submit(prompt, max_tokens, temperature, top_p, on_text=pieces.put)
+        future.add_done_callback(lambda _: pieces.put(None))
+        while True:
+            try:
+                piece = pieces.get(timeout=self._remaining(deadline))
+            except queue.Empty:
+                raise LLMError("deadline exceeded", kind="timeout", backend=self.name) from None
+            if piece is None:
+                break
+            yield piece
+        future.result()  # 엔진 오류면 여기서 전달
+
+
+# =========================================================
+# mock
+# =========================================================
+class MockBackend(LLMBackend):
+    """프롬프트 해시 + 끝부분 단어로 만든 정해진 답. LLM_MOCK_LATENCY_S 만큼 지연 (응답 캐시는 쓰지 않음)"""
+
+    name = "mock"
+    use_cache = False
+
+    def __init__(self, model: str = "mock", latency_s: Optional[float] = None, **kwargs):
+        kwargs.setdefault("retries", 0)
+        super().__init__(model, **kwargs)
+        self.latency_s = float(os.getenv("LLM_MOCK_LATENCY_S", "0")) if latency_s is None else latency_s
+
+    def answer(self, prompt: str, max_tokens: int) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        words = prompt.split()
+        return f"📌 (mock {digest}) " + " ".join(words[-min(24, max(1, max_tokens // 4)):])
+
+    def _complete(self, prompt, max_tokens, temperature, top_p, timeout):
+        if self.latency_s > timeout:
+            time.sleep(timeout)
+            raise LLMError(f"no answer in {timeout:.0f}s", kind="timeout", backend=self.name)
+        time.sleep(self.latency_s)
+        return self.answer(prompt, max_tokens)
+
+    async def _acomplete(self, prompt, max_tokens, temperature, top_p, timeout):
+        if self.latency_s > timeout:
+            await asyncio.sleep(timeout)
+            raise LLMError(f"no answer in {timeout:.0f}s", kind="timeout", backend=self.name)
+        await asyncio.sleep(self.latency_s)
+        return self.answer(prompt, max_tokens)
+
+    def _stream(self, prompt, max_tokens, temperature, top_p, deadline):
+        words = self.answer(prompt, max_tokens).split(" ")
+        for i, word in enumerate(words):
+            time.sleep(min(self.latency_s / len(words), self._remaining(deadline)))
+            yield word if i == 0 else " " + word
+
+
+# =========================================================
+# 선택
+# =========================================================
+BACKENDS: Dict[str, Callable[[], LLMBackend]] = {
+    "openai": OpenAIBackend,
+    "llama": LlamaBackend,
+    "mock": MockBackend,
+}
+
+_backends: Dict[str, LLMBackend] = {}
+_backends_lock = threading.Lock()
+_default = _BACKEND
+
+def set_default_backend(name: str):
+    """get_backend() 기본값 바꾸기 (CLI --llm 등)"""
+    global _default
+    if name not in BACKENDS:
+        raise ValueError(f"unknown LLM backend {name!r} (choices: {', '.join(BACKENDS)})")
+    _default = name
+
+def get_backend(name: Optional[str] = None) -> LLMBackend:
+    """프로세스 전역 백엔드 (이름별 하나, 기본 LLM_BACKEND). 클라이언트 / 모델은 처음 호출할 때 만듦"""
+    name = (name or _default).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"unknown LLM backend {name!r} (choices: {', '.join(BACKENDS)})")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+def llm_stats() -> dict:
+    """만들어진 백엔드별 호출 / 재시도 / hedging / 오류 / breaker 상태"""
+    with _backends_lock:
+        backends = dict(_backends)
+    return {"default": _default, "backends": {name: b.stats() for name, b in backends.items()}}
@@ -0,0 +1,254 @@
+"""
+LLM 응답 캐시 (gpt4omini_chat / llama_chat 공용)
+
+- exact:    (model, prompt 해시, max_tokens, temperature, top_p) 가 같으면 저장된 응답 그대로 반환
+- semantic: 같은 doc_id 에 대한 질문의 질의 임베딩(BGE-m3-ko, 정규화됨) 코사인 유사도가
+            threshold 이상이면 이전 답변 재사용 (LLM_CACHE_SEMANTIC_THRESHOLD, 0이면 끔)
+- 저장소:   SQLite 파일 하나 (여러 uvicorn 워커/CLI 가 공유), TTL 지난 항목은 무시·정리,
+            max_entries 를 넘으면 last_used 가 오래된 것부터 제거 (LRU)
+- stats():  tier 별 hit / miss / hit_rate
+
+환경 변수:
+  LLM_CACHE=0                         캐시 끔
+  LLM_CACHE_PATH=.../llm_cache.sqlite3
+  LLM_CACHE_TTL_S=604800              (7일)
+  LLM_CACHE_MAX_ENTRIES=20000
+  LLM_CACHE_SEMANTIC_THRESHOLD=0.95   (기본 0 = semantic tier 끔)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:  # numpy 는 벡터를 다룰 때 import (app import 시간에 넣지 않음)
+    import numpy as np
+
+DEFAULT_PATH = Path(__file__).parent / "cache" / "llm_cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    tier       TEXT NOT NULL,             -- exact | semantic
+    scope      TEXT,                      -- semantic: 응답 종류 (예: ask:gpt-4o-mini:k=6)
+    doc_id     TEXT,
+    embedding  BLOB,                      -- semantic: float32 질의 임베딩
+    value      TEXT NOT NULL,             -- JSON
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used);
+CREATE INDEX IF NOT EXISTS responses_doc ON responses(doc_id, scope);
+"""
+
+_PURGE_EVERY = 128  # put N번마다 TTL/LRU 정리
+
+
+def exact_key(model: str, prompt: str, max_tokens: int, temperature: float,
+              top_p: float = 1.0) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([model, max_tokens, round(temperature, 4), round(top_p, 4)]).encode())
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return "x:" + h.hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path = DEFAULT_PATH, ttl_s: float = 7 * 24 * 3600,
+                 max_entries: int = 20000, semantic_threshold: float = 0.0):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # (scope, doc_id) -> (keys, [n, d] 임베딩 행렬) — 첫 조회 때 SQLite 에서 읽어 옴
+        self._vectors: Dict[Tuple[str, str], Tuple[List[str], np.ndarray]] = {}
+        self._puts = 0
+        self.counters = {"exact_hits": 0, "exact_misses": 0,
+                         "semantic_hits": 0, "semantic_misses": 0, "evictions": 0}
+
+    # ---------- 내부 ----------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _fresh(self, created_at: float, now: float) -> bool:
+        return self.ttl_s <= 0 or now - created_at <= self.ttl_s
+
+    def _get_row(self, key: str) -> Optional[Any]:
+        now = time.time()
+        db = self._db()
+        row = db.execute("SELECT value, created_at FROM responses WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        if not self._fresh(row[1], now):
+            db.execute("DELETE FROM responses WHERE key=?", (key,))
+            db.commit()
+            return None
+        db.execute("UPDATE responses SET last_used=?, hits=hits+1 WHERE key=?", (now, key))
+        db.commit()
+        return json.loads(row[0])
+
+    def _put_row(self, key: str, value: Any, tier: str, scope: Optional[str] = None,
+                 doc_id: Optional[str] = None, embedding: Optional[np.ndarray] = None):
+        import numpy as np
+        now = time.time()
+        blob = None if embedding is None else np.asarray(embedding, dtype="float32").tobytes()
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO responses"
+            "(key, tier, scope, doc_id, embedding, value, created_at, last_used, hits)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+            (key, tier, scope, doc_id, blob, json.dumps(value, ensure_ascii=False), now, now),
+        )
+        db.commit()
+        self._puts += 1
+        if self._puts % _PURGE_EVERY == 0:
+            self._purge()
+
+    def _purge(self):
+        db = self._db()
+        removed = 0
+        if self.ttl_s > 0:
+            removed += db.execute("DELETE FROM responses WHERE created_at < ?",
+                                  (time.time() - self.ttl_s,)).rowcount
+        over = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if over > 0:
+            removed += db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used LIMIT ?)", (over,)).rowcount
+        db.commit()
+        if removed:
+            self.counters["evictions"] += removed
+            self._vectors.clear()  # 지워진 semantic 항목 반영 (다음 조회 때 다시 읽음)
+
+    def _semantic_matrix(self, scope: str, doc_id: str) -> Tuple[List[str], np.ndarray]:
+        import numpy as np
+        entry = self._vectors.get((scope, doc_id))
+        if entry is None:
+            rows = self._db().execute(
+                "SELECT key, embedding FROM responses WHERE tier='semantic' AND scope=? AND doc_id=?",
+                (scope, doc_id)).fetchall()
+            keys = [r[0] for r in rows]
+            vecs = [np.frombuffer(r[1], dtype="float32") for r in rows]
+            entry = (keys, np.stack(vecs) if vecs else np.zeros((0, 0), dtype="float32"))
+            self._vectors[(scope, doc_id)] = entry
+        return entry
+
+    # ---------- exact tier ----------
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._get_row(key)
+            self.counters["exact_hits" if value is not None else "exact_misses"] += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._put_row(key, value, "exact")
+
+    # ---------- semantic tier ----------
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold > 0
+
+    def get_semantic(self, scope: str, doc_id: str, qv: np.ndarray) -> Optional[Any]:
+        """같은 scope/doc_id 에서 가장 비슷한 질문의 응답 (유사도 < threshold 이면 None)"""
+        if not self.semantic_enabled:
+            return None
+        import numpy as np
+        q = np.asarray(qv, dtype="float32").reshape(-1)
+        with self._lock:
+            keys, mat = self._semantic_matrix(scope, doc_id)
+            value = None
+            if len(keys) and mat.shape[1] == q.shape[0]:
+                sims = mat @ q
+                best = int(np.argmax(sims))
+                if sims[best] >= self.semantic_threshold:
+                    value = self._get_row(keys[best])
+                    if value is None:  # TTL 만료로 지워짐
+                        self._vectors.pop((scope, doc_id), None)
+            self.counters["semantic_hits" if value is not None else "semantic_misses"] += 1
+            return value
+
+    def put_semantic(self, scope: str, doc_id: str, qv: np.ndarray, value: Any):
+        if not self.semantic_enabled:
+            return
+        import numpy as np
+        q = np.asarray(qv, dtype="float32").reshape(-1)
+        key = "s:" + hashlib.sha256(scope.encode() + b"\0" + doc_id.encode() + b"\0"
+                                    + q.tobytes()).hexdigest()
+        with self._lock:
+            self._put_row(key, value, "semantic", scope=scope, doc_id=doc_id, embedding=q)
+            entry = self._vectors.get((scope, doc_id))
+            if entry is not None:
+                keys, mat = entry
+                if key not in keys:
+                    mat = q[None, :] if not len(keys) else np.vstack([mat, q[None, :]])
+                    self._vectors[(scope, doc_id)] = (keys + [key], mat)
+
+    # ---------- 관리 ----------
+    def invalidate_doc(self, doc_id: str):
+        """문서가 다시 ingest 되면 그 문서의 semantic 응답은 무효"""
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses WHERE tier='semantic' AND doc_id=?", (doc_id,))
+            db.commit()
+            for scope_doc in [sd for sd in self._vectors if sd[1] == doc_id]:
+                del self._vectors[scope_doc]
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
+            self._vectors.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            rows = self._db().execute(
+                "SELECT tier, COUNT(*) FROM responses GROUP BY tier").fetchall()
+        for tier in ("exact", "semantic"):
+            total = out[f"{tier}_hits"] + out[f"{tier}_misses"]
+            out[f"{tier}_hit_rate"] = round(out[f"{tier}_hits"] / total, 4) if total else 0.0
+        out["entries"] = {tier: n for tier, n in rows}
+        out.update({"path": str(self.path), "ttl_s": self.ttl_s, "max_entries": self.max_entries,
+                    "semantic_threshold": self.semantic_threshold})
+        return out
+
+
+# =========================================================
+# 프로세스 전역 캐시
+# =========================================================
+def _from_env() -> Optional[LLMCache]:
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    return LLMCache(
+        path=Path(os.getenv("LLM_CACHE_PATH", str(DEFAULT_PATH))),
+        ttl_s=float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000")),
+        semantic_threshold=float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0")),
+    )
+
+
+llm_cache: Optional[LLMCache] = _from_env()
+
+
+def cache_stats() -> dict:
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_cache.stats()}
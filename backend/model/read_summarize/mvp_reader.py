@@ -27,6 +27,10 @@ RAG MVP: Hybrid Search (BM25 + Dense) + Llama
 
   python mvp_reader.py ui
 
+  (3)LLM 백엔드 바꾸기 (openai | llama | mock, 기본 LLM_BACKEND)
+  python mvp_reader.py --llm llama ask --doc_id novel -q "주인공은 어디 갔어?"
+  python mvp_reader.py --llm llama ui
+
   로미오는 무슨 가문의 딸이었지?
   티볼트 죽었어? 줄리엣과 무슨 사이길래 슬퍼하지?
   머큐리 죽었어? 로미오와 무슨 사이길래 슬퍼하지?
@@ -41,255 +45,249 @@ RAG MVP: Hybrid Search (BM25 + Dense) + Llama
 """
 
 from __future__ import annotations
-import argparse, os, re, json, pickle
+import argparse
+import json
+import os
+import tempfile
+import time
+from itertools import islice
 from pathlib import Path
-from dataclasses import dataclass
 
-from typing import List, Tuple
+from typing import Callable, Optional, Tuple
 
 from dotenv import load_dotenv
-load_dotenv()  # .env 파일 자동 로드
+load_dotenv()  # .env 파일 자동 로드 (아래 모듈들이 import 때 환경 변수를 읽음)
 
 
 import numpy as np
-from openai import OpenAI
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-# ---------- 저장 루트 ----------
-STORAGE_ROOT = Path(__file__).parent / "storage"
-
-# ---------- 임베딩 모델 ----------
-_EMB_MODEL_NAME = os.getenv("EMB_MODEL", "dragonkue/BGE-m3-ko")
-
 
-# ---------- 라이브러리 체크 ----------
+# ---------- 텍스트 / chunk / 토큰 예산 ----------
 try:
-    import faiss
-except ImportError as e:
-    raise SystemExit("[ERROR] pip install faiss-cpu") from e
+    from .chunking import (  # noqa: F401  (app / bench / mvp_reader_llama 가 mvp_reader.* 로 씀)
+        _CONTEXT_TOKENS, count_tokens, fit_contexts, iter_chunks, iter_units, make_chunks, pack_units,
+        read_text, simple_tokenize, split_paragraphs, split_sentences,
+    )
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import (  # noqa: F401
+        _CONTEXT_TOKENS, count_tokens, fit_contexts, iter_chunks, iter_units, make_chunks, pack_units,
+        read_text, simple_tokenize, split_paragraphs, split_sentences,
+    )
 
+# ---------- 스토어 (포맷 / 캐시 / 쓰기) ----------
 try:
-    from rank_bm25 import BM25Okapi
-except ImportError as e:
-    raise SystemExit("[ERROR] pip install rank-bm25") from e
-
-# =========================================================
-# 유틸
-# =========================================================
-def read_text(path: Path) -> str:
-    return path.read_text(encoding="utf-8", errors="ignore")
-
-def split_sentences(text: str) -> List[str]:
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
-    text = re.sub(r"\u3000|\xa0", " ", text)
-    parts = re.split(r"(?<=[\.!?？！。…])\s+|\n+", text)
-    return [p.strip() for p in parts if p and p.strip()]
-
-def split_paragraphs(text: str) -> List[str]:
-    paras = re.split(r"\n{2,}", text.replace("\r\n", "\n"))
-    return [p.strip() for p in paras if p.strip()]
-
-def make_chunks(text: str, unit: str = "para", window:int=1, stride:int=1) -> List[str]:
-    items = split_paragraphs(text) if unit == "para" else split_sentences(text)
-    if window <= 1: 
-        return items
-    out = []
-    i, n = 0, len(items)
-    while i < n:
-        j = min(n, i+window)
-        out.append(" ".join(items[i:j]))
-        if j == n: break
-        i += max(1, stride)
-    return out
+    from .rag_store import (  # noqa: F401
+        STORE_SCHEMA_VERSION, _EMB_STORE_DTYPE, RAGStore, list_stores, read_store_meta, store_dir, store_exists,
+    )
+    from .store_cache import get_store, store_cache_stats  # noqa: F401
+    from .store_writer import _INGEST_BATCH, ChunkEmbedder, StoreWriter, embed_chunks, write_store  # noqa: F401
+except ImportError:
+    from rag_store import (  # noqa: F401
+        STORE_SCHEMA_VERSION, _EMB_STORE_DTYPE, RAGStore, list_stores, read_store_meta, store_dir, store_exists,
+    )
+    from store_cache import get_store, store_cache_stats  # noqa: F401
+    from store_writer import _INGEST_BATCH, ChunkEmbedder, StoreWriter, embed_chunks, write_store  # noqa: F401
 
-# =========================================================
-# 한국어 토크나이저 (BM25용)
-# =========================================================
-def simple_tokenize(text: str) -> List[str]:
-    """간단한 한국어/영어 토크나이저 (형태소 분석 없이)"""
-    # 공백 + 특수문자 기준 분리
-    text = re.sub(r'[^\w\s]', ' ', text)
-    tokens = text.lower().split()
-    # 한글은 음절 단위로도 추가 (짧은 단어 매칭 강화)
-    result = []
-    for t in tokens:
-        result.append(t)
-        if re.search(r'[가-힣]', t) and len(t) > 1:
-            result.extend(list(t))  # 음절 분리
-    return result
+# ---------- 임베딩 / Dense 인덱스 / BM25 ----------
+try:
+    from .embedding import (  # noqa: F401
+        _EMB_MODEL_NAME, QueryEmbedder, emb_model_id, embed_query, embed_texts, get_emb_model, query_embedder,
+    )
+    from .dense_index import (  # noqa: F401
+        _INDEX_RETRAIN_FRAC, INDEX_KINDS, AnnIndex, MmapFlatIndex, _top_k, build_ann_index, build_faiss_index,
+        load_faiss, save_ann_index, save_embeddings, save_faiss,
+    )
+    from .bm25 import BM25Builder, SparseBM25, build_bm25_index, load_bm25, save_bm25  # noqa: F401
+except ImportError:
+    from embedding import (  # noqa: F401
+        _EMB_MODEL_NAME, QueryEmbedder, emb_model_id, embed_query, embed_texts, get_emb_model, query_embedder,
+    )
+    from dense_index import (  # noqa: F401
+        _INDEX_RETRAIN_FRAC, INDEX_KINDS, AnnIndex, MmapFlatIndex, _top_k, build_ann_index, build_faiss_index,
+        load_faiss, save_ann_index, save_embeddings, save_faiss,
+    )
+    from bm25 import BM25Builder, SparseBM25, build_bm25_index, load_bm25, save_bm25  # noqa: F401
 
-# =========================================================
-# 저장 스키마
-# =========================================================
-@dataclass
-class RAGStore:
-    doc_id: str
-    chunks: List[str]
-    emb_dim: int
-    index_path: Path
-    bm25_path: Path
-    meta_path: Path
-
-    @property
-    def base_dir(self) -> Path:
-        return STORAGE_ROOT / self.doc_id
-
-    def save_meta(self):
-        self.base_dir.mkdir(parents=True, exist_ok=True)
-        meta = {"doc_id": self.doc_id, "emb_dim": self.emb_dim, "chunks": len(self.chunks)}
-        self.meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
-        with open(self.base_dir / "chunks.pkl", "wb") as f:
-            pickle.dump(self.chunks, f)
-
-    @staticmethod
-    def load(doc_id: str) -> "RAGStore":
-        base = STORAGE_ROOT / doc_id
-        if not base.exists():
-            raise FileNotFoundError(f"[RAG] storage not found: {base}")
-        with open(base / "chunks.pkl", "rb") as f:
-            chunks = pickle.load(f)
-        meta = json.loads((base / "meta.json").read_text(encoding="utf-8"))
-        return RAGStore(
-            doc_id=doc_id,
-            chunks=chunks,
-            emb_dim=meta["emb_dim"],
-            index_path=base / "faiss.index",
-            bm25_path=base / "bm25.pkl",
-            meta_path=base / "meta.json",
-        )
+# ---------- 검색 (책 한 권 / 서재) ----------
+try:
+    from .retrieval import _RETRIEVE_CANDIDATES, hybrid_retrieve
+    from .library import (  # noqa: F401
+        library_add, library_add_many, library_docs, library_rebuild, library_remove, library_retrieve,
+        load_library,
+    )
+except ImportError:
+    from retrieval import _RETRIEVE_CANDIDATES, hybrid_retrieve
+    from library import (  # noqa: F401
+        library_add, library_add_many, library_docs, library_rebuild, library_remove, library_retrieve,
+        load_library,
+    )
 
-# =========================================================
-# Dense 임베딩 (FAISS)
-# =========================================================
-_emb_model = None
-def get_emb_model():
-    global _emb_model
-    if _emb_model is None:
-        from sentence_transformers import SentenceTransformer
-        _emb_model = SentenceTransformer(_EMB_MODEL_NAME)
-    return _emb_model
-
-def embed_texts(texts: List[str]) -> np.ndarray:
-    model = get_emb_model()
-    vecs = model.encode(texts, batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
-    return vecs.astype("float32")
-
-def build_faiss_index(vectors: np.ndarray) -> faiss.IndexFlatIP:
-    dim = vectors.shape[1]
-    idx = faiss.IndexFlatIP(dim)
-    idx.add(vectors)
-    return idx
-
-def save_faiss(index: faiss.Index, path: Path):
-    faiss.write_index(index, str(path))
-
-def load_faiss(path: Path) -> faiss.Index:
-    return faiss.read_index(str(path))
+# ---------- 요약 트리 / 대량 ingest ----------
+try:
+    from .summary_tree import (  # noqa: F401
+        _SUMMARY_DEFAULT_SENTENCES, _SUMMARY_ON_INGEST, SummaryTree, build_summary_tree, ensure_summary_tree,
+        save_summary_render, set_summary_concurrency, summarize_doc, summary_max_tokens,
+    )
+    from .bulk_ingest import _BULK_BATCH, bulk_ingest, load_bulk_manifest
+except ImportError:
+    from summary_tree import (  # noqa: F401
+        _SUMMARY_DEFAULT_SENTENCES, _SUMMARY_ON_INGEST, SummaryTree, build_summary_tree, ensure_summary_tree,
+        save_summary_render, set_summary_concurrency, summarize_doc, summary_max_tokens,
+    )
+    from bulk_ingest import _BULK_BATCH, bulk_ingest, load_bulk_manifest
 
-# =========================================================
-# Sparse 검색 (BM25)
-# =========================================================
-def build_bm25_index(chunks: List[str]) -> BM25Okapi:
-    tokenized = [simple_tokenize(c) for c in chunks]
-    return BM25Okapi(tokenized)
+# ---------- LLM 응답 캐시 (exact + semantic, SQLite) ----------
+try:
+    from .llm_cache import llm_cache, cache_stats
+except ImportError:
+    from llm_cache import llm_cache, cache_stats
 
-def save_bm25(bm25: BM25Okapi, path: Path):
-    with open(path, "wb") as f:
-        pickle.dump(bm25, f)
+# ---------- LLM 백엔드 (openai / llama / mock, LLM_BACKEND) ----------
+try:
+    from .llm_backends import BACKENDS as LLM_BACKENDS, LLMError, get_backend, set_default_backend
+except ImportError:
+    from llm_backends import BACKENDS as LLM_BACKENDS, LLMError, get_backend, set_default_backend
 
-def load_bm25(path: Path) -> BM25Okapi:
-    with open(path, "rb") as f:
-        return pickle.load(f)
 
 # =========================================================
-# Hybrid Retrieval
+# 파이프라인
 # =========================================================
-def hybrid_retrieve(doc_id: str, query: str, k: int = 6, 
-                   alpha: float = 0.5) -> Tuple[List[int], List[float], List[str]]:
+def ingest_stream(doc_id: str, path: Path, unit: str = "para", window: int = 1, stride: int = 1,
+                  index_kind: Optional[str] = None, batch_size: int = _INGEST_BATCH,
+                  on_progress: Optional[Callable[[dict], None]] = None) -> Tuple[RAGStore, dict]:
     """
-    Hybrid search: BM25 + Dense
-    alpha: BM25 가중치 (0~1), 1-alpha: Dense 가중치
-    alpha=0.5: 균형, alpha=0.7: BM25 중시, alpha=0.3: Dense 중시
+    파일을 블록 단위로 읽어 chunk 를 batch_size 개씩 임베딩하고 바로 스토어에 이어 씀
+    (원문 전체 / chunk 리스트 / [N, d] 행렬을 메모리에 두지 않음 → 메모리는 책 크기와 무관)
+    on_progress({"stage", "chunks", "bytes", "total_bytes"}): 배치마다 (stage=embed), 인덱스 빌드 전 (stage=index)
+    → (스토어, 임베딩 출처별 chunk 수 {"store", "cache", "embedded"})
     """
-    store = RAGStore.load(doc_id)
-    
-    # 1. BM25 점수
-    bm25 = load_bm25(store.bm25_path)
-    query_tokens = simple_tokenize(query)
-    bm25_scores = bm25.get_scores(query_tokens)
-    bm25_scores = np.array(bm25_scores)
-    
-    # 2. Dense 점수 (FAISS)
-    idx = load_faiss(store.index_path)
-    qv = embed_texts([query])
-    dense_sims, dense_ids = idx.search(qv, len(store.chunks))  # 전체 검색
-    dense_scores = np.zeros(len(store.chunks))
-    for i, (chunk_id, sim) in enumerate(zip(dense_ids[0], dense_sims[0])):
-        dense_scores[chunk_id] = sim
-    
-    # 3. 정규화 (0~1 범위로)
-    if bm25_scores.max() > 0:
-        bm25_scores = bm25_scores / bm25_scores.max()
-    if dense_scores.max() > 0:
-        dense_scores = dense_scores / dense_scores.max()
-    
-    # 4. 하이브리드 점수
-    hybrid_scores = alpha * bm25_scores + (1 - alpha) * dense_scores
-    
-    # 5. Top-k 선택
-    top_indices = np.argsort(-hybrid_scores)[:k]
-    top_scores = hybrid_scores[top_indices]
-    top_chunks = [store.chunks[i] for i in top_indices]
-    
-    return top_indices.tolist(), top_scores.tolist(), top_chunks
-
+    progress = {"stage": "embed", "chunks": 0, "bytes": 0, "total_bytes": path.stat().st_size}
+    def on_read(pos: int):
+        progress["bytes"] = pos
 
-# =========================================================
-# 파이프라인
-# =========================================================
-def cmd_ingest(ns: argparse.Namespace):
+    # 이전 스토어(같은 doc_id)의 벡터 재사용 — 새 파일은 .tmp 로 쓰다가 finish 에서 교체
+    embedder = ChunkEmbedder(previous=doc_id)
+    writer = StoreWriter(doc_id)
+    try:
+        chunks = iter_chunks(iter_units(path, unit, on_read), window, stride)
+        while True:
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                break
+            writer.add(batch, embedder.embed(batch))
+            progress["chunks"] += len(batch)
+            if on_progress is not None:
+                on_progress(dict(progress))
+        if writer.n == 0:
+            raise ValueError("[ERROR] 빈 문서")
+    except BaseException:
+        writer.abort()
+        raise
+
+    if on_progress is not None:
+        on_progress(dict(progress, stage="index"))
+    changed = 1 - embedder.counts["store"] / writer.n
+    store = writer.finish(index_kind, trained_from=doc_id if changed <= _INDEX_RETRAIN_FRAC else None)
+    return store, embedder.counts
+
+def _progress_printer(every: float = 2.0) -> Callable[[dict], None]:
+    last = [0.0]
+    def report(p: dict):
+        now = time.perf_counter()
+        if now - last[0] >= every and p.get("stage") == "embed":
+            last[0] = now
+            pct = 100 * p["bytes"] / p["total_bytes"] if p["total_bytes"] else 100.0
+            print(f"[INFO] ingest: {p['chunks']} chunks | {p['bytes'] / 2**20:.1f}/"
+                  f"{p['total_bytes'] / 2**20:.1f}MB ({pct:.0f}%)")
+    return report
+
+def cmd_ingest(ns: argparse.Namespace, on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    ns: doc_id, path, unit, window, stride (+ 선택 index, no_summary)
+    on_progress: ingest_stream 진행률 + 요약 트리 단계 ({"stage": "summary"}) 를 받을 콜백 (작업 API 용)
+    """
     path = Path(ns.path)
     if not path.exists():
         raise SystemExit(f"[ERROR] File not found: {path}")
 
-    raw = read_text(path)
-    chunks = make_chunks(raw, unit=ns.unit, window=ns.window, stride=ns.stride)
-    if not chunks:
-        raise SystemExit("[ERROR] 빈 문서")
-
-    print(f"[INFO] chunks: {len(chunks)} (unit={ns.unit})")
-
-    # Dense 임베딩 + FAISS
-    print("[INFO] Building dense embeddings...")
-    vecs = embed_texts(chunks)
-    dense_idx = build_faiss_index(vecs)
-
-    # BM25 인덱스
-    print("[INFO] Building BM25 index...")
-    bm25 = build_bm25_index(chunks)
-
-    # 저장
-    base = STORAGE_ROOT / ns.doc_id
-    base.mkdir(parents=True, exist_ok=True)
-    
-    save_faiss(dense_idx, base / "faiss.index")
-    save_bm25(bm25, base / "bm25.pkl")
-
-    store = RAGStore(
-        doc_id=ns.doc_id, 
-        chunks=chunks, 
-        emb_dim=vecs.shape[1],
-        index_path=base / "faiss.index",
-        bm25_path=base / "bm25.pkl",
-        meta_path=base / "meta.json"
-    )
-    store.save_meta()
-
-    print(f"[OK] Ingested: {ns.doc_id} | chunks={len(chunks)} | dim={vecs.shape[1]}")
-
-def build_answer_prompt(question: str, contexts: list[str]) -> str:
-    ctx_joined = "\n\n---\n\n".join(contexts)
+    # 읽기 → chunk → 임베딩(이전 스토어 / 임베딩 캐시 재사용) → BM25 postings 를 배치 단위로
+    print(f"[INFO] Streaming ingest: {path} (unit={ns.unit}, batch={_INGEST_BATCH})")
+    t0 = time.perf_counter()
+    printer = _progress_printer()
+    def report(p: dict):
+        printer(p)
+        if on_progress is not None:
+            on_progress(p)
+    try:
+        store, reuse = ingest_stream(ns.doc_id, path, unit=ns.unit, window=ns.window, stride=ns.stride,
+                                     index_kind=getattr(ns, "index", None), on_progress=report)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"[INFO] embeddings: 재사용 {reuse['store']} (이전 스토어) + {reuse['cache']} (캐시), "
+          f"새로 임베딩 {reuse['embedded']}")
+    print(f"[OK] Ingested: {ns.doc_id} | chunks={len(store.chunks)} | dim={store.emb_dim} | "
+          f"{time.perf_counter() - t0:.1f}s")
+
+    # 요약 트리 (바뀐 부분만 LLM 호출) — 실패해도 ingest는 성공, 첫 /summarize 때 다시 시도
+    if _SUMMARY_ON_INGEST and not getattr(ns, "no_summary", False):
+        print("[INFO] Building summary tree...")
+        if on_progress is not None:
+            on_progress({"stage": "summary", "chunks": len(store.chunks)})
+        try:
+            summarize_doc(ns.doc_id, _SUMMARY_DEFAULT_SENTENCES)
+            print(f"[OK] Summary tree: {SummaryTree.path_for(ns.doc_id)}")
+        except Exception as e:
+            print(f"[WARN] 요약 트리 생성 실패: {e}")
+    return {"doc_id": ns.doc_id, "chunks": len(store.chunks), "emb_dim": store.emb_dim,
+            "index_kind": store.index_kind, "reuse": reuse}
+
+
+def cmd_bulk_ingest(ns: argparse.Namespace) -> dict:
+    source = Path(ns.source)
+    if not source.exists():
+        raise SystemExit(f"[ERROR] File not found: {source}")
+    items = load_bulk_manifest(source, unit=ns.unit, window=ns.window, stride=ns.stride)
+    if not items:
+        raise SystemExit(f"[ERROR] ingest 할 문서가 없습니다: {source}")
+    state_path = Path(ns.state) if ns.state else source.with_name(source.name + ".ingest_state.jsonl")
+    summary = _SUMMARY_ON_INGEST and not ns.no_summary
+    stats = bulk_ingest(items, state_path, workers=ns.workers, batch_size=ns.batch,
+                        index_kind=ns.index, summary=summary, force=ns.force)
+
+    reuse = stats["reuse"]
+    print(f"[INFO] embeddings: 재사용 {reuse['store']} (이전 스토어) + {reuse['cache']} (캐시), "
+          f"새로 임베딩 {reuse['embedded']} | 임베딩 {stats['embed_secs']:.1f}s")
+    print(f"[OK] bulk-ingest: {stats['docs']}권 완료 / {stats['failed']}권 실패 / {stats['skipped']}권 건너뜀 | "
+          f"{stats['chunks']} chunks | {stats['secs']:.1f}s | "
+          f"{stats['docs_per_s']:.2f} docs/s | {stats['chunks_per_s']:.0f} chunks/s")
+    if stats["failed"]:
+        print(f"[WARN] 실패한 문서는 상태 파일({state_path})에 기록됨 — 같은 명령을 다시 실행하면 실패분만 재시도")
+    return stats
+
+def cmd_convert(ns: argparse.Namespace):
+    """schema 1 (pickle + faiss.index) 스토리지를 schema 2 (mmap) 로 변환"""
+    doc_ids = ns.doc_id or list_stores()
+
+    for doc_id in doc_ids:
+        old = RAGStore.load(doc_id)
+        if old.schema_version >= STORE_SCHEMA_VERSION:
+            print(f"[SKIP] {doc_id}: already schema {old.schema_version}")
+            continue
+
+        chunks = list(old.chunks)
+        if old.index_path.exists():
+            idx = load_faiss(old.index_path)
+            vecs = idx.reconstruct_n(0, idx.ntotal)
+        else:
+            print(f"[INFO] {doc_id}: faiss.index 없음 → 다시 임베딩")
+            vecs = embed_texts(chunks)
+
+        write_store(doc_id, chunks, vecs.astype("float32"))
+        print(f"[OK] Converted: {doc_id} | chunks={len(chunks)} | dtype={_EMB_STORE_DTYPE}")
+
+def build_answer_prompt(question: str, contexts: list[str],
+                        max_context_tokens: int = _CONTEXT_TOKENS) -> str:
+    """근거 문맥은 중복 문장을 빼고 max_context_tokens 안으로 (검색 순위가 높은 것부터)"""
+    ctx_joined = "\n\n---\n\n".join(fit_contexts(contexts, max_context_tokens))
     return f"""너는 한국어 독서 도우미다. 아래 '근거 문맥'만 사용해 질문에 답하라.
 
 규칙:
@@ -307,7 +305,7 @@ def build_answer_prompt(question: str, contexts: list[str]) -> str:
 def cmd_ask(ns: argparse.Namespace):
     ids, scores, hits = hybrid_retrieve(ns.doc_id, ns.q, k=ns.k, alpha=ns.alpha)
     
-    context_text = "\n\n---\n\n".join(hits)
+    context_text = "\n\n---\n\n".join(fit_contexts(hits))
 
     prompt = f"""
 독서 Q/A 과제입니다.
@@ -325,47 +323,84 @@ def cmd_ask(ns: argparse.Namespace):
 - 이어서 📝 이모지로 핵심 인용 1줄만 보여줘 (따옴표로 감싸기)
 - 불확실하면 "본문에 명확한 근거 없음"이라고 말해
 """
-    answer = gpt4omini_chat(prompt, max_tokens=400)
+    try:
+        answer = get_backend().chat(prompt, max_tokens=400)
+    except LLMError as e:
+        raise SystemExit(f"[ERROR] {e}") from e
 
     print(f"\n❓ {ns.q}\n")
     print(f"🧠 답변:\n{answer}\n")
 
 
 def cmd_summarize(ns: argparse.Namespace):
-    store = RAGStore.load(ns.doc_id)
-    text = "\n\n".join(store.chunks)
-    
-    # 긴 텍스트는 나눠서 요약
-    step = 1500
-    parts = [text[i:i+step] for i in range(0, len(text), step)]
-    
-    partials = []
-    for i, chunk in enumerate(parts, 1):
-        p = f"""아래 텍스트를 한국어로 핵심만 3~5문장 bullet 요약:
-
-{chunk}
-"""
-        partials.append(gpt4omini_chat(p, max_tokens=200))
-    
-    reduce_prompt = f"""다음 부분 요약들을 통합해 최종 {ns.sentences}문장 요약 작성:
-
-구성:
-- 📌 한줄 요약 (1문장)
-- ✅ 줄거리 핵심 (번호)
-- 👥 주요 인물 관계
-- 🧠 주제/정서
-
-부분 요약:
-{chr(10).join('- ' + s for s in partials)}
-"""
-    final = gpt4omini_chat(reduce_prompt, max_tokens=400)
-    print(final)
+    print(summarize_doc(ns.doc_id, ns.sentences))
+
+def cmd_cache(ns: argparse.Namespace):
+    """LLM 응답 캐시 통계 / 비우기"""
+    if llm_cache is None:
+        raise SystemExit("[ERROR] LLM_CACHE=0 (캐시 꺼짐)")
+    if ns.clear:
+        llm_cache.clear()
+        print(f"[OK] cleared: {llm_cache.path}")
+    print(json.dumps(cache_stats(), ensure_ascii=False, indent=2))
+
+def cmd_library(ns: argparse.Namespace):
+    """서재: 목록 / 통합 검색 / 다시 만들기 / 책 빼기"""
+    if ns.rebuild:
+        lib = library_rebuild()
+        print(f"[OK] 서재 rebuild: shards={len(lib['shards'])}")
+    for doc_id in ns.remove or []:
+        print(f"[OK] removed: {doc_id}" if library_remove(doc_id) else f"[SKIP] {doc_id}: 서재에 없음")
+    if ns.q:
+        for hit in library_retrieve(ns.q, k=ns.k, alpha=ns.alpha, doc_ids=ns.doc_id):
+            print(f"{hit['score']:.3f}  [{hit['doc_id']}#{hit['chunk_id']}] {hit['text'][:80]!r}")
+        return
+    for doc in library_docs():
+        print(f"{doc['doc_id']:<30} chunks={doc['chunks']:<8} {doc['shard']}")
+
+def cmd_parity(ns: argparse.Namespace):
+    """후보 생성 모드(top-N ∪ top-N) 랭킹이 전체 검색 랭킹과 같은지 확인 (ann.index 스토어는 recall@k)"""
+    loaded = get_store(ns.doc_id)
+    store = loaded.store
+    approximate = isinstance(loaded.index, AnnIndex)
+    queries = ns.q or []
+    if not queries:
+        # 질문이 없으면 문서 곳곳의 첫 문장을 질의로 사용
+        step = max(1, len(store.chunks) // ns.samples)
+        for i in range(0, len(store.chunks), step):
+            sents = split_sentences(store.chunks[i])
+            if sents:
+                queries.append(sents[0][:100])
+
+    mismatches, overlap = 0, []
+    for q in queries:
+        ex_ids, ex_scores, _ = hybrid_retrieve(ns.doc_id, q, k=ns.k, alpha=ns.alpha, candidates=0)
+        ca_ids, ca_scores, _ = hybrid_retrieve(ns.doc_id, q, k=ns.k, alpha=ns.alpha,
+                                               candidates=ns.candidates)
+        overlap.append(len(set(ex_ids) & set(ca_ids)) / max(1, len(ex_ids)))
+        # 동점으로 순서만 바뀐 경우는 점수 비교로 허용
+        if ex_ids != ca_ids and not np.allclose(ex_scores, ca_scores, atol=1e-6):
+            mismatches += 1
+            if not approximate:
+                print(f"[DIFF] {q[:40]!r}\n  exhaustive={ex_ids}\n  candidates={ca_ids}")
+
+    if approximate:
+        print(f"[OK] {store.index_kind}: recall@{ns.k}={np.mean(overlap):.3f}, "
+              f"{len(queries) - mismatches}/{len(queries)} queries identical (candidates={ns.candidates})")
+        return
+
+    print(f"[OK] parity: {len(queries) - mismatches}/{len(queries)} queries identical "
+          f"(k={ns.k}, candidates={ns.candidates})")
+    if mismatches:
+        raise SystemExit(1)
 
 # =========================================================
 # CLI
 # =========================================================
 def build_parser():
     ap = argparse.ArgumentParser(description="RAG MVP: Hybrid Search (BM25+Dense) + Llama")
+    ap.add_argument("--llm", choices=tuple(LLM_BACKENDS), default=None,
+                    help="답변 / 요약에 쓸 LLM 백엔드 (기본 LLM_BACKEND 또는 openai)")
     sub = ap.add_subparsers(dest="cmd", required=True)
 
     ap_i = sub.add_parser("ingest")
@@ -374,8 +409,25 @@ def build_parser():
     ap_i.add_argument("--unit", choices=["para","sent"], default="para")
     ap_i.add_argument("--window", type=int, default=1)
     ap_i.add_argument("--stride", type=int, default=1)
+    ap_i.add_argument("--no_summary", action="store_true", help="요약 트리 생성 생략 (RAG_SUMMARY_ON_INGEST=0 과 같음)")
+    ap_i.add_argument("--index", choices=("auto",) + INDEX_KINDS, default=None,
+                      help="dense 인덱스 (기본 RAG_INDEX=auto: chunk 수로 flat/hnsw/ivfpq 선택)")
     ap_i.set_defaults(func=cmd_ingest)
 
+    ap_b = sub.add_parser("bulk-ingest", help="폴더(*.txt) 또는 JSONL manifest 의 문서를 한 번에 ingest (중단 후 재실행 시 이어서)")
+    ap_b.add_argument("source", help="폴더 또는 manifest.jsonl ({doc_id, path, unit?, window?, stride?} 한 줄씩)")
+    ap_b.add_argument("--unit", choices=["para","sent"], default="para", help="manifest 에 없을 때 기본값")
+    ap_b.add_argument("--window", type=int, default=1)
+    ap_b.add_argument("--stride", type=int, default=1)
+    ap_b.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                      help="읽기/chunk/토큰화 프로세스 수 (임베딩은 이 프로세스의 모델 하나)")
+    ap_b.add_argument("--batch", type=int, default=_BULK_BATCH, help="여러 책의 새 chunk 를 모아 임베딩할 수 (RAG_BULK_BATCH)")
+    ap_b.add_argument("--state", default=None, help="진행 상태 파일 (기본: <source>.ingest_state.jsonl)")
+    ap_b.add_argument("--force", action="store_true", help="완료 기록을 무시하고 전부 다시 ingest")
+    ap_b.add_argument("--no_summary", action="store_true", help="요약 트리 생성 생략 (대량 적재는 권장, 첫 /summarize 때 생성)")
+    ap_b.add_argument("--index", choices=("auto",) + INDEX_KINDS, default=None)
+    ap_b.set_defaults(func=cmd_bulk_ingest)
+
     ap_a = sub.add_parser("ask")
     ap_a.add_argument("--doc_id", required=True)
     ap_a.add_argument("-q", required=True)
@@ -389,6 +441,35 @@ def build_parser():
     ap_s.add_argument("--sentences", type=int, default=7)
     ap_s.set_defaults(func=cmd_summarize)
 
+    ap_c = sub.add_parser("convert", help="이전 스토리지(pickle/faiss)를 mmap 포맷으로 변환")
+    ap_c.add_argument("--doc_id", action="append", help="생략하면 storage 아래 전체 변환")
+    ap_c.set_defaults(func=cmd_convert)
+
+    ap_l = sub.add_parser("library", help="서재(전체 책) 목록 / 통합 검색 / rebuild")
+    ap_l.add_argument("-q", help="통합 검색 질의")
+    ap_l.add_argument("-k", type=int, default=10)
+    ap_l.add_argument("--alpha", type=float, default=0.5)
+    ap_l.add_argument("--doc_id", action="append", help="이 책들 안에서만 검색 (여러 번 지정 가능)")
+    ap_l.add_argument("--rebuild", action="store_true", help="storage 아래 모든 책으로 다시 만들기")
+    ap_l.add_argument("--remove", action="append", help="서재에서 뺄 doc_id")
+    ap_l.set_defaults(func=cmd_library)
+
+    ap_p = sub.add_parser("parity", help="후보 생성 검색 vs 전체 검색 랭킹 비교")
+    ap_p.add_argument("--doc_id", required=True)
+    ap_p.add_argument("-q", action="append", help="질의 (여러 번 지정 가능, 없으면 본문에서 샘플링)")
+    ap_p.add_argument("-k", type=int, default=6)
+    ap_p.add_argument("--alpha", type=float, default=0.5)
+    ap_p.add_argument("--candidates", type=int, default=_RETRIEVE_CANDIDATES)
+    ap_p.add_argument("--samples", type=int, default=50)
+    ap_p.set_defaults(func=cmd_parity)
+
+    ap_cache = sub.add_parser("cache", help="LLM 응답 캐시 통계 (--clear: 비우기)")
+    ap_cache.add_argument("--clear", action="store_true")
+    ap_cache.set_defaults(func=cmd_cache)
+
+    ap_ui = sub.add_parser("ui", help="Gradio UI")
+    ap_ui.set_defaults(func=lambda ns: run_gradio())
+
     return ap
 
 
@@ -396,20 +477,6 @@ def build_parser():
 # =========================================================
 # Gradio UI
 # =========================================================
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-def gpt4omini_chat(prompt: str, max_tokens=300):
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=max_tokens,
-            temperature=0.2,
-            top_p=0.9,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"[ERROR: GPT-4o-mini] {e}"
-
 def run_gradio():
     import gradio as gr
     from pathlib import Path
@@ -465,10 +532,12 @@ def run_gradio():
                 return "[ERROR] 업로드된 파일이 비어있습니다."
 
             # ------------------------------
-            # 5) 텍스트를 임시 파일로 저장
+            # 5) 텍스트를 임시 파일로 저장 (요청마다 다른 파일 → 동시 업로드가 서로 덮어쓰지 않음)
             # ------------------------------
-            temp_path = Path("temp_upload.txt")
-            temp_path.write_text(text, encoding="utf-8")
+            fd, name = tempfile.mkstemp(prefix="ingest-", suffix=".txt")
+            temp_path = Path(name)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
 
         except Exception as e:
             return f"[ERROR] 파일 처리 실패: {e}"
@@ -485,8 +554,10 @@ def run_gradio():
         try:
             cmd_ingest(ns)
             return f"[OK] {doc_id} ingest 완료!"
-        except Exception as e:
+        except (Exception, SystemExit) as e:
             return f"[ERROR] {e}"
+        finally:
+            temp_path.unlink(missing_ok=True)
 
 
 
@@ -494,7 +565,7 @@ def run_gradio():
     def ui_ask(doc_id, question, k, alpha):
         try:
             ids, scores, chunks = hybrid_retrieve(doc_id, question, k=k, alpha=alpha)
-            ctx = "\n\n---\n\n".join(chunks)
+            ctx = "\n\n---\n\n".join(fit_contexts(chunks))
 
             prompt = f"""
     독서 Q/A 과제입니다.
@@ -512,7 +583,7 @@ def run_gradio():
     - 마지막: 핵심 인용 1줄(따옴표)
     """
 
-            answer = gpt4omini_chat(prompt, max_tokens=400)
+            answer = get_backend().chat(prompt, max_tokens=400)
 
             preview = "\n\n".join(
                 [f"[{i+1}] score={scores[i]:.3f}\n{chunks[i][:200]}"
@@ -546,33 +617,10 @@ def run_gradio():
     #         return f"[ERROR] {e}"
     def ui_summarize(doc_id, sentences):
         try:
-            store = RAGStore.load(doc_id)
-            text = "\n\n".join(store.chunks)
-
-            # 길게 쪼개기
-            step = 5000
-            parts = [text[i:i + step] for i in range(0, len(text), step)]
-
-            partials = []
-            for ch in parts:
-                prompt = f"아래 텍스트를 한국어로 핵심만 요약:\n{ch}"
-                mini = gpt4omini_chat(prompt, max_tokens=300)
-                partials.append(mini)
-
-            reduce_prompt = (
-                f"다음 부분 요약을 {sentences}문장으로 통합:\n" +
-                "\n".join('- ' + s for s in partials)
-            )
-
-            final = gpt4omini_chat(reduce_prompt, max_tokens=300)
-            return final
-
+            return summarize_doc(doc_id, int(sentences))
         except Exception as e:
             return f"[ERROR] {e}"
 
-    # -----------------------------------
-    # 2) Gradio UI Layout (함수 아래에)
-    # -----------------------------------
 
     with gr.Blocks(title="ReadMate RAG MVP (Hybrid Search)") as demo:
         gr.Markdown("# 📚 ReadMate RAG MVP (Hybrid Search)")
@@ -615,12 +663,10 @@ def run_gradio():
 
 
 if __name__ == "__main__":
-    import sys
-
-    if len(sys.argv) > 1 and sys.argv[1] == "ui":
-        run_gradio()  # ← 그냥 이렇게 실행
-    else:
-        parser = build_parser()
-        ns = parser.parse_args()
-        ns.func(ns)
+    parser = build_parser()
+    ns = parser.parse_args()
+    if ns.llm:
+        set_default_backend(ns.llm)
+    ns.func(ns)
+
 
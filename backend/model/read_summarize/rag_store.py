@@ -0,0 +1,267 @@
+"""
+RAG 스토어 포맷 (schema 2, mmap) 과 버전 게시
+
+- storage/<doc_id>/CURRENT → v######/ : chunks.txt + chunk_offsets.npy, embeddings.npy, bm25_*, ann.index, meta.json
+- RAGStore.load: 게시된 버전을 복사 없이 열고 chunk 는 필요한 것만 디코딩 (ChunkBlob)
+- _publish_version: staging 폴더를 다음 버전으로 옮기고 CURRENT 를 원자적으로 교체
+- 쓰기는 store_writer.StoreWriter, 상주 캐시는 store_cache
+
+환경 변수:
+  RAG_EMB_DTYPE=float32              embeddings.npy dtype (float32 | float16)
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import pickle
+import re
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# ---------- 저장 루트 ----------
+STORAGE_ROOT = Path(__file__).parent / "storage"
+LIBRARY_DIR = "_library"  # 서재 shard 폴더 (library.py) — 책 doc_id 로 쓸 수 없음
+
+# ---------- 스토어 포맷 ----------
+STORE_SCHEMA_VERSION = 2
+_EMB_STORE_DTYPE = os.getenv("RAG_EMB_DTYPE", "float32")  # float32 | float16
+
+
+# =========================================================
+# 저장 스키마
+# =========================================================
+# schema_version 2 (mmap, zero-copy):
+#   meta.json          {"schema_version": 2, "doc_id", "emb_dim", "chunks"}
+#   chunks.txt         모든 chunk를 이어붙인 UTF-8 blob
+#   chunk_offsets.npy  int64 [N+1] byte offset
+#   embeddings.npy     float32/float16 [N, dim] (정규화된 임베딩)
+#   bm25.json + bm25_*.npy
+#   ann.index          HNSW / IVF-SQ8 / IVF-PQ faiss 인덱스 (meta.index_kind 가 flat 이 아닐 때만)
+#   summary_tree.json  요약 트리 (선택, 없어도 스토어는 유효 — 스토어 버전에 포함 안 됨)
+# schema_version 1 (이전): chunks.pkl + faiss.index + bm25.pkl
+#
+# 게시 (원자적 교체):
+#   storage/<doc_id>/CURRENT       게시된 버전 폴더 이름 (예: v000003)
+#   storage/<doc_id>/v000003/      위 파일들 (summary_tree.json 은 doc 폴더에)
+#   새 버전은 .staging-*/ 에 전부 쓴 뒤 v###### 로 이름을 바꾸고 CURRENT 를 os.replace
+#   → 읽는 쪽은 CURRENT 를 한 번 읽어 그 폴더만 보므로 쓰다 만 스토어를 보지 않음
+#   CURRENT 가 없으면 이전 레이아웃 (doc 폴더 바로 아래 파일) — 첫 게시 때 legacy/ 로 옮겨 둠 (지우지 않음)
+_CURRENT = "CURRENT"
+_LEGACY = "legacy"
+_KEEP_VERSIONS = 2  # 게시 직전에 이전 버전을 읽기 시작한 요청을 위해 하나 더 남김
+_STAGING_MAX_AGE = 24 * 3600  # 중간에 죽은 ingest 의 staging 폴더는 이 시간이 지나면 정리
+_STORE_FILES = ("meta.json", "chunks.txt", "embeddings.npy", "bm25.json", "ann.index",
+                "chunks.pkl", "bm25.pkl", "faiss.index")
+
+def _atomic_write(path: Path, write):
+    """임시 파일에 쓰고 교체 → 다른 프로세스가 mmap 중인 파일을 덮어쓰지 않음"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def doc_path(doc_id: str) -> Path:
+    """storage/<doc_id> (버전 폴더들과 CURRENT, summary_tree.json 이 있는 곳)"""
+    return STORAGE_ROOT / doc_id
+
+def store_dir(doc_id: str) -> Path:
+    """doc_id 의 게시된 스토어 폴더 (CURRENT 가 가리키는 버전, 없으면 doc 폴더)"""
+    base = doc_path(doc_id)
+    try:
+        name = (base / _CURRENT).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return base
+    return base / name
+
+def read_store_meta(doc_id: str) -> dict:
+    return json.loads((store_dir(doc_id) / "meta.json").read_text(encoding="utf-8"))
+
+def is_store(path: Path) -> bool:
+    return (path / _CURRENT).exists() or (path / "meta.json").exists()
+
+def store_exists(doc_id: str) -> bool:
+    """질문할 수 있는 게시된 스토어가 있는지 (첫 ingest 중 .staging-* 만 있는 폴더는 아님, 이전 레이아웃 포함)"""
+    base = doc_path(doc_id)
+    return is_store(base) or (base / "faiss.index").exists()
+
+def list_stores() -> List[str]:
+    """storage 아래 게시된 책 스토어의 doc_id (서재 shard 제외)"""
+    return sorted(p.name for p in STORAGE_ROOT.iterdir() if p.name != LIBRARY_DIR and is_store(p))
+
+def _versions(doc_dir: Path) -> List[Tuple[int, Path]]:
+    found = []
+    for p in doc_dir.iterdir():
+        m = re.fullmatch(r"v(\d+)", p.name)
+        if m and p.is_dir():
+            found.append((int(m.group(1)), p))
+    return sorted(found)
+
+def _is_flat_store_file(name: str) -> bool:
+    return name in _STORE_FILES or name == "chunk_offsets.npy" or name.startswith("bm25_")
+
+def _publish_version(doc_dir: Path, staging: Path) -> Path:
+    """staging 폴더를 다음 v###### 로 옮기고 CURRENT 교체 → 오래된 버전 정리, 이전 레이아웃 파일은 legacy/ 로"""
+    while True:
+        versions = _versions(doc_dir)
+        name = f"v{versions[-1][0] + 1 if versions else 1:06d}"
+        try:
+            os.rename(staging, doc_dir / name)
+            break
+        except OSError:
+            if not (doc_dir / name).exists():  # 동시에 게시한 다른 ingest 와 번호가 겹친 경우만 재시도
+                raise
+    _atomic_write(doc_dir / _CURRENT, lambda f: f.write(name.encode("utf-8")))
+
+    # mmap 중인 파일은 POSIX 에서는 지워도 읽던 쪽이 그대로 읽음 (Windows 는 실패 → 다음 게시 때 정리)
+    for _, old in _versions(doc_dir)[:-_KEEP_VERSIONS]:
+        if old.name != name:
+            shutil.rmtree(old, ignore_errors=True)
+    legacy = [p for p in doc_dir.iterdir() if p.is_file() and _is_flat_store_file(p.name)]
+    if legacy:
+        # 변환/재 ingest 가 잘못됐을 때 되돌릴 수 있게 백업 (필요 없으면 직접 삭제)
+        (doc_dir / _LEGACY).mkdir(exist_ok=True)
+        for p in legacy:
+            os.replace(p, doc_dir / _LEGACY / p.name)
+        print(f"[INFO] 이전 레이아웃 파일 {len(legacy)}개 → {doc_dir / _LEGACY}")
+    for p in doc_dir.iterdir():
+        if p.name.startswith(".staging-") and time.time() - p.stat().st_mtime > _STAGING_MAX_AGE:
+            shutil.rmtree(p, ignore_errors=True)
+    return doc_dir / name
+
+
+class _RawColumn:
+    """헤더 없는 배열을 파일에 이어 쓰고 끝나면 .npy 로 (전체를 메모리에 올리지 않음)"""
+
+    def __init__(self, path: Path, dtype, width: Optional[int] = None):
+        self.path, self.dtype, self.width = path, np.dtype(dtype), width
+        self.n = 0
+        self._f = open(path, "wb")
+
+    def append(self, arr: np.ndarray):
+        self._f.write(np.ascontiguousarray(arr, dtype=self.dtype).tobytes())
+        self.n += len(arr)
+
+    def append_npy(self, path: Path, rows: int = 65536):
+        """다른 .npy 의 행을 이어 씀 (dtype 이 같으면 헤더 뒤 바이트를 그대로 복사, 다르면 rows 개씩 변환)"""
+        arr = np.load(path, mmap_mode="r")
+        if arr.dtype == self.dtype:
+            with open(path, "rb") as src:
+                src.seek(arr.offset)
+                shutil.copyfileobj(src, self._f, 1 << 24)
+            self.n += len(arr)
+        else:
+            for i in range(0, len(arr), rows):
+                self.append(arr[i:i + rows])
+
+    def close(self):
+        self._f.close()
+
+    def blocks(self, rows: int) -> Iterator[np.ndarray]:
+        """앞에서부터 rows 개씩 다시 읽기 (close 후)"""
+        row_bytes = self.dtype.itemsize * (self.width or 1)
+        with open(self.path, "rb") as f:
+            while True:
+                data = f.read(rows * row_bytes)
+                if not data:
+                    break
+                arr = np.frombuffer(data, dtype=self.dtype)
+                yield arr if self.width is None else arr.reshape(-1, self.width)
+
+    def save_npy(self, path: Path):
+        """.npy 헤더 + 원본 바이트 블록 복사 (np.save 와 같은 파일) 후 임시 파일 삭제"""
+        self.close()
+        shape = (self.n,) if self.width is None else (self.n, self.width)
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False, "shape": shape}
+        def write(f):
+            np.lib.format.write_array_header_1_0(f, header)
+            with open(self.path, "rb") as src:
+                shutil.copyfileobj(src, f, 1 << 24)
+        _atomic_write(path, write)
+        self.path.unlink()
+
+    def discard(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class ChunkBlob(Sequence):
+    """chunks.txt + chunk_offsets.npy 를 mmap으로 열어 필요한 chunk만 디코딩"""
+
+    def __init__(self, blob_path: Path, offsets_path: Path):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        self._mm = None
+        if blob_path.stat().st_size > 0:
+            with open(blob_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._mm[start:end].decode("utf-8") if self._mm is not None else ""
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets[-1]) + self.offsets.nbytes
+
+
+@dataclass
+class RAGStore:
+    doc_id: str
+    chunks: Sequence[str]
+    emb_dim: int
+    index_path: Path
+    bm25_path: Path
+    meta_path: Path
+    schema_version: int = STORE_SCHEMA_VERSION
+    index_kind: str = "flat"
+    emb_model: Optional[str] = None  # 임베딩을 만든 모델 id (EMB_MODEL|EMB_BACKEND), 재사용 판단용
+
+    @property
+    def base_dir(self) -> Path:
+        return self.meta_path.parent
+
+    @staticmethod
+    def load(doc_id: str, base: Optional[Path] = None) -> "RAGStore":
+        """base: 읽을 버전 폴더 (None 이면 지금 게시된 버전)"""
+        base = base or store_dir(doc_id)
+        if not base.exists():
+            raise FileNotFoundError(f"[RAG] storage not found: {base}")
+        meta = json.loads((base / "meta.json").read_text(encoding="utf-8"))
+        version = meta.get("schema_version", 1)
+        if version >= 2:
+            chunks = ChunkBlob(base / "chunks.txt", base / "chunk_offsets.npy")
+            index_path = base / "embeddings.npy"
+        else:
+            with open(base / "chunks.pkl", "rb") as f:
+                chunks = pickle.load(f)
+            index_path = base / "faiss.index"
+        bm25_path = base / "bm25.json"
+        if not bm25_path.exists():
+            bm25_path = base / "bm25.pkl"  # 이전 포맷
+        return RAGStore(
+            doc_id=doc_id,
+            chunks=chunks,
+            emb_dim=meta["emb_dim"],
+            index_path=index_path,
+            bm25_path=bm25_path,
+            meta_path=base / "meta.json",
+            schema_version=version,
+            index_kind=meta.get("index_kind", "flat"),
+            emb_model=meta.get("emb_model"),
+        )
@@ -0,0 +1,131 @@
+"""
+Hybrid 검색 (BM25 + Dense) — 책 한 권 (서재 전체는 library.library_retrieve)
+
+- 후보 생성: BM25 top-N ∪ dense top-N 에 대해서만 점수를 결합하고, 후보 밖 chunk 가 top-k 에 들 수 있으면
+  전체 검색으로 fallback → 결과는 전체 검색과 같음 (tests/test_retrieval.py, mvp_reader.py parity)
+- ann.index 스토어는 dense top-N 이 근사이므로 후보 결과를 그대로 씀
+
+환경 변수:
+  RAG_CANDIDATES=64                  BM25 / dense 각각에서 뽑을 후보 수 (0이면 전체 검색)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .chunking import simple_tokenize
+    from .dense_index import AnnIndex, _top_k
+    from .embedding import embed_query
+    from .store_cache import LoadedStore, get_store
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import simple_tokenize
+    from dense_index import AnnIndex, _top_k
+    from embedding import embed_query
+    from store_cache import LoadedStore, get_store
+
+# ---------- 검색 후보 수 (0이면 전체 검색) ----------
+_RETRIEVE_CANDIDATES = int(os.getenv("RAG_CANDIDATES", "64"))
+
+
+# =========================================================
+# Hybrid Retrieval
+# =========================================================
+
+def _normalize(scores, max_score: float):
+    return scores / max_score if max_score > 0 else scores
+
+def _exhaustive_scores(loaded: LoadedStore, query_tokens: List[str], qv: np.ndarray,
+                       alpha: float) -> np.ndarray:
+    """전체 chunk에 대해 BM25 + Dense 점수를 모두 계산 (기준 랭킹)"""
+    n = len(loaded.store.chunks)
+    bm25_scores = np.asarray(loaded.bm25.get_scores(query_tokens), dtype=np.float64)
+
+    dense_sims, dense_ids = loaded.index.search(qv, n)  # 전체 검색
+    dense_scores = np.zeros(n)
+    dense_scores[dense_ids[0]] = dense_sims[0]
+
+    bm25_scores = _normalize(bm25_scores, bm25_scores.max())
+    dense_scores = _normalize(dense_scores, dense_scores.max())
+    return alpha * bm25_scores + (1 - alpha) * dense_scores
+
+def _candidate_scores(loaded: LoadedStore, query_tokens: List[str], qv: np.ndarray,
+                      k: int, alpha: float, n_cand: int,
+                      nprobe: Optional[int] = None, ef_search: Optional[int] = None
+                      ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    후보 생성 모드: BM25 top-N ∪ FAISS top-N 에 대해서만 점수 결합.
+    후보 밖 chunk의 점수 상한(threshold)이 k번째 점수보다 크면 None → 전체 검색으로 fallback
+    (ann.index 스토어는 dense top-N 자체가 근사이므로 fallback 없이 후보 결과를 그대로 사용)
+    """
+    bm25_all = np.asarray(loaded.bm25.get_scores(query_tokens), dtype=np.float64)
+    bm25_top = _top_k(bm25_all, n_cand)
+
+    approximate = isinstance(loaded.index, AnnIndex)
+    if approximate:
+        dense_sims, dense_ids = loaded.index.search(qv, n_cand, nprobe=nprobe, ef_search=ef_search)
+    else:
+        dense_sims, dense_ids = loaded.index.search(qv, n_cand)
+    dense_sims, dense_ids = dense_sims[0], dense_ids[0]
+    keep = dense_ids >= 0
+    dense_sims, dense_ids = dense_sims[keep], dense_ids[keep]
+
+    cand = np.union1d(bm25_top, dense_ids)
+    # 후보의 dense 점수는 저장된 벡터로 정확히 다시 계산
+    cand_vecs = loaded.index.reconstruct_batch(cand)
+    cand_dense = cand_vecs @ qv[0]
+    cand_bm25 = bm25_all[cand]
+
+    bm25_max = bm25_all[bm25_top[0]]
+    dense_max = float(dense_sims.max())
+    hybrid = (alpha * _normalize(cand_bm25, bm25_max)
+              + (1 - alpha) * _normalize(cand_dense.astype(np.float64), dense_max))
+
+    order = _top_k(hybrid, k)
+    # 후보 밖 chunk는 BM25, Dense 모두 N번째 값 이하 → 하이브리드 점수 상한
+    bound = (alpha * _normalize(bm25_all[bm25_top[-1]], bm25_max)
+             + (1 - alpha) * _normalize(float(dense_sims.min()), dense_max))
+    if not approximate and (len(order) < k or hybrid[order[-1]] < bound):
+        return None
+    return cand[order], hybrid[order]
+
+def hybrid_retrieve(doc_id: str, query: str, k: int = 6, 
+                   alpha: float = 0.5,
+                   candidates: Optional[int] = None,
+                   qv: Optional[np.ndarray] = None,
+                   nprobe: Optional[int] = None,
+                   ef_search: Optional[int] = None) -> Tuple[List[int], List[float], List[str]]:
+    """
+    Hybrid search: BM25 + Dense
+    alpha: BM25 가중치 (0~1), 1-alpha: Dense 가중치
+    alpha=0.5: 균형, alpha=0.7: BM25 중시, alpha=0.3: Dense 중시
+    candidates: BM25/FAISS 각각에서 뽑을 후보 수 (0이면 전체 검색, 기본값 RAG_CANDIDATES)
+    qv: 이미 계산한 질의 임베딩 [1, d] (semantic 캐시 조회에 쓴 것을 재사용)
+    nprobe / ef_search: ann.index(IVF / HNSW) 스토어의 검색 폭 (기본 RAG_IVF_NPROBE / RAG_HNSW_EF_SEARCH)
+    """
+    loaded = get_store(doc_id)
+    store = loaded.store
+    n = len(store.chunks)
+    if candidates is None:
+        candidates = _RETRIEVE_CANDIDATES
+
+    query_tokens = simple_tokenize(query)
+    if qv is None:
+        qv = embed_query(query)
+
+    result = None
+    n_cand = max(candidates, k)
+    if candidates > 0 and n_cand < n:
+        result = _candidate_scores(loaded, query_tokens, qv, k, alpha, n_cand, nprobe, ef_search)
+    if result is None:
+        hybrid_scores = _exhaustive_scores(loaded, query_tokens, qv, alpha)
+        top_indices = _top_k(hybrid_scores, k)
+        result = top_indices, hybrid_scores[top_indices]
+
+    top_indices, top_scores = result
+    top_chunks = [store.chunks[i] for i in top_indices]
+    
+    return top_indices.tolist(), top_scores.tolist(), top_chunks
@@ -0,0 +1,169 @@
+"""
+스토어 캐시 — doc_id 마다 chunks / BM25 / dense 인덱스를 함께 메모리에 두는 LRU
+
+- get_store: 게시된 버전이 바뀌었으면 (재 ingest) 다시 읽음, RAG_STORE_CACHE_MB 를 넘으면 오래 안 쓴 문서부터 제거
+- StoreWriter 가 게시 후 그 doc_id 를 invalidate
+
+환경 변수:
+  RAG_STORE_CACHE_MB=1024
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    from .bm25 import SparseBM25, load_bm25
+    from .dense_index import AnnIndex, MmapFlatIndex, faiss, load_dense_index
+    from .rag_store import _STORE_FILES, ChunkBlob, RAGStore, store_dir
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from bm25 import SparseBM25, load_bm25
+    from dense_index import AnnIndex, MmapFlatIndex, faiss, load_dense_index
+    from rag_store import _STORE_FILES, ChunkBlob, RAGStore, store_dir
+
+# ---------- 스토어 캐시 ----------
+_STORE_CACHE_MB = float(os.getenv("RAG_STORE_CACHE_MB", "1024"))
+
+
+# =========================================================
+# 스토어 캐시 (chunks + BM25 + FAISS 상주)
+# =========================================================
+
+def _store_version(base: Path) -> Tuple:
+    """스토리지 파일들의 (mtime_ns, size) — ingest로 다시 쓰이면 값이 바뀜"""
+    version = []
+    for name in _STORE_FILES:
+        try:
+            st = (base / name).stat()
+            version.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append((name, None, None))
+    return tuple(version)
+
+
+@dataclass
+class LoadedStore:
+    store: RAGStore
+    bm25: SparseBM25
+    index: "MmapFlatIndex | AnnIndex | faiss.Index"
+    version: Tuple
+    nbytes: int
+
+
+def _estimate_nbytes(store: RAGStore, bm25: SparseBM25, index) -> int:
+    """캐시 메모리 예산 계산용 대략적인 상주 크기 (mmap은 page cache 크기로 계산)"""
+    if isinstance(store.chunks, ChunkBlob):
+        chunk_bytes = store.chunks.nbytes
+    else:
+        chunk_bytes = sum(sys.getsizeof(c) for c in store.chunks)
+    if isinstance(index, AnnIndex):
+        index_bytes = index.nbytes
+    else:
+        index_bytes = int(index.ntotal) * int(index.d) * 4
+    if isinstance(bm25, SparseBM25):
+        bm25_bytes = bm25.nbytes
+    else:
+        # 이전 BM25Okapi 피클은 문서별 dict를 들고 있어 피클 크기의 몇 배를 차지함
+        bm25_bytes = store.bm25_path.stat().st_size * 3
+    return chunk_bytes + index_bytes + bm25_bytes
+
+
+class StoreCache:
+    """
+    doc_id 단위로 chunks/BM25/FAISS를 함께 메모리에 유지하는 LRU 캐시
+    - max_bytes 초과 시 가장 오래 안 쓴 문서부터 제거
+    - 스토리지 파일 mtime/size가 바뀌면 (재 ingest) 자동 재로딩
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, LoadedStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _load(self, doc_id: str, base: Path, version: Tuple) -> LoadedStore:
+        store = RAGStore.load(doc_id, base)
+        bm25 = load_bm25(store.bm25_path)
+        index = load_dense_index(store.index_path, store.index_kind)
+        return LoadedStore(store, bm25, index, version, _estimate_nbytes(store, bm25, index))
+
+    def get(self, doc_id: str) -> LoadedStore:
+        base = store_dir(doc_id)
+        if not base.exists():
+            raise FileNotFoundError(f"[RAG] storage not found: {base}")
+        # 게시된 버전 폴더는 바뀌지 않음 (이전 레이아웃은 파일 mtime/size 로 판단)
+        version = (base.name, _store_version(base))
+
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(doc_id)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[doc_id]
+                self.invalidations += 1
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(doc_id, threading.Lock())
+
+        # 같은 문서를 동시에 여러 번 읽지 않도록 문서별 lock
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(doc_id)
+                if entry is not None and entry.version == version:
+                    return entry
+            entry = self._load(doc_id, base, version)
+            with self._lock:
+                self._entries[doc_id] = entry
+                self._entries.move_to_end(doc_id)
+                self._evict()
+        return entry
+
+    def _evict(self):
+        total = sum(e.nbytes for e in self._entries.values())
+        # 마지막 1개는 예산을 넘어도 유지 (방금 요청한 문서)
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            total -= old.nbytes
+            self.evictions += 1
+
+    def invalidate(self, doc_id: Optional[str] = None):
+        with self._lock:
+            if doc_id is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(doc_id, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "docs": list(self._entries.keys()),
+                "bytes": sum(e.nbytes for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_store_cache = StoreCache(int(_STORE_CACHE_MB * 1024 * 1024))
+
+def get_store(doc_id: str) -> LoadedStore:
+    return _store_cache.get(doc_id)
+
+def store_cache_stats() -> dict:
+    return _store_cache.stats()
@@ -0,0 +1,357 @@
+"""
+스토어 쓰기 (ingest 쪽)
+
+- ChunkEmbedder: chunk 해시로 이전 스토어 → 임베딩 캐시 순으로 벡터를 재사용하고 바뀐 chunk 만 임베딩
+- StoreWriter: chunks / 임베딩 / BM25 postings 를 배치 단위로 staging 폴더에 이어 쓰고, finish 에서 인덱스를
+  만들어 새 버전으로 게시 (append=True: 게시된 버전 뒤에 이어 씀 — 서재 shard)
+- write_store: chunks / 임베딩이 이미 메모리에 있을 때 한 번에
+- 게시 후 스토어 캐시 / LLM semantic 캐시를 무효화하고 서재에 반영 (RAG_LIBRARY)
+
+환경 변수:
+  RAG_INGEST_BATCH=256               한 번에 임베딩/저장할 chunk 수 (메모리 상한)
+  RAG_LIBRARY=1                      ingest 때 서재 shard 갱신
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .bm25 import BM25Builder, SparseBM25, save_bm25
+    from .chunking import simple_tokenize
+    from .dense_index import (
+        _ANN_ADD_BATCH, _INDEX_KIND, _INDEX_RETRAIN_FRAC, build_ann_index, choose_index_kind, faiss,
+        save_ann_index,
+    )
+    from .emb_cache import chunk_key, lookup_vectors, store_vectors
+    from .embedding import emb_model_id, embed_texts
+    from .llm_cache import llm_cache
+    from .rag_store import (
+        LIBRARY_DIR, STORE_SCHEMA_VERSION, _EMB_STORE_DTYPE, RAGStore, _RawColumn, _atomic_write,
+        _publish_version, doc_path, read_store_meta, store_dir,
+    )
+    from .store_cache import _store_cache
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from bm25 import BM25Builder, SparseBM25, save_bm25
+    from chunking import simple_tokenize
+    from dense_index import (
+        _ANN_ADD_BATCH, _INDEX_KIND, _INDEX_RETRAIN_FRAC, build_ann_index, choose_index_kind, faiss,
+        save_ann_index,
+    )
+    from emb_cache import chunk_key, lookup_vectors, store_vectors
+    from embedding import emb_model_id, embed_texts
+    from llm_cache import llm_cache
+    from rag_store import (
+        LIBRARY_DIR, STORE_SCHEMA_VERSION, _EMB_STORE_DTYPE, RAGStore, _RawColumn, _atomic_write,
+        _publish_version, doc_path, read_store_meta, store_dir,
+    )
+    from store_cache import _store_cache
+
+# ---------- ingest ----------
+_INGEST_BATCH = int(os.getenv("RAG_INGEST_BATCH", "256"))          # 한 번에 임베딩/저장할 chunk 수 (메모리 상한)
+_LIBRARY = os.getenv("RAG_LIBRARY", "1") == "1"                     # ingest 때 서재 shard 갱신
+
+
+def _library():
+    """서재(library.py)는 StoreWriter 로 shard 를 쓰므로 처음 쓸 때 import (순환 import)"""
+    try:
+        from . import library
+    except ImportError:
+        import library
+    return library
+
+def _previous_store(doc_id: str, model_id: str) -> Optional[RAGStore]:
+    """벡터를 재사용할 수 있는 이전 스토어 (같은 모델로 만든 schema 2 스토어만)"""
+    try:
+        store = RAGStore.load(doc_id)
+    except FileNotFoundError:
+        return None
+    if store.schema_version < 2 or store.emb_model != model_id:
+        return None
+    return store
+
+def _key_prefix(key: str) -> int:
+    return int(key[:16], 16)
+
+class ChunkEmbedder:
+    """
+    chunk 해시(모델 id + 원문)로 이전 스토어(previous doc_id) → 임베딩 캐시 순으로 벡터를 재사용하고
+    바뀐 chunk 만 임베딩 모델에 넣음. 배치 단위로 불러도 됨 (스트리밍 ingest)
+    counts: 지금까지의 {"store", "cache", "embedded"} chunk 수
+    """
+
+    def __init__(self, previous: Optional[str] = None):
+        self.model_id = emb_model_id()
+        self._prev = _previous_store(previous, self.model_id) if previous else None
+        if self._prev is not None:
+            # 해시 앞 8바이트만 정렬해 둠 (chunk 당 16바이트) — 찾은 행은 원문을 비교해 확인
+            keys = np.fromiter((_key_prefix(chunk_key(self.model_id, c)) for c in self._prev.chunks),
+                               dtype=np.uint64, count=len(self._prev.chunks))
+            self._order = np.argsort(keys, kind="stable")
+            self._keys = keys[self._order]
+            self._prev_vecs = np.load(self._prev.index_path, mmap_mode="r")
+        self.counts = {"store": 0, "cache": 0, "embedded": 0}
+
+    def _from_previous(self, keys: List[str], chunks: Sequence[str]) -> Dict[str, np.ndarray]:
+        if self._prev is None or not len(self._keys):
+            return {}
+        found = {}
+        prefixes = np.array([_key_prefix(k) for k in keys], dtype=np.uint64)
+        for k, c, h, i in zip(keys, chunks, prefixes, np.searchsorted(self._keys, prefixes)):
+            while i < len(self._keys) and self._keys[i] == h:
+                row = int(self._order[i])
+                if self._prev.chunks[row] == c:
+                    found[k] = self._prev_vecs[row]
+                    break
+                i += 1
+        return found
+
+    def split(self, chunks: Sequence[str]) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, str]]:
+        """→ (chunk 별 key, 재사용한 벡터 {key: vec}, 새로 임베딩할 {key: 원문}) — counts 도 여기서 셈"""
+        keys = [chunk_key(self.model_id, c) for c in chunks]
+        found = self._from_previous(keys, chunks)
+        from_store = set(found)
+        cached = lookup_vectors([k for k in dict.fromkeys(keys) if k not in found])
+        found.update(cached)
+        todo = {k: c for k, c in zip(keys, chunks) if k not in found}
+
+        store = sum(k in from_store for k in keys)
+        cache = sum(k in cached and k not in from_store for k in keys)
+        self.counts["store"] += store
+        self.counts["cache"] += cache
+        self.counts["embedded"] += len(keys) - store - cache
+        return keys, found, todo
+
+    @staticmethod
+    def encode(todo: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """새 chunk 임베딩 + 임베딩 캐시에 저장 (bulk-ingest 는 여러 책의 todo 를 모아서 부름)"""
+        if not todo:
+            return {}
+        fresh = dict(zip(todo, embed_texts(list(todo.values()))))
+        store_vectors(fresh)
+        return fresh
+
+    def embed(self, chunks: Sequence[str]) -> np.ndarray:
+        keys, found, todo = self.split(chunks)
+        found.update(self.encode(todo))
+        return np.stack([np.asarray(found[k], dtype=np.float32) for k in keys])
+
+def embed_chunks(chunks: Sequence[str], previous: Optional[str] = None) -> Tuple[np.ndarray, dict]:
+    """한 번에 임베딩 → ([N, d] float32, {"store", "cache", "embedded"} chunk 수)"""
+    embedder = ChunkEmbedder(previous)
+    return embedder.embed(chunks), embedder.counts
+
+
+def _trained_index(source: Optional[str], kind: str, n: int, d: int) -> Optional[faiss.Index]:
+    """
+    source 스토어의 IVF/PQ 인덱스를 비워서 반환 (학습 재사용).
+    종류·차원·임베딩 모델이 같고 벡터 수 차이가 RAG_INDEX_RETRAIN_FRAC 이내일 때만, 아니면 None (새로 학습)
+    """
+    if source is None or kind not in ("ivfsq8", "ivfpq"):
+        return None
+    base = store_dir(source)
+    try:
+        meta = json.loads((base / "meta.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    if (meta.get("index_kind") != kind or meta.get("emb_model") != emb_model_id()
+            or not (base / "ann.index").exists()):
+        return None
+    index = faiss.read_index(str(base / "ann.index"))
+    if index.d != d or abs(n - index.ntotal) > _INDEX_RETRAIN_FRAC * index.ntotal:
+        return None
+    index.reset()
+    return index
+
+def _trained_size(meta: dict) -> int:
+    """IVF/PQ 를 학습할 때의 벡터 수 (기록이 없는 이전 스토어는 chunk 수)"""
+    return int(meta.get("trained_n", meta["chunks"]))
+
+
+class StoreWriter:
+    """
+    schema 2 스토어를 배치 단위로 쓰는 writer (메모리는 배치 크기만큼, 책 크기와 무관)
+    - add(chunks, vecs): storage/<doc_id>/.staging-*/ 에 chunks.txt / offsets / 임베딩 / BM25 postings 를 이어 씀
+    - finish(): embeddings.npy / bm25 / ann.index / meta.json 을 다 만든 뒤 새 버전으로 게시 (_publish_version)
+                + 캐시 무효화 + (update_library 이면) 서재 반영
+    - abort(): staging 폴더 삭제 (게시된 스토어는 그대로)
+    - append=True: 게시된 현재 버전 뒤에 이어 씀 (chunks / 임베딩은 바이트 복사, BM25 는 기존 postings 에 추가,
+                   ann 은 새 벡터만 add — 서재 shard 에 책을 붙일 때)
+    """
+
+    def __init__(self, doc_id: str, update_library: bool = True, bm25: Optional[SparseBM25] = None,
+                 append: bool = False):
+        if update_library and doc_id.split("/")[0] == LIBRARY_DIR:
+            raise ValueError(f"doc_id '{LIBRARY_DIR}' 는 서재 전용입니다")
+        self.doc_id = doc_id
+        self.update_library = update_library
+        self.doc_dir = doc_path(doc_id)
+        self.base = self.doc_dir / f".staging-{uuid.uuid4().hex[:12]}"
+        self.base.mkdir(parents=True)
+        self._blob_path = self.base / "chunks.txt.tmp"
+        self._blob = open(self._blob_path, "wb")
+        self._offsets = _RawColumn(self.base / "chunk_offsets.raw.tmp", "int64")
+        self._offsets.append(np.zeros(1))
+        self._end = 0
+        self._emb = _RawColumn(self.base / "embeddings.raw.tmp", _EMB_STORE_DTYPE)
+        self._bm25 = bm25
+        self.n = 0
+        self.dim: Optional[int] = None
+        self._prev: Optional[dict] = None  # append: 이어 쓰는 버전의 meta
+        if append:
+            try:
+                self._copy_current()
+            except BaseException:
+                self._bm25_builder = None
+                self.abort()
+                raise
+        else:
+            self._bm25_builder = BM25Builder(spill_dir=self.base) if bm25 is None else None
+
+    def _copy_current(self):
+        """게시된 현재 버전의 chunks / offsets / 임베딩을 staging 에 복사하고 BM25 는 그 위에 이어 만듦"""
+        src = store_dir(self.doc_id)
+        self._prev = json.loads((src / "meta.json").read_text(encoding="utf-8"))
+        with open(src / "chunks.txt", "rb") as f:
+            shutil.copyfileobj(f, self._blob, 1 << 24)
+        offsets = np.load(src / "chunk_offsets.npy", mmap_mode="r")
+        self._offsets.append(offsets[1:])
+        self._end = int(offsets[-1])
+        self.dim = self._emb.width = self._prev["emb_dim"]
+        self._emb.append_npy(src / "embeddings.npy")
+        self._bm25_builder = BM25Builder(base=SparseBM25.load(src / "bm25.json"))
+        self.n = len(offsets) - 1
+
+    def add(self, chunks: Sequence[str], vecs: np.ndarray, tokens: Optional[Sequence[List[str]]] = None):
+        """tokens: chunk 별 simple_tokenize 결과를 이미 만들었으면 (bulk-ingest 워커 프로세스)"""
+        if len(chunks) != len(vecs):
+            raise ValueError(f"chunks({len(chunks)}) 와 임베딩({len(vecs)}) 수가 다름")
+        if not len(chunks):
+            return
+        blobs = [c.encode("utf-8") for c in chunks]
+        self._blob.writelines(blobs)
+        ends = self._end + np.cumsum([len(b) for b in blobs], dtype=np.int64)
+        self._offsets.append(ends)
+        self._end = int(ends[-1])
+        if self._bm25_builder is not None:
+            for toks in (tokens if tokens is not None else map(simple_tokenize, chunks)):
+                self._bm25_builder.add(toks)
+        self.dim = self._emb.width = vecs.shape[1]
+        self._emb.append(vecs)
+        self.n += len(chunks)
+
+    def abort(self):
+        self._blob.close()
+        self._offsets.close()
+        self._emb.close()
+        if self._bm25_builder is not None:
+            self._bm25_builder.discard()
+        shutil.rmtree(self.base, ignore_errors=True)
+        try:
+            self.doc_dir.rmdir()  # 새 doc_id 였으면 빈 폴더도 정리
+        except OSError:
+            pass
+
+    def finish(self, index_kind: Optional[str] = None, trained_from: Optional[str] = None) -> RAGStore:
+        """
+        index_kind: flat/hnsw/ivfsq8/ivfpq (None 이면 RAG_INDEX, auto 는 chunk 수로 선택)
+        trained_from: 이 스토어의 IVF/PQ 학습 결과를 재사용 (조건은 _trained_index)
+        """
+        if self.n == 0:
+            self.abort()
+            raise ValueError("[ERROR] 빈 문서")
+        try:
+            self._write_indexes(index_kind, trained_from)
+            _publish_version(self.doc_dir, self.base)
+        except BaseException:
+            self.abort()
+            raise
+        _store_cache.invalidate(self.doc_id)
+        if llm_cache is not None:
+            llm_cache.invalidate_doc(self.doc_id)
+        if self.update_library and _LIBRARY:
+            # 서재 갱신이 실패해도 책 자체의 ingest 는 성공 (library --rebuild 로 다시 맞춤)
+            try:
+                _library().library_add(self.doc_id)
+            except Exception as e:
+                print(f"[WARN] 서재 갱신 실패: {e}")
+        return RAGStore.load(self.doc_id)
+
+    def _write_indexes(self, index_kind: Optional[str], trained_from: Optional[str]):
+        """staging 폴더에 embeddings.npy / bm25 / ann.index / meta.json (meta 는 마지막)"""
+        base = self.base
+        kind = choose_index_kind(self.n, index_kind or _INDEX_KIND)
+        self._blob.close()
+        os.replace(self._blob_path, base / "chunks.txt")
+        self._offsets.save_npy(base / "chunk_offsets.npy")
+        self._emb.save_npy(base / "embeddings.npy")
+        if self._bm25 is not None:
+            save_bm25(self._bm25, base / "bm25.json")
+        else:
+            self._bm25_builder.save(base / "bm25.json")
+
+        # ann 인덱스는 embeddings.npy(mmap)에서 나눠 add
+        vecs = np.load(base / "embeddings.npy", mmap_mode="r")
+        ann, trained_n, note = self._grown_index(vecs, kind), None, ", 새 벡터만 add"
+        if ann is not None:
+            trained_n = self._prev.get("trained_n")
+        else:
+            trained = _trained_index(trained_from, kind, self.n, self.dim)
+            ann = build_ann_index(vecs, kind, trained)
+            note = ", 학습 재사용" if trained is not None else ""
+            if kind in ("ivfsq8", "ivfpq"):
+                trained_n = _trained_size(read_store_meta(trained_from)) if trained is not None else self.n
+        if ann is not None:
+            print(f"[INFO] Dense index: {kind} ({self.n} chunks{note})")
+            save_ann_index(ann, base / "ann.index")
+        del vecs, ann
+
+        meta = {"schema_version": STORE_SCHEMA_VERSION, "doc_id": self.doc_id,
+                "emb_dim": self.dim, "chunks": self.n, "index_kind": kind, "emb_model": emb_model_id()}
+        if trained_n is not None:
+            meta["trained_n"] = trained_n
+        data = json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8")
+        _atomic_write(base / "meta.json", lambda f: f.write(data))
+
+    def _grown_index(self, vecs: np.ndarray, kind: str) -> Optional[faiss.Index]:
+        """
+        append: 이전 버전 ann.index 에 새 벡터만 add. 인덱스 종류/모델이 바뀌었거나,
+        IVF/PQ 가 학습 때보다 RAG_INDEX_RETRAIN_FRAC 넘게 커졌으면 None (처음부터 학습)
+        """
+        prev = self._prev
+        if prev is None or kind == "flat" or prev.get("index_kind") != kind \
+                or prev.get("emb_model") != emb_model_id():
+            return None
+        if kind in ("ivfsq8", "ivfpq") and self.n > (1 + _INDEX_RETRAIN_FRAC) * _trained_size(prev):
+            return None
+        path = store_dir(self.doc_id) / "ann.index"
+        if not path.exists():
+            return None
+        index = faiss.read_index(str(path))
+        if index.d != self.dim or index.ntotal != prev["chunks"]:
+            return None
+        for i in range(index.ntotal, self.n, _ANN_ADD_BATCH):
+            index.add(np.ascontiguousarray(vecs[i:min(i + _ANN_ADD_BATCH, self.n)], dtype=np.float32))
+        return index
+
+def write_store(doc_id: str, chunks: Sequence[str], vecs: np.ndarray, bm25: Optional[SparseBM25] = None,
+                index_kind: Optional[str] = None, update_library: bool = True,
+                trained_from: Optional[str] = None) -> RAGStore:
+    """
+    chunks/임베딩이 이미 메모리에 있을 때 한 번에 저장 (StoreWriter.finish 와 같은 순서/정리)
+    bm25: 없으면 chunks 로 만듦
+    update_library: 저장 후 서재 shard 에도 반영 (RAG_LIBRARY=1 일 때, 서재 shard 자신은 False)
+    """
+    writer = StoreWriter(doc_id, update_library=update_library, bm25=bm25)
+    try:
+        writer.add(chunks, vecs)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish(index_kind, trained_from=trained_from)
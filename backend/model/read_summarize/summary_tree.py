@@ -0,0 +1,279 @@
+"""
+요약 트리 (chunk → section → book)
+
+- build_summary_tree: 원문이 바뀐 노드만 LLM 으로 다시 요약해 storage/<doc_id>/summary_tree.json 갱신
+- summarize_doc: 최상위 레벨을 N문장으로 통합 (N별로 트리에 저장)
+- 요약 요청은 트리를 몇 개 만들든 프로세스 전체에서 RAG_SUMMARY_CONCURRENCY 개까지 (set_summary_concurrency)
+
+환경 변수:
+  RAG_SUMMARY_LEAF_TOKENS=1000, RAG_SUMMARY_FANOUT=8, RAG_SUMMARY_REDUCE_TOKENS=3000
+  RAG_SUMMARY_CONCURRENCY=8, RAG_SUMMARY_RETRIES=5, RAG_SUMMARY_TIMEOUT_S=300
+  RAG_SUMMARY_ON_INGEST=1            ingest 가 끝나면 요약 트리 생성
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from .chunking import count_tokens, dedupe_sentences, pack_units
+    from .llm_backends import get_backend
+    from .rag_store import _atomic_write, doc_path
+    from .store_cache import get_store
+except ImportError:  # python mvp_reader.py 로 직접 실행할 때
+    from chunking import count_tokens, dedupe_sentences, pack_units
+    from llm_backends import get_backend
+    from rag_store import _atomic_write, doc_path
+    from store_cache import get_store
+
+# ---------- 요약 트리 ----------
+_SUMMARY_LEAF_TOKENS = int(os.getenv("RAG_SUMMARY_LEAF_TOKENS", "1000"))  # leaf 하나(LLM 호출 1회)에 넣을 원문 토큰 수
+_SUMMARY_FANOUT = int(os.getenv("RAG_SUMMARY_FANOUT", "8"))             # 상위 노드 하나가 묶는 자식 수
+_SUMMARY_REDUCE_TOKENS = int(os.getenv("RAG_SUMMARY_REDUCE_TOKENS", "3000"))  # 통합(reduce) 프롬프트 하나에 넣을 부분 요약 토큰 수
+_SUMMARY_CONCURRENCY = int(os.getenv("RAG_SUMMARY_CONCURRENCY", "8"))     # 동시에 보낼 요약 요청 수 (프로세스 전체)
+_SUMMARY_RETRIES = int(os.getenv("RAG_SUMMARY_RETRIES", "5"))             # 429/5xx/연결 오류 재시도 횟수
+_SUMMARY_TIMEOUT_S = float(os.getenv("RAG_SUMMARY_TIMEOUT_S", "300"))      # 요약 호출 하나의 deadline (재시도 포함)
+_SUMMARY_ON_INGEST = os.getenv("RAG_SUMMARY_ON_INGEST", "1") == "1"
+_SUMMARY_DEFAULT_SENTENCES = 5
+
+# =========================================================
+# 요약 트리 (chunk → section → book)
+# =========================================================
+# summary_tree.json:
+#   levels[0]   leaf: 연속 chunk 묶음(~RAG_SUMMARY_LEAF_TOKENS, 문장 중간에서 자르지 않음)의 요약
+#   levels[i]   section: 아래 레벨 노드 최대 RAG_SUMMARY_FANOUT 개(합계 RAG_SUMMARY_REDUCE_TOKENS 이하) 요약의 요약
+#   renders     book: 최상위 레벨을 N문장으로 통합한 요약 (N별, 최상위 해시가 같을 때만 유효)
+# 최상위 레벨이 fanout/reduce 예산 안에 들어올 때까지 레벨을 쌓는다 (계층적 reduce).
+# 한 레벨의 요약들은 동시에 요청하고 순서대로 다시 모은다. 동시 요청 수는 요약 트리를 몇 개 만들든
+# 프로세스 전체에서 RAG_SUMMARY_CONCURRENCY 개 (공유 semaphore — /summarize 요청 N개가 N배로 보내지 않음)
+# 노드 해시 = 원문(자식 해시) 해시 → 다시 만들 때 해시가 같은 노드는 LLM 호출 없이 재사용.
+# 묶음 경계는 내용 기반(해시)으로 정해서 앞부분이 바뀌어도 뒤쪽 노드는 그대로 유지된다.
+SUMMARY_TREE_VERSION = 1
+
+def _sha(*parts: str) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _content_groups(hashes: List[str], sizes: List[int], max_size: int, min_size: int,
+                    period: int, max_items: int = 0, min_items: int = 1) -> List[Tuple[int, int]]:
+    """
+    [start, end) 묶음: 합계가 max_size를 넘기 전, 또는 max_items개가 되면 끊고,
+    그 전에도 min_size/min_items 이상이면서 해시가 period로 나눠떨어지는 곳에서 끊음
+    """
+    groups, start, acc = [], 0, 0
+    for i, (h, size) in enumerate(zip(hashes, sizes)):
+        if i > start and acc + size > max_size:
+            groups.append((start, i))
+            start, acc = i, 0
+        acc += size
+        count = i + 1 - start
+        if (max_items and count >= max_items) or \
+                (acc >= min_size and count >= min_items and int(h[:8], 16) % period == 0):
+            groups.append((start, i + 1))
+            start, acc = i + 1, 0
+    if start < len(hashes):
+        groups.append((start, len(hashes)))
+    return groups
+
+def _leaf_prompt(text: str) -> str:
+    return f"아래 텍스트를 한국어로 핵심만 3~5문장 bullet 요약:\n\n{text}\n"
+
+def _section_prompt(summaries: List[str]) -> str:
+    return ("다음 부분 요약들을 시간 순서를 유지하며 한국어 5~7문장으로 통합 요약:\n\n"
+            + "\n".join("- " + s for s in summaries))
+
+def _render_prompt(summaries: List[str], sentences: int) -> str:
+    return (f"다음은 한 작품의 부분 요약들입니다. 전체 줄거리를 한국어 {sentences}문장으로 요약해줘:\n\n"
+            + "\n".join("- " + s for s in summaries))
+
+def _summary_chat(prompt: str, max_tokens: int = 300) -> str:
+    # 실패는 LLMError (오류 문자열이 트리에 저장되지 않음), 429/5xx는 RAG_SUMMARY_RETRIES 번까지 backoff 후 재시도
+    return get_backend().chat(prompt, max_tokens, retries=_SUMMARY_RETRIES, timeout=_SUMMARY_TIMEOUT_S)
+
+_summary_slots = threading.BoundedSemaphore(max(1, _SUMMARY_CONCURRENCY))
+
+def set_summary_concurrency(n: int):
+    """프로세스 전체 동시 요약 요청 수 변경 (bench 등 — 이미 요청 중인 것은 이전 한도로 끝남)"""
+    global _summary_slots
+    _summary_slots = threading.BoundedSemaphore(max(1, n))
+
+def _limited(chat):
+    """chat 호출마다 공유 슬롯 하나를 잡음 → 동시에 만드는 모든 요약 트리 합계가 한도 이하"""
+    def call(prompt: str) -> str:
+        with _summary_slots:
+            return chat(prompt)
+    return call
+
+def _fill_summaries(nodes: List[dict], prompts: List[Optional[str]], chat,
+                    concurrency: int = _SUMMARY_CONCURRENCY) -> int:
+    """
+    prompt가 있는(=재사용 못 한) 노드만 LLM 요약, 새로 만든 수 반환
+    이 트리는 최대 concurrency개씩, 프로세스 전체로는 RAG_SUMMARY_CONCURRENCY개 (_summary_slots)
+    """
+    todo = [(node, prompt) for node, prompt in zip(nodes, prompts) if prompt is not None]
+    if not todo:
+        return 0
+    chat = _limited(chat)
+    if concurrency <= 1 or len(todo) == 1:
+        for node, prompt in todo:
+            node["summary"] = chat(prompt)
+        return len(todo)
+    with ThreadPoolExecutor(min(concurrency, len(todo)), thread_name_prefix="summary") as ex:
+        futures = [ex.submit(chat, prompt) for _, prompt in todo]
+        try:
+            # 완료 순서와 상관없이 원래 순서대로 채움
+            for (node, _), fut in zip(todo, futures):
+                node["summary"] = fut.result()
+        except Exception:
+            for fut in futures:
+                fut.cancel()
+            raise
+    return len(todo)
+
+
+@dataclass
+class SummaryTree:
+    doc_id: str
+    source: str                     # 전체 chunk 해시의 해시 (원문이 바뀌었는지 빠르게 확인)
+    model: str
+    levels: List[List[dict]]        # {"hash", "span": [chunk_start, chunk_end], "summary"}
+    renders: Dict[str, dict]        # {"N": {"top": 최상위 레벨 해시, "summary"}}
+    version: int = SUMMARY_TREE_VERSION
+
+    @staticmethod
+    def path_for(doc_id: str) -> Path:
+        return doc_path(doc_id) / "summary_tree.json"
+
+    @property
+    def top_hash(self) -> str:
+        return _sha(*[n["hash"] for n in self.levels[-1]])
+
+    @classmethod
+    def load(cls, doc_id: str) -> Optional["SummaryTree"]:
+        path = cls.path_for(doc_id)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != SUMMARY_TREE_VERSION:
+            return None
+        return cls(doc_id=doc_id, source=data["source"], model=data["model"],
+                   levels=data["levels"], renders=data.get("renders", {}))
+
+    def save(self):
+        data = {"version": self.version, "doc_id": self.doc_id, "source": self.source,
+                "model": self.model, "levels": self.levels, "renders": self.renders}
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        _atomic_write(self.path_for(self.doc_id), lambda f: f.write(payload))
+
+    def get_render(self, sentences: int) -> Optional[str]:
+        r = self.renders.get(str(sentences))
+        if r is not None and r["top"] == self.top_hash:
+            return r["summary"]
+        return None
+
+    def set_render(self, sentences: int, summary: str):
+        self.renders[str(sentences)] = {"top": self.top_hash, "summary": summary}
+
+    def render_prompt(self, sentences: int) -> str:
+        return _render_prompt([n["summary"] for n in self.levels[-1]], sentences)
+
+
+def build_summary_tree(doc_id: str, chunks: Sequence[str], chat=_summary_chat,
+                       concurrency: int = _SUMMARY_CONCURRENCY) -> SummaryTree:
+    """원문이 바뀐 노드만 다시 요약해서 summary_tree.json 갱신"""
+    chunk_hashes = [_sha(c) for c in chunks]
+    old = SummaryTree.load(doc_id)
+    reuse: Dict[str, str] = {}
+    model = get_backend().cache_model
+    if old is not None and old.model == model:
+        reuse = {n["hash"]: n["summary"] for level in old.levels for n in level}
+
+    # leaf: 연속 chunk 묶음 (겹치는 문장 제거, 예산보다 큰 chunk 하나는 문장 단위로 나눔)
+    level, prompts = [], []
+    sizes = [count_tokens(c) for c in chunks]
+    for start, end in _content_groups(chunk_hashes, sizes, _SUMMARY_LEAF_TOKENS,
+                                      _SUMMARY_LEAF_TOKENS // 2, 4):
+        text = "\n\n".join(dedupe_sentences(chunks[start:end]))
+        pieces = pack_units([text], _SUMMARY_LEAF_TOKENS)
+        for j, piece in enumerate(pieces):
+            extra = (str(j),) if len(pieces) > 1 else ()
+            h = _sha("leaf", *chunk_hashes[start:end], *extra)
+            level.append({"hash": h, "span": [start, end], "summary": reuse.get(h)})
+            prompts.append(None if h in reuse else _leaf_prompt(piece))
+
+    levels = []
+    while True:
+        made = _fill_summaries(level, prompts, chat, concurrency)
+        print(f"[INFO] summary level {len(levels)}: {len(level)} nodes ({made} new)")
+        levels.append(level)
+        sizes = [count_tokens(n["summary"]) for n in level]
+        if len(level) <= _SUMMARY_FANOUT and sum(sizes) <= _SUMMARY_REDUCE_TOKENS:
+            break
+        hashes = [n["hash"] for n in level]
+        groups = _content_groups(hashes, sizes, _SUMMARY_REDUCE_TOKENS, 0,
+                                 max(2, _SUMMARY_FANOUT // 2), max_items=_SUMMARY_FANOUT, min_items=2)
+        if len(groups) >= len(level):
+            break  # 요약 하나하나가 예산보다 커서 더 묶을 수 없음
+        parent, prompts = [], []
+        for start, end in groups:
+            kids = level[start:end]
+            h = _sha("node", *hashes[start:end])
+            parent.append({"hash": h, "span": [kids[0]["span"][0], kids[-1]["span"][1]],
+                           "summary": reuse.get(h)})
+            prompts.append(None if h in reuse else _section_prompt([k["summary"] for k in kids]))
+        level = parent
+
+    tree = SummaryTree(doc_id=doc_id, source=_sha(*chunk_hashes), model=model,
+                       levels=levels, renders=old.renders if old is not None else {})
+    tree.renders = {n: r for n, r in tree.renders.items() if r["top"] == tree.top_hash}
+    tree.save()
+    return tree
+
+
+_summary_locks: Dict[str, threading.Lock] = {}
+_summary_locks_guard = threading.Lock()
+
+def _summary_lock(doc_id: str) -> threading.Lock:
+    with _summary_locks_guard:
+        return _summary_locks.setdefault(doc_id, threading.Lock())
+
+def ensure_summary_tree(doc_id: str) -> SummaryTree:
+    """스토어 원문과 맞는 요약 트리 (없거나 원문이 바뀌었으면 바뀐 부분만 다시 만듦)"""
+    chunks = get_store(doc_id).store.chunks
+    with _summary_lock(doc_id):
+        tree = SummaryTree.load(doc_id)
+        if tree is not None and tree.model == get_backend().cache_model \
+                and tree.source == _sha(*[_sha(c) for c in chunks]):
+            return tree
+        return build_summary_tree(doc_id, chunks)
+
+def save_summary_render(doc_id: str, sentences: int, top_hash: str, summary: str):
+    """N문장 요약을 트리에 저장 (그 사이 트리가 바뀌었으면 버림)"""
+    with _summary_lock(doc_id):
+        tree = SummaryTree.load(doc_id)
+        if tree is None or tree.top_hash != top_hash:
+            return
+        tree.set_render(sentences, summary)
+        tree.save()
+
+def summary_max_tokens(sentences: int) -> int:
+    return max(300, 80 * sentences)
+
+def summarize_doc(doc_id: str, sentences: int = _SUMMARY_DEFAULT_SENTENCES) -> str:
+    """요약 트리에서 N문장 책 요약 (처음 요청된 N만 LLM 1회)"""
+    tree = ensure_summary_tree(doc_id)
+    summary = tree.get_render(sentences)
+    if summary is None:
+        summary = _summary_chat(tree.render_prompt(sentences), summary_max_tokens(sentences))
+        save_summary_render(doc_id, sentences, tree.top_hash, summary)
+    return summary
@@ -0,0 +1,22 @@
+"""
+backend/ 에서 실행:  python -m pytest -q tests
+(numpy / faiss 필요, rank_bm25 비교 테스트는 rank-bm25 가 있을 때만)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from model.read_summarize import rag_store, store_cache  # noqa: E402
+
+
+@pytest.fixture
+def tmp_storage(tmp_path, monkeypatch):
+    """storage/ 대신 임시 폴더에 스토어를 만듦 (저장소의 스토어는 건드리지 않음)"""
+    monkeypatch.setattr(rag_store, "STORAGE_ROOT", tmp_path)
+    store_cache._store_cache.invalidate()
+    yield tmp_path
+    store_cache._store_cache.invalidate()
@@ -0,0 +1,76 @@
+"""
+SparseBM25 점수가 rank_bm25.BM25Okapi 와 같은지 (번들 책 두 권), CSR 배열이 mmap 으로 다시 읽히는지
+"""
+
+import numpy as np
+import pytest
+
+from model.read_summarize import bm25, mvp_reader as mr, rag_store
+
+QUERIES = [
+    "김첨지 설렁탕",
+    "비가 오는 날 인력거",
+    "아내가 죽었다 죽었다",      # 같은 토큰 반복
+    "Romeo Juliet love",
+    "romeo poison tybalt",
+    "없는단어 zzzqqq",            # 사전에 없는 토큰만
+    "설렁탕 zzzqqq Romeo",        # 일부만 사전에 있음
+    "",
+]
+
+
+def _books():
+    for doc_id in ("luckyday", "romeoandjuliet"):
+        if rag_store.store_exists(doc_id):
+            yield doc_id
+
+
+@pytest.fixture(scope="module", params=list(_books()))
+def corpus(request):
+    return [mr.simple_tokenize(c) for c in mr.RAGStore.load(request.param).chunks]
+
+
+def test_scores_match_rank_bm25(corpus):
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    ref = rank_bm25.BM25Okapi(corpus)
+    sparse = mr.SparseBM25.build(corpus)
+    for query in QUERIES:
+        tokens = mr.simple_tokenize(query)
+        np.testing.assert_allclose(sparse.get_scores(tokens), ref.get_scores(tokens),
+                                   rtol=1e-5, atol=1e-5, err_msg=query)
+
+
+def test_reload_through_mmap(corpus, tmp_path):
+    sparse = mr.SparseBM25.build(corpus)
+    sparse.save(tmp_path / "bm25.json")
+    loaded = mr.SparseBM25.load(tmp_path / "bm25.json")
+    for name in bm25._BM25_ARRAYS:
+        arr = getattr(loaded, name)
+        assert isinstance(arr, np.memmap), name
+        np.testing.assert_array_equal(arr, getattr(sparse, name))
+    assert loaded.vocab == sparse.vocab
+    for query in QUERIES:
+        tokens = mr.simple_tokenize(query)
+        np.testing.assert_array_equal(loaded.get_scores(tokens), sparse.get_scores(tokens))
+
+
+def test_spilled_and_extended_builds_match(corpus, tmp_path):
+    """디스크로 내보낸 빌드(스트리밍 ingest), 기존 인덱스 뒤에 이어 만든 빌드(서재 shard)도 같은 CSR"""
+    sparse = mr.SparseBM25.build(corpus)
+
+    spill = mr.BM25Builder(spill_dir=tmp_path)
+    for tokens in corpus:
+        spill.add(tokens)
+    spill.save(tmp_path / "bm25.json")
+    spilled = mr.SparseBM25.load(tmp_path / "bm25.json")
+
+    half = len(corpus) // 2
+    extend = mr.BM25Builder(base=mr.SparseBM25.build(corpus[:half]))
+    for tokens in corpus[half:]:
+        extend.add(tokens)
+    extended = extend.build()
+
+    for other in (spilled, extended):
+        assert other.vocab == sparse.vocab
+        for name in bm25._BM25_ARRAYS:
+            np.testing.assert_array_equal(getattr(other, name), getattr(sparse, name), err_msg=name)
@@ -0,0 +1,107 @@
+"""
+후보 생성 모드(candidates=N)가 전체 검색(candidates=0)과 같은 랭킹을 내는지
+- 번들 스토어 luckyday, 작은 합성 스토어
+- 후보 집합이 실제 top-k 를 놓치는 경우 → 점수 상한 검사로 전체 검색 fallback
+"""
+
+import numpy as np
+import pytest
+
+from model.read_summarize import mvp_reader as mr, rag_store, retrieval
+
+
+def _assert_same(doc_id, query, qv, k, candidates):
+    ids, scores, _ = mr.hybrid_retrieve(doc_id, query, k=k, candidates=candidates, qv=qv)
+    ref_ids, ref_scores, _ = mr.hybrid_retrieve(doc_id, query, k=k, candidates=0, qv=qv)
+    assert ids == ref_ids
+    np.testing.assert_allclose(scores, ref_scores, rtol=1e-5, atol=1e-6)
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+@pytest.mark.skipif(not rag_store.store_exists("luckyday"), reason="luckyday 스토어 없음")
+@pytest.mark.parametrize("query", ["김첨지 설렁탕", "비가 오는 날 인력거", "아내가 죽었다", "없는단어"])
+@pytest.mark.parametrize("k,candidates", [(3, 5), (6, 10)])
+def test_parity_luckyday(query, k, candidates):
+    loaded = mr.get_store("luckyday")
+    # 임베딩 모델 없이: chunk 벡터에 잡음을 섞어 질의 벡터로 사용
+    rng = np.random.default_rng(len(query))
+    base = loaded.index.reconstruct_batch(np.array([len(query) % len(loaded.store.chunks)]))
+    qv = _unit(base + 0.05 * rng.standard_normal(base.shape))
+    _assert_same("luckyday", query, qv, k, candidates)
+
+
+@pytest.fixture
+def synthetic_store(tmp_storage):
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(200)]
+    chunks = [" ".join(rng.choice(words, 15)) for _ in range(400)]
+    vecs = _unit(rng.standard_normal((400, 32)))
+    mr.write_store("syn", chunks, vecs, update_library=False, index_kind="flat")
+    return vecs
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("k,candidates", [(1, 2), (5, 20), (10, 50)])
+def test_parity_synthetic(synthetic_store, seed, k, candidates):
+    rng = np.random.default_rng(seed)
+    query = " ".join(f"w{i}" for i in rng.integers(0, 200, 3))
+    qv = _unit(synthetic_store[seed] + 0.3 * rng.standard_normal(32))[None, :]
+    _assert_same("syn", query, qv, k, candidates)
+
+
+def test_fallback_when_candidates_miss_top_k(tmp_storage, monkeypatch):
+    """
+    BM25 top-5 (apple 이 많은 chunk, dense 0) ∪ dense top-5 (질의 방향, apple 없음) 밖에
+    BM25 / dense 모두 6번째인 chunk 가 하이브리드 1등 → 후보 점수는 상한보다 작아 전체 검색으로
+    """
+    e0, e1, e2 = np.eye(3, dtype=np.float32)
+    chunks, vecs = [], []
+    for _ in range(5):
+        chunks.append("apple apple apple apple")
+        vecs.append(e1)
+    for i in range(5):
+        chunks.append("pear")
+        vecs.append(_unit(e0 + 0.1 * (i + 1) * e2))
+    chunks.append("apple apple apple kiwi")
+    best = len(chunks) - 1
+    vecs.append(_unit(e0 + 0.8 * e1))
+    for _ in range(20):
+        chunks.append("banana")
+        vecs.append(e2)
+    mr.write_store("miss", chunks, np.stack(vecs), update_library=False, index_kind="flat")
+
+    calls = {"candidate": 0, "exhaustive": 0}
+    cand_fn, exh_fn = retrieval._candidate_scores, retrieval._exhaustive_scores
+
+    def candidate(*a, **kw):
+        calls["candidate"] += 1
+        result = cand_fn(*a, **kw)
+        assert result is None, "후보 집합만으로는 top-1 을 보장할 수 없어야 함"
+        return result
+
+    def exhaustive(*a, **kw):
+        calls["exhaustive"] += 1
+        return exh_fn(*a, **kw)
+
+    monkeypatch.setattr(retrieval, "_candidate_scores", candidate)
+    monkeypatch.setattr(retrieval, "_exhaustive_scores", exhaustive)
+    qv = e0[None, :]
+    ids, _, _ = mr.hybrid_retrieve("miss", "apple", k=1, candidates=5, qv=qv)
+    assert calls == {"candidate": 1, "exhaustive": 1}
+    assert ids == [best]
+    _assert_same("miss", "apple", qv, 3, 5)
+
+
+def test_top_k_ties_break_by_chunk_order():
+    scores = np.array([1.0, 3.0, 2.0, 3.0, 3.0, 0.0, 3.0])
+    assert mr._top_k(scores, 2).tolist() == [1, 3]
+    assert mr._top_k(scores, 5).tolist() == [1, 3, 4, 6, 2]
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 5, 1000).astype(float)
+    for k in (1, 10, 300):
+        expected = np.lexsort((np.arange(len(scores)), -scores))[:k]
+        assert mr._top_k(scores, k).tolist() == expected.tolist()
@@ -0,0 +1,130 @@
+"""
+백그라운드 warm-up (서버가 요청을 받기 시작한 뒤 무거운 import / 모델 로딩을 미리 해 둠)
+
+- app import 에는 fastapi 와 가벼운 모듈만 → uvicorn 워커가 바로 뜨고 health check 가 바로 응답
+- 무거운 것(mvp_reader → numpy / faiss, 임베딩 모델, LLM 클라이언트·로컬 모델, Stable Diffusion)은
+  처음 쓰는 요청이 import / 로딩하거나, 여기 등록한 단계가 startup 후 delay_s 뒤에 데몬 스레드에서 미리 실행
+- 단계는 이름으로 등록하고 APP_WARMUP=reader,embed,llm,diffusion 처럼 골라서 켬 (빈 값이면 끔)
+- readiness 는 APP_READY_REQUIRES 에 있는 (켠) 단계만 봄: pending() 이 비어 있으면 준비 완료
+  (app 의 /ready = readiness, / 는 liveness)
+- 단계 하나가 실패해도 다음 단계는 계속. 필수 단계는 APP_WARMUP_RETRY_S 부터 2배씩 (최대 5분) 기다렸다
+  다시 시도하고, 필수가 아닌 단계의 실패는 그대로 끝 (failed() 로 보고, 그 기능은 첫 요청 때 다시 시도됨)
+- stats(): 단계별 status(pending | running | done | error | skipped) / 소요 시간(ms) / 오류
+
+환경 변수:
+  APP_WARMUP=reader,embed,llm,diffusion   실행할 단계 (등록 순서대로)
+  APP_WARMUP_DELAY_S=1          startup 후 시작까지 대기 (첫 health check 와 CPU 를 다투지 않게)
+  APP_READY_REQUIRES=reader,embed,diffusion   /ready 가 기다리는 단계 (llm 은 기본 제외: 키가 없어도 검색은 동작)
+  APP_WARMUP_RETRY_S=5          필수 단계 실패 후 첫 재시도 대기
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+_STEPS_ENV = os.getenv("APP_WARMUP", "reader,embed,llm,diffusion")
+_DELAY_S = float(os.getenv("APP_WARMUP_DELAY_S", "1"))
+_REQUIRED_ENV = os.getenv("APP_READY_REQUIRES", "reader,embed,diffusion")
+_RETRY_S = float(os.getenv("APP_WARMUP_RETRY_S", "5"))
+_RETRY_MAX_S = 300.0
+
+
+class Warmup:
+    def __init__(self, enabled: str = _STEPS_ENV, delay_s: float = _DELAY_S,
+                 required: str = _REQUIRED_ENV, retry_s: float = _RETRY_S):
+        self.enabled = {s.strip() for s in enabled.split(",") if s.strip()}
+        self.required = {s.strip() for s in required.split(",") if s.strip()}
+        self.delay_s = delay_s
+        self.retry_s = retry_s
+        self._steps: "OrderedDict[str, Callable[[], None]]" = OrderedDict()
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def register(self, name: str, fn: Callable[[], None], available: bool = True):
+        """
+        fn 은 인자 없이 호출 (여러 번 불려도 되게 — 보통 lazy 로딩 함수를 그대로 부름)
+        available=False 면 APP_WARMUP 에 있어도 건너뜀 (예: 모델 파일이 없음) — /ready 를 막지 않음
+        """
+        if not available:
+            self.enabled.discard(name)
+        self._steps[name] = fn
+        self._state[name] = {"status": "pending" if name in self.enabled else "skipped"}
+
+    def step(self, name: str, available: bool = True):
+        """데코레이터 형태의 register"""
+        def deco(fn):
+            self.register(name, fn, available)
+            return fn
+        return deco
+
+    def _set(self, name: str, **kw):
+        with self._lock:
+            self._state[name].update(kw)
+
+    def required_steps(self) -> set:
+        """readiness 를 막는 단계 (필수 ∩ 켠 단계 — 모델 파일이 없어 건너뛴 단계는 제외)"""
+        return self.required & self.enabled & set(self._steps)
+
+    def _run_step(self, name: str) -> bool:
+        with self._lock:
+            attempts = self._state[name].get("attempts", 0) + 1
+        self._set(name, status="running", attempts=attempts)
+        t0 = time.perf_counter()
+        try:
+            self._steps[name]()
+        except Exception as e:
+            self._set(name, status="error", error=f"{type(e).__name__}: {e}",
+                      ms=round((time.perf_counter() - t0) * 1000, 1))
+            print(f"[WARN] warm-up {name} 실패: {e}")
+            return False
+        ms = round((time.perf_counter() - t0) * 1000, 1)
+        self._set(name, status="done", ms=ms, error=None)
+        print(f"[OK] warm-up {name} ({ms:.0f}ms)")
+        return True
+
+    def _run(self):
+        time.sleep(self.delay_s)
+        todo, retry_s = [n for n in self._steps if n in self.enabled], self.retry_s
+        while True:
+            failed = [n for n in todo if not self._run_step(n)]
+            todo = [n for n in failed if n in self.required]  # 필수가 아닌 단계의 실패는 그대로 끝
+            if not todo:
+                break
+            print(f"[WARN] warm-up 필수 단계 {', '.join(todo)} {retry_s:.0f}s 뒤 다시 시도")
+            time.sleep(retry_s)
+            retry_s = min(retry_s * 2, _RETRY_MAX_S)
+        self._done.set()
+
+    def start(self):
+        """startup 이벤트에서 호출 — 곧바로 반환 (실제 작업은 데몬 스레드)"""
+        if self._thread is not None or not (self.enabled & set(self._steps)):
+            self._done.set()
+            return
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def pending(self) -> list:
+        """아직 done 이 아닌 필수 단계 (running / pending / 재시도 대기 중인 error)"""
+        required = self.required_steps()
+        with self._lock:
+            return [k for k, v in self._state.items() if k in required and v["status"] != "done"]
+
+    def failed(self) -> Dict[str, str]:
+        """실패한 단계 → 오류 (필수가 아닌 단계는 여기 남고 readiness 는 막지 않음)"""
+        with self._lock:
+            return {k: v.get("error", "") for k, v in self._state.items() if v["status"] == "error"}
+
+    def stats(self) -> dict:
+        with self._lock:
+            steps = {k: dict(v) for k, v in self._state.items()}
+        return {"done": self._done.is_set(), "delay_s": self.delay_s,
+                "required": sorted(self.required_steps()), "steps": steps}
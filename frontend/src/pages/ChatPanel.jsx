@@ -7,6 +7,7 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
   const bottomRef = useRef(null);
   const [isImageGenerating, setIsImageGenerating] = useState(false);
   const [imageProgress, setImageProgress] = useState(0);
@@ -40,22 +41,90 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
     setMessages((prev) => [...prev, { sender: "bot", ...payload }]);
   };
 
+  const updateBotMessage = (id, text) => {
+    setMessages((prev) => prev.map((m) => (m.id === id ? { ...m, text } : m)));
+  };
+
+  // SSE 응답(fetch body)을 이벤트 단위로 읽음: onEvent(event, data)
+  async function readSse(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const blocks = buffer.split("\n\n");
+      buffer = blocks.pop();
+      for (const block of blocks) {
+        let event = "message";
+        let data = "";
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        if (data) onEvent(event, JSON.parse(data));
+      }
+    }
+  }
+
   const startImageProgress = () => {
     setIsImageGenerating(true);
     setImageProgress(1);
     if (progressTimerRef.current) clearInterval(progressTimerRef.current);
+  };
+
+  // 서버 작업(job)을 SSE로 따라가며 진행률 갱신, SSE가 끊기면 폴링으로 대체
+  const waitForImageJob = (jobId) =>
+    new Promise((resolve, reject) => {
+      const base = `http://localhost:8000/generate/jobs/${jobId}`;
+
+      const handle = (job) => {
+        const { step = 0, total = 0 } = job?.progress || {};
+        if (total > 0) setImageProgress(Math.max(1, (step / total) * 100));
+        if (job?.status === "done") {
+          resolve(job);
+          return true;
+        }
+        if (job?.status === "error") {
+          reject(new Error(job?.error || "이미지 생성 실패"));
+          return true;
+        }
+        return false;
+      };
 
-    const targetMs = 60 * 1000; // 1분 동안 기다릴 수 있게 진행 바를 천천히 올림
-    const tickMs = 1000;
-    const increment = 85 / (targetMs / tickMs); // 약 85%까지 서서히
+      const poll = () => {
+        progressTimerRef.current = setInterval(async () => {
+          try {
+            const res = await fetch(base);
+            if (res.status === 404) {
+              clearInterval(progressTimerRef.current);
+              reject(new Error("작업 결과가 만료되었습니다."));
+              return;
+            }
+            if (handle(await res.json())) clearInterval(progressTimerRef.current);
+          } catch (err) {
+            // 일시적인 네트워크 오류는 다음 폴링에서 재시도
+          }
+        }, 2000);
+      };
 
-    progressTimerRef.current = setInterval(() => {
-      setImageProgress((prev) => {
-        if (prev >= 85) return prev; // 최대 85%까지만 가짜 진행
-        return prev + increment;
+      if (typeof EventSource === "undefined") {
+        poll();
+        return;
+      }
+      const source = new EventSource(`${base}/events`);
+      const onEvent = (e) => {
+        if (handle(JSON.parse(e.data))) source.close();
+      };
+      source.addEventListener("progress", onEvent);
+      source.addEventListener("done", onEvent);
+      source.addEventListener("error", (e) => {
+        source.close();
+        if (e.data) onEvent(e); // 서버가 보낸 error 이벤트
+        else poll(); // 연결 끊김 → 같은 job을 폴링 (재추론 없음)
       });
-    }, tickMs);
-  };
+    });
 
   const finishImageProgress = () => {
     if (progressTimerRef.current) clearInterval(progressTimerRef.current);
@@ -77,7 +146,8 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
     setIsLoading(true); // ★ 로딩 시작
 
     try {
-      const res = await fetch("http://localhost:8000/ask", {
+      // 스트리밍: 검색 결과(context) → 토큰(token)이 오는 대로 화면에 표시
+      const res = await fetch("http://localhost:8000/ask/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -86,14 +156,28 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
           k: 4,
         }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const messageId = `ask-${Date.now()}`;
+      let answer = "";
+      await readSse(res, (event, data) => {
+        if (event === "token") {
+          if (!answer) {
+            setIsStreaming(true);
+            pushBotMessage({ id: messageId, text: "" });
+          }
+          answer += data.text;
+          updateBotMessage(messageId, answer);
+        } else if (event === "error") {
+          throw new Error(data.error);
+        }
+      });
 
-      const data = await res.json();
-      const answer = data?.answer || "응답을 가져오지 못했어요.";
-
-      pushBotMessage({ text: answer });
+      if (!answer) pushBotMessage({ text: "응답을 가져오지 못했어요." });
     } catch (err) {
       pushBotMessage({ text: "❌ 서버 오류가 발생했습니다." });
     } finally {
+      setIsStreaming(false);
       setIsLoading(false); // ★ 로딩 종료
     }
   }
@@ -189,18 +273,17 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
       formData.append("prompt", finalPrompt);
       formData.append("steps", "40");
 
-      const controller = new AbortController();
-      const timeoutId = setTimeout(() => controller.abort(), 60 * 1000); // 최대 대기 1분
-
-      const res = await fetch("http://localhost:8000/generate", {
+      // 작업 등록 → job_id 로 진행률/결과 수신 (오래 걸려도 요청이 끊기지 않음)
+      const res = await fetch("http://localhost:8000/generate/jobs", {
         method: "POST",
+        headers: { "Idempotency-Key": `${docId}-${Date.now()}` },
         body: formData,
-        signal: controller.signal,
-      }).finally(() => clearTimeout(timeoutId));
+      });
 
       if (res.ok) {
-        const data = await res.json();
-        const base64 = data?.preview_base64;
+        const { job_id: jobId } = await res.json();
+        const job = await waitForImageJob(jobId);
+        const base64 = job?.preview_base64;
 
         if (base64) {
           const src = `data:image/png;base64,${base64}`;
@@ -217,7 +300,7 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
         pushBotMessage({ text: `❌ ${detail}` });
       }
     } catch (err) {
-      pushBotMessage({ text: "❌ 이미지 생성 중 오류가 발생했습니다." });
+      pushBotMessage({ text: `❌ 이미지 생성 중 오류가 발생했습니다. ${err?.message || ""}` });
     } finally {
       finishImageProgress();
       setIsLoading(false);
@@ -251,7 +334,7 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
       ))}
 
         {/* ★ 로딩 중 메시지 */}
-        {isLoading && !isImageGenerating && (
+        {isLoading && !isImageGenerating && !isStreaming && (
           <div className="chat-message bot loading">
             <div className="spinner"></div>
             <span>답변을 생성 중입니다</span>
@@ -261,7 +344,7 @@ const ChatPanel = forwardRef(function ChatPanel({ docId }, ref) {
         {isImageGenerating && (
           <div className="image-progress">
             <div className="image-progress-header">
-              <span>이미지 생성 중... (최대 1분 소요)</span>
+              <span>이미지 생성 중...</span>
               <span>{Math.round(imageProgress)}%</span>
             </div>
             <div className="image-progress-track">